@@ -0,0 +1,163 @@
+import os
+import json
+
+import pytest
+
+import batch_jobs
+from batch_jobs import BatchJob, default_job_name, input_fingerprint, result_text
+
+BATCHES_URL = 'http://mock/v1/messages/batches'
+
+
+class FakeResponse:
+    def __init__(self, payload=None, lines=()):
+        self.payload, self.lines = payload, lines
+
+    def json(self):
+        return self.payload
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeBatchAPI:
+    """Message Batches endpoints that end every batch on its second poll and echo each custom_id."""
+
+    def __init__(self):
+        self.batches = {}
+        self.posts = 0
+
+    def post(self, url, data, **kwargs):
+        self.posts += 1
+        batch_id = f'msgbatch_{self.posts}'
+        self.batches[batch_id] = {'requests': json.loads(b''.join(data))['requests'], 'polls': 0}
+        return FakeResponse({'id': batch_id, 'processing_status': 'in_progress'})
+
+    def get(self, url, **kwargs):
+        if url.endswith('/results'):
+            batch = self.batches[url.split('/')[-2]]
+            return FakeResponse(lines=[json.dumps({'custom_id': request['custom_id'], 'result': {
+                'type': 'succeeded', 'message': {'content': [{'type': 'text', 'text': request['custom_id']}]}}
+            }).encode() for request in batch['requests']])
+        batch_id = url.split('/')[-1]
+        self.batches[batch_id]['polls'] += 1
+        status = 'ended' if self.batches[batch_id]['polls'] > 1 else 'in_progress'
+        return FakeResponse({'id': batch_id, 'processing_status': status, 'request_counts': {}})
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeBatchAPI()
+    monkeypatch.setattr(batch_jobs.requests, 'post', fake.post)
+    monkeypatch.setattr(batch_jobs.requests, 'get', fake.get)
+    monkeypatch.setattr(batch_jobs.time, 'sleep', lambda seconds: None)
+    return fake
+
+
+def items(count):
+    for i in range(count):
+        yield f'item_{i}', {'messages': [{'role': 'user', 'content': str(i)}]}, {'path': f'out_{i}.txt'}
+
+
+def done_ids(job_directory):
+    with open(os.path.join(job_directory, 'done.txt'), encoding='utf-8') as f:
+        return f.read().split()
+
+
+def test_run_prepares_submits_and_collects(tmp_path, api):
+    handled = {}
+
+    def handler(custom_id, result, target):
+        handled[target['path']] = result_text(result)
+
+    job = BatchJob('job', BATCHES_URL, {}, str(tmp_path))
+    assert job.run(items(3), handler) == 3
+
+    assert handled == {'out_0.txt': 'item_0', 'out_1.txt': 'item_1', 'out_2.txt': 'item_2'}
+    assert api.posts == 1
+    assert done_ids(job.job_directory) == ['item_0', 'item_1', 'item_2']
+    with open(job.checkpoint_path, encoding='utf-8') as f:
+        shard, = json.load(f)['shards']
+    assert (shard['batch_id'], shard['status']) == ('msgbatch_1', 'ended')
+
+
+def test_prepare_splits_shards_at_request_limit(tmp_path, api, monkeypatch):
+    monkeypatch.setattr(batch_jobs, 'MAX_BATCH_REQUESTS', 2)
+    job = BatchJob('job', BATCHES_URL, {}, str(tmp_path))
+    assert job.prepare(items(5)) == 5
+    assert len(job.checkpoint['shards']) == 3
+
+    job.submit()
+    assert api.posts == 3
+    assert [len(batch['requests']) for batch in api.batches.values()] == [2, 2, 1]
+
+
+def test_rerun_resumes_after_partial_collection(tmp_path, api):
+    def crash_after_first(custom_id, result, target):
+        if custom_id != 'item_0':
+            raise KeyboardInterrupt
+
+    job = BatchJob('job', BATCHES_URL, {}, str(tmp_path))
+    with pytest.raises(KeyboardInterrupt):
+        job.run(items(3), crash_after_first)
+    assert done_ids(job.job_directory) == ['item_0']
+
+    handled = []
+    resumed = BatchJob('job', BATCHES_URL, {}, str(tmp_path))
+    assert resumed.prepared
+    assert resumed.run(None, lambda custom_id, result, target: handled.append(custom_id)) == 2
+
+    assert api.posts == 1  # re-attached to the submitted batch instead of creating a new one
+    assert handled == ['item_1', 'item_2']
+    assert done_ids(job.job_directory) == ['item_0', 'item_1', 'item_2']
+
+
+def test_failed_results_are_retried_on_next_collect(tmp_path, api):
+    def fail_item_1(custom_id, result, target):
+        if custom_id == 'item_1':
+            raise OSError('disk full')
+
+    job = BatchJob('job', BATCHES_URL, {}, str(tmp_path))
+    assert job.run(items(3), fail_item_1) == 2
+
+    handled = []
+    assert job.collect(lambda custom_id, result, target: handled.append(custom_id)) == 1
+    assert handled == ['item_1']
+
+
+def test_default_job_name_is_stable_until_inputs_change(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    for folder in (first, second):
+        folder.mkdir()
+        (folder / '1.jpg').write_bytes(b'jpeg')
+    name = default_job_name('persona', [str(first), str(second)])
+
+    assert name.startswith('persona_')
+    assert default_job_name('persona', [str(second), str(first)]) == name
+    assert input_fingerprint(str(first)) == input_fingerprint(str(first))
+
+    (first / '2.jpg').write_bytes(b'jpeg')
+    assert default_job_name('persona', [str(first), str(second)]) != name
+
+
+def test_input_fingerprint_tracks_file_modification(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'video')
+    before = input_fingerprint(str(path))
+    os.utime(path, ns=(0, 0))
+    assert input_fingerprint(str(path)) != before
+
+
+def test_result_text():
+    message = {'content': [{'type': 'text', 'text': 'Hello'}, {'type': 'tool_use'}, {'type': 'text', 'text': ' world'}]}
+    assert result_text({'type': 'succeeded', 'message': message}) == 'Hello world'
+    assert result_text({'type': 'errored', 'error': {'type': 'overloaded_error'}}) is None
@@ -0,0 +1,137 @@
+import io
+import json
+import base64
+
+import pytest
+from PIL import Image
+
+import claude_api
+from claude_api import StreamInterrupted, BODY_CHUNK_SIZE, _iter_sse, stream_message, iter_json_body
+from image_prep import LazyImage
+
+
+class FakeResponse:
+    """Stands in for a streamed requests.Response."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def event(kind, **payload):
+    return [f'event: {kind}'.encode(), f'data: {json.dumps(dict(payload, type=kind))}'.encode(), b'']
+
+
+def test_iter_sse_parses_events():
+    lines = event('message_start', message={}) + [b'data: {"a":', b'data: 1}', b'']
+    assert list(_iter_sse(FakeResponse(lines))) == [('message_start', {'type': 'message_start', 'message': {}}),
+                                                    (None, {'a': 1})]
+
+
+@pytest.mark.parametrize('tail', [b'data: {"type": "content_block_del', 'data: "中'.encode()[:-1]])
+def test_iter_sse_reports_truncated_event_as_interrupted(tail):
+    with pytest.raises(StreamInterrupted):
+        list(_iter_sse(FakeResponse(event('ping') + [tail])))
+
+
+def test_stream_message_resumes_after_truncated_event(tmp_path, monkeypatch):
+    requests_sent = []
+
+    def post(url, data, **kwargs):
+        requests_sent.append(json.loads(b''.join(data)))
+        if len(requests_sent) == 1:
+            return FakeResponse(event('content_block_delta', delta={'type': 'text_delta', 'text': 'Hello'})
+                                + [b'data: {"type": "content_block_del'])
+        return FakeResponse(event('content_block_delta', delta={'type': 'text_delta', 'text': ' world'})
+                            + event('message_delta', delta={'stop_reason': 'end_turn'}, usage={'output_tokens': 2})
+                            + event('message_stop'))
+
+    monkeypatch.setattr(claude_api.requests, 'post', post)
+    output_file = tmp_path / 'out.txt'
+    text, usage, _ = stream_message('http://mock', {}, {'messages': [{'role': 'user', 'content': 'hi'}]},
+                                    str(output_file), preamble='> ')
+    assert text == 'Hello world'
+    assert requests_sent[1]['messages'][-1] == {'role': 'assistant', 'content': 'Hello'}
+    assert output_file.read_text(encoding='utf-8') == '> Hello world'
+    assert usage['output_tokens'] == 2
+
+
+def test_stream_message_drops_trailing_whitespace_before_resuming(tmp_path, monkeypatch):
+    requests_sent = []
+
+    def post(url, data, **kwargs):
+        requests_sent.append(json.loads(b''.join(data)))
+        if len(requests_sent) == 1:
+            return FakeResponse(event('content_block_delta', delta={'type': 'text_delta', 'text': '你好，\n\n'})
+                                + [b'data: {"type": "content_block_del'])
+        return FakeResponse(event('content_block_delta', delta={'type': 'text_delta', 'text': '\n\n世界'})
+                            + event('message_delta', delta={'stop_reason': 'end_turn'}, usage={'output_tokens': 2})
+                            + event('message_stop'))
+
+    monkeypatch.setattr(claude_api.requests, 'post', post)
+    output_file = tmp_path / 'out.txt'
+    text, _, _ = stream_message('http://mock', {}, {'messages': [{'role': 'user', 'content': 'hi'}]},
+                                str(output_file), preamble='> ')
+    assert requests_sent[1]['messages'][-1] == {'role': 'assistant', 'content': '你好，'}
+    assert text == '你好，\n\n世界'
+    assert output_file.read_text(encoding='utf-8') == '> ' + text
+
+
+class CountingBlock:
+    """Lazy content block that records when it is encoded."""
+
+    def __init__(self, name, size, log):
+        self.name, self.size, self.log = name, size, log
+
+    def content_block(self):
+        self.log.append(self.name)
+        return {'type': 'text', 'text': self.name * self.size}
+
+
+def test_iter_json_body_matches_json_dumps():
+    log = []
+    data = {'model': 'm', 'messages': [{'role': 'user', 'content': [
+        CountingBlock('a', 10, log), {'type': 'text', 'text': '中文 "quoted"'}, CountingBlock('b', 10, log)]}]}
+    expected = {'model': 'm', 'messages': [{'role': 'user', 'content': [
+        {'type': 'text', 'text': 'a' * 10}, {'type': 'text', 'text': '中文 "quoted"'},
+        {'type': 'text', 'text': 'b' * 10}]}]}
+    assert json.loads(b''.join(iter_json_body(data))) == expected
+
+
+def test_iter_json_body_encodes_blocks_lazily_and_in_bounded_pieces():
+    log = []
+    data = {'content': [CountingBlock('a', 3 * BODY_CHUNK_SIZE, log), CountingBlock('b', 5, log)]}
+    pieces = iter_json_body(data)
+    assert log == []
+    first = next(pieces)
+    assert log == []  # the skeleton before the first block needs no encoding
+    rest = list(pieces)
+    assert log == ['a', 'b']
+    assert all(piece and len(piece) <= BODY_CHUNK_SIZE for piece in [first] + rest)
+    assert len(json.loads(b''.join([first] + rest))['content'][0]['text']) == 3 * BODY_CHUNK_SIZE
+
+
+def test_iter_json_body_rejects_unserializable_values():
+    with pytest.raises(TypeError):
+        b''.join(iter_json_body({'value': object()}))
+
+
+def test_iter_json_body_with_lazy_images(tmp_path):
+    path = str(tmp_path / 'frame.png')
+    Image.new('RGB', (64, 48), (200, 10, 10)).save(path)
+    body = json.loads(b''.join(iter_json_body({'content': [LazyImage(path)]})))
+    block = body['content'][0]
+    assert block['type'] == 'image' and block['source']['type'] == 'base64'
+    with Image.open(io.BytesIO(base64.b64decode(block['source']['data']))) as img:
+        assert img.size == (64, 48)
@@ -0,0 +1,33 @@
+from compare import parse_pair_scores, pair_cache_path, content_hash
+
+
+def test_parse_pair_scores_reads_scores_json():
+    text = ('<analysis>1. 人设相似度评分: 55%</analysis>\n'
+            '<scores>{"similarity": 82, "imitation": {"a.txt": 70, "b.txt": null}}</scores>')
+    assert parse_pair_scores(text, 'a.txt', 'b.txt') == {'similarity': 82.0,
+                                                         'imitation': {'a.txt': 70.0, 'b.txt': None}}
+
+
+def test_parse_pair_scores_falls_back_to_analysis_line():
+    text = '<analysis>1. 人设相似度评分：64.5 %</analysis>\n<scores>{"similarity": </scores>'
+    assert parse_pair_scores(text, 'a.txt', 'b.txt') == {'similarity': 64.5,
+                                                         'imitation': {'a.txt': None, 'b.txt': None}}
+
+
+def test_parse_pair_scores_without_any_score():
+    assert parse_pair_scores('No scores here.', 'a.txt', 'b.txt') is None
+
+
+def test_parse_pair_scores_without_imitation_scores():
+    assert parse_pair_scores('<scores>{"similarity": 80}</scores>', 'a.txt', 'b.txt') == {
+        'similarity': 80.0, 'imitation': {'a.txt': None, 'b.txt': None}}
+
+
+def test_parse_pair_scores_without_similarity():
+    assert parse_pair_scores('<scores>{"imitation": {"a.txt": 75}}</scores>', 'a.txt', 'b.txt') is None
+
+
+def test_pair_cache_path_ignores_order():
+    first, second = content_hash('A1. 甲'), content_hash('A1. 乙')
+    assert pair_cache_path(first, second, 'cache') == pair_cache_path(second, first, 'cache')
+    assert pair_cache_path(first, second, 'cache') != pair_cache_path(first, first, 'cache')
@@ -0,0 +1,62 @@
+import numpy as np
+
+from extract_audio import SAMPLE_RATE, SPEECH_CHUNK_SECONDS, quietest_point, speech_chunks, speech_regions
+
+
+def loud(length, seed=0):
+    return np.random.default_rng(seed).uniform(-0.3, 0.3, length).astype(np.float32)
+
+
+def quiet(length):
+    return np.full(length, 1e-4, dtype=np.float32)
+
+
+def test_quietest_point_returns_middle_of_quietest_window():
+    samples = loud(1000)
+    samples[700:710] = 0
+    assert quietest_point(samples, 500, 10) == 705
+
+
+def test_quietest_point_only_searches_the_tail():
+    samples = loud(1000)
+    samples[100:110] = 0
+    samples[900:910] = 0.01
+    assert quietest_point(samples, 500, 10) == 905
+
+
+def test_quietest_point_without_room_to_search():
+    assert quietest_point(loud(15), 100, 10) == 15
+
+
+def test_speech_regions_bridges_short_pauses_and_drops_clicks():
+    # 1000 Hz gives 30-sample VAD frames; lengths are whole frames except at the end
+    samples = np.concatenate([quiet(990), loud(1980), quiet(210), loud(990, 1), quiet(1980),
+                              loud(90, 2), quiet(990), loud(1000, 3)])
+    assert speech_regions(samples, sample_rate=1000) == [(990, 4170), (7230, 8230)]
+
+
+def test_speech_regions_of_silence_and_empty_input():
+    assert speech_regions(np.zeros(3000, dtype=np.float32), sample_rate=1000) == []
+    assert speech_regions(np.zeros(10, dtype=np.float32), sample_rate=1000) == []
+
+
+def test_speech_chunks_groups_neighbouring_regions():
+    regions = [(0, 500), (800, 1500), (3000, 3500)]
+    assert speech_chunks(loud(4000), regions, sample_rate=100) == [(0, 1500), (3000, 3500)]
+
+
+def test_speech_chunks_splits_long_regions_at_quietest_point():
+    samples = loud(7000)
+    samples[2500:2510] = 0
+    samples[5005:5015] = 0
+    assert speech_chunks(samples, [(0, 7000)], sample_rate=100) == [(0, 2505), (2505, 5010), (5010, 7000)]
+
+
+def test_speech_chunks_stay_within_whisper_window():
+    samples = loud(60 * SAMPLE_RATE)
+    chunks = speech_chunks(samples, [(0, len(samples))])
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(samples)
+    assert all(end == following for (_, end), (following, _) in zip(chunks, chunks[1:]))
+    assert all(end - start <= SPEECH_CHUNK_SECONDS * SAMPLE_RATE for start, end in chunks)
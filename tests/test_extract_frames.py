@@ -0,0 +1,28 @@
+from extract_frames import merge_times, srt_start_times, evenly_spaced_times
+
+
+def test_merge_times_shares_frames_within_window():
+    kept, mapping = merge_times([5.0, 1.0, 1.2, 1.0, 1.6, 3.0, 1.4], window=0.5)
+    assert kept == [1.0, 1.6, 3.0, 5.0]
+    assert mapping == {1.0: 1.0, 1.2: 1.0, 1.4: 1.0, 1.6: 1.6, 3.0: 3.0, 5.0: 5.0}
+
+
+def test_merge_times_measures_window_from_kept_time():
+    # A chain of close times must not drift: 0.4 is merged into 0.0, but 0.6 starts a new frame
+    kept, _ = merge_times([0.0, 0.2, 0.4, 0.6], window=0.5)
+    assert kept == [0.0, 0.6]
+
+
+def test_merge_times_empty():
+    assert merge_times([]) == ([], {})
+
+
+def test_srt_start_times(tmp_path):
+    srt = tmp_path / 'sub.srt'
+    srt.write_text('\ufeff1\n00:00:01,500 --> 00:00:03,000\n你好\n\n2\n01:02:03.04 --> 01:02:05.000\nhello\n',
+                   encoding='utf-8')
+    assert srt_start_times(str(srt)) == [1.5, 3723.04]
+
+
+def test_evenly_spaced_times():
+    assert evenly_spaced_times(10, 4) == [1.25, 3.75, 6.25, 8.75]
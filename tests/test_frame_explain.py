@@ -0,0 +1,54 @@
+import json
+
+from frame_explain import FIELDS, parse_batch_response, split_batch_response, parse_frame_response, frame_accepted
+
+PATHS = ['/frames/video_0:00:00.jpg', '/frames/video_0:00:01.jpg', '/frames/video_0:00:02.5.jpg']
+
+
+def frame(timestamp, **extra):
+    return dict({field: f"{field} at {timestamp}" for field in FIELDS}, timestamp=timestamp, **extra)
+
+
+def test_split_batch_response_matches_frames_by_timestamp():
+    # Out of order, wrapped in prose, and with a confidence on one frame
+    text = 'Here you go:\n' + json.dumps([frame('0:00:02.5'), frame('0:00:00', confidence=0.8),
+                                          frame('0:00:01')]) + '\nDone.'
+    results = split_batch_response(text, PATHS)
+    assert [result['timestamp'] for result in results] == ['0:00:00', '0:00:01', '0:00:02.5']
+    assert results[0]['confidence'] == 0.8 and 'confidence' not in results[1]
+    assert results[2]['action'] == 'action at 0:00:02.5'
+
+
+def test_missing_frames_are_left_for_retry():
+    results = split_batch_response(json.dumps([frame('0:00:01')]), PATHS)
+    assert results[0] is None and results[1] is not None and results[2] is None
+
+
+def test_extra_and_duplicate_frames_are_ignored():
+    text = json.dumps([frame('0:00:00'), frame('0:00:00', action='second answer'), frame('0:00:09'),
+                       frame('0:00:01'), frame('0:00:02.5')])
+    results = split_batch_response(text, PATHS)
+    assert results[0]['action'] == 'action at 0:00:00'
+    assert [result['timestamp'] for result in results] == ['0:00:00', '0:00:01', '0:00:02.5']
+
+
+def test_incomplete_items_are_dropped():
+    incomplete = frame('0:00:01')
+    del incomplete['goods']
+    results = split_batch_response(json.dumps([frame('0:00:00'), incomplete, 'not an object']), PATHS)
+    assert results[0] is not None and results[1] is None and results[2] is None
+
+
+def test_malformed_responses_send_every_frame_to_retry():
+    truncated = json.dumps([frame('0:00:00'), frame('0:00:01')])[:-30]
+    for text in [None, '', 'I cannot describe these frames.', truncated, '[1, 2', '{"a": [1]}']:
+        assert split_batch_response(text, PATHS) == [None, None, None]
+    assert parse_batch_response(json.dumps({'frames': []}), {'0:00:00'}) == {}
+
+
+def test_parse_frame_response_and_acceptance():
+    result = parse_frame_response('```json\n' + json.dumps(frame('x', confidence=0.3)) + '\n```')
+    assert result is not None and not frame_accepted(result)
+    assert frame_accepted(parse_frame_response(json.dumps(frame('x'))))
+    assert parse_frame_response('{"environment": "room"}') is None
+    assert not frame_accepted(None)
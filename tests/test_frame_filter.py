@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+import pytest
+
+from frame_filter import parse_timestamp, format_timestamp
+
+
+@pytest.mark.parametrize('seconds', [0, 1, 10, 60, 62.25, 600, 3600, 3600.5, 3610, 36000])
+def test_parse_timestamp_reads_current_names(seconds):
+    assert parse_timestamp(f"video_{format_timestamp(seconds)}.jpg") == seconds
+
+
+@pytest.mark.parametrize('seconds', [0, 1, 10, 60, 600, 3600, 3610, 7200, 36000])
+def test_parse_timestamp_reads_legacy_stripped_names(seconds):
+    # Older extract_frames versions stripped every trailing zero: "1:00:00" -> "1:"
+    legacy = str(timedelta(seconds=seconds)).rstrip('0').rstrip('.')
+    assert parse_timestamp(f"/frames/video_{legacy}.jpg") == seconds
+
+
+@pytest.mark.parametrize('filename', ['video.jpg', 'video_abc.jpg', 'video_1:2:3:4.jpg', 'video_a:00:00.jpg'])
+def test_parse_timestamp_rejects_names_without_timestamp(filename):
+    with pytest.raises(ValueError):
+        parse_timestamp(filename)
+
+
+def test_format_timestamp_drops_zero_fraction():
+    assert format_timestamp(10) == '0:00:10'
+    assert format_timestamp(62.5) == '0:01:02.5'
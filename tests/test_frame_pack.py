@@ -0,0 +1,106 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from frame_pack import (FramePackWriter, FramePack, FOOTER, is_pack, member_path, split_member, open_image,
+                        read_bytes, list_frames)
+
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 24), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    path = str(tmp_path / 'video.fpack')
+    with FramePackWriter(path, metadata={'shots': [[0, 2.5]]}) as writer:
+        # Added out of order; the index is sorted by timestamp
+        writer.add('video_0:00:02.jpg', 2.0, jpeg_bytes((0, 0, 255)))
+        writer.add('video_0:00:00.jpg', 0.0, jpeg_bytes((255, 0, 0)))
+        writer.add('video_0:00:01.jpg', 1.0, np.full((24, 32, 3), 128, dtype=np.uint8))
+    return path
+
+
+def test_round_trip(pack_path):
+    pack = FramePack(pack_path)
+    assert len(pack) == 3
+    assert pack.names == ['video_0:00:00.jpg', 'video_0:00:01.jpg', 'video_0:00:02.jpg']
+    assert pack.metadata == {'shots': [[0, 2.5]]}
+    assert pack.read(2) == jpeg_bytes((0, 0, 255))
+    with pack.image(1) as img:
+        assert img.size == (32, 24)
+    pack.close()
+
+
+def test_frame_at_picks_nearest(pack_path):
+    pack = FramePack(pack_path)
+    assert [pack.index_at(t) for t in (-1, 0.0, 0.4, 0.6, 1.0, 1.5, 9)] == [0, 0, 0, 1, 1, 1, 2]
+    assert pack.frame_at(1.9)[0] == 2.0
+    pack.close()
+
+
+def test_later_frame_of_same_name_wins(tmp_path):
+    path = str(tmp_path / 'dup.fpack')
+    with FramePackWriter(path) as writer:
+        writer.add('frame.jpg', 0.0, jpeg_bytes((255, 0, 0)))
+        writer.add('frame.jpg', 0.0, jpeg_bytes((0, 255, 0)))
+    pack = FramePack(path)
+    assert len(pack) == 1 and pack.read(0) == jpeg_bytes((0, 255, 0))
+    pack.close()
+
+
+def test_concurrent_adds(tmp_path):
+    path = str(tmp_path / 'threads.fpack')
+    frames = {f'frame_{i:03d}.jpg': jpeg_bytes((i, i, i)) for i in range(64)}
+    with FramePackWriter(path) as writer:
+        threads = [threading.Thread(target=writer.add, args=(name, float(i), data))
+                   for i, (name, data) in enumerate(frames.items())]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    pack = FramePack(path)
+    assert {name: pack.read(i) for i, name in enumerate(pack.names)} == frames
+    pack.close()
+
+
+def test_interrupted_writer_leaves_only_partial(tmp_path):
+    path = str(tmp_path / 'broken.fpack')
+    with pytest.raises(RuntimeError):
+        with FramePackWriter(path) as writer:
+            writer.add('frame.jpg', 0.0, jpeg_bytes((0, 0, 0)))
+            raise RuntimeError('extraction failed')
+    assert not os.path.exists(path) and os.path.exists(path + '.partial')
+
+
+def test_truncated_pack_is_rejected(pack_path):
+    with open(pack_path, 'rb') as f:
+        data = f.read()
+    with open(pack_path, 'wb') as f:
+        f.write(data[:-FOOTER.size // 2])
+    with pytest.raises(ValueError):
+        FramePack(pack_path)
+
+
+def test_member_paths_work_like_files(pack_path, tmp_path):
+    folder = tmp_path / 'frames'
+    folder.mkdir()
+    (folder / 'b.jpg').write_bytes(jpeg_bytes((0, 0, 0)))
+    (folder / 'a.jpg').write_bytes(jpeg_bytes((0, 0, 0)))
+    (folder / 'notes.txt').write_text('not a frame')
+
+    assert is_pack(pack_path) and not is_pack(str(folder))
+    assert list_frames(str(folder)) == [str(folder / 'a.jpg'), str(folder / 'b.jpg')]
+    members = list_frames(pack_path)
+    assert members[0] == member_path(pack_path, 'video_0:00:00.jpg')
+    assert split_member(members[0]) == (pack_path, 'video_0:00:00.jpg')
+    assert split_member(str(folder / 'a.jpg')) == (None, str(folder / 'a.jpg'))
+    assert read_bytes(members[2]) == jpeg_bytes((0, 0, 255))
+    with open_image(members[0]) as img:
+        assert img.getpixel((16, 12))[0] > 200
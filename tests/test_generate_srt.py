@@ -0,0 +1,107 @@
+import json
+from datetime import timedelta
+
+from generate_srt import (TranscriptWriter, format_timedelta, iter_merged_segments, merge_segments, segment_record,
+                          transcript_settings, transcript_cache_path)
+
+
+def segment(start, end, text):
+    return {'start': start, 'end': end, 'text': f' {text} ',
+            'words': [{'start': start, 'end': end, 'word': f' {text}', 'probability': 0.91234}]}
+
+
+def test_format_timedelta():
+    assert format_timedelta(timedelta(seconds=0)) == '00:00:00,000'
+    assert format_timedelta(timedelta(seconds=3723.045)) == '01:02:03,045'
+    assert format_timedelta(timedelta(days=1, seconds=1)) == '24:00:01,000'
+
+
+def test_transcript_writer_writes_all_formats(tmp_path):
+    output_path = str(tmp_path / 'talk.srt')
+    with TranscriptWriter(output_path, ('vtt', 'jsonl')) as writer:
+        writer.add(segment_record(segment(0.5, 2.25, '你好'), 1))
+        # Every segment is on disk as soon as it has been added
+        assert (tmp_path / 'talk.srt.partial').read_text(encoding='utf-8') == \
+            '1\n00:00:00,500 --> 00:00:02,250\n你好\n\n'
+        writer.add(segment_record(segment(3, 4, 'world'), 2))
+
+    assert not list(tmp_path.glob('*.partial'))
+    assert (tmp_path / 'talk.srt').read_text(encoding='utf-8').endswith('2\n00:00:03,000 --> 00:00:04,000\nworld\n\n')
+    assert (tmp_path / 'talk.vtt').read_text(encoding='utf-8') == (
+        'WEBVTT\n\n00:00:00.500 --> 00:00:02.250\n你好\n\n00:00:03.000 --> 00:00:04.000\nworld\n\n')
+    records = [json.loads(line) for line in (tmp_path / 'talk.jsonl').read_text(encoding='utf-8').splitlines()]
+    assert records[0] == {'index': 1, 'start': 0.5, 'end': 2.25, 'text': '你好',
+                          'words': [{'start': 0.5, 'end': 2.25, 'word': ' 你好', 'probability': 0.9123}]}
+
+
+def test_interrupted_transcript_stays_partial(tmp_path):
+    output_path = str(tmp_path / 'talk.srt')
+    try:
+        with TranscriptWriter(output_path) as writer:
+            writer.add(segment_record(segment(0, 1, 'hello'), 1))
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    assert not (tmp_path / 'talk.srt').exists()
+    assert (tmp_path / 'talk.srt.partial').exists()
+
+
+def test_cache_key_depends_on_settings_that_change_the_transcript():
+    sequential = transcript_settings('zh', 600, 'large', 'whisper', 1)
+    assert transcript_cache_path('ab' * 20, sequential, 'cache') == \
+        transcript_cache_path('ab' * 20, transcript_settings('zh', 600, 'large', 'whisper', 1), 'cache')
+    others = [transcript_settings('en', 600, 'large', 'whisper', 1),
+              transcript_settings('zh', 300, 'large', 'whisper', 1),
+              transcript_settings('zh', 600, 'medium', 'whisper', 1),
+              transcript_settings('zh', 600, 'large', 'faster-whisper', 1),
+              transcript_settings('zh', 600, 'large', 'whisper', 4)]
+    paths = {transcript_cache_path('ab' * 20, settings, 'cache') for settings in [sequential] + others}
+    assert len(paths) == 6
+    # Parallel runs split by speech, not by chunk length
+    assert (transcript_settings('zh', 300, 'large', 'whisper', 4)
+            == transcript_settings('zh', 600, 'large', 'whisper', 4))
+
+
+def timed(start, end, text):
+    return {'start': start, 'end': end, 'text': text}
+
+
+def test_merge_segments_drops_duplicates_in_padded_overlap():
+    # Chunks 0-10 s and 10.5-20 s, each padded so both hear 9.8-10.7 s
+    first = [timed(0.0, 4.0, 'a'), timed(4.0, 9.8, 'b'), timed(9.8, 10.4, 'c'), timed(10.4, 10.7, 'd1')]
+    second = [timed(9.9, 10.4, 'c2'), timed(10.3, 11.0, 'd'), timed(11.0, 19.5, 'e')]
+    merged = merge_segments([(0.0, 10.0, first), (10.5, 20.0, second)])
+    assert [segment['text'] for segment in merged] == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_merge_segments_clamps_ends_to_following_start():
+    merged = merge_segments([(0.0, 10.0, [timed(9.0, 10.4, 'a')]), (10.5, 20.0, [timed(10.3, 12.0, 'b')])])
+    assert [(segment['start'], segment['end']) for segment in merged] == [(9.0, 10.3), (10.3, 12.0)]
+
+
+def test_merge_segments_never_ends_before_start():
+    merged = merge_segments([(0.0, 20.0, [timed(5.0, 9.0, 'a'), timed(5.0, 6.0, 'b')])])
+    assert all(segment['end'] >= segment['start'] for segment in merged)
+    assert [(segment['start'], segment['end']) for segment in merged] == [(5.0, 5.0), (5.0, 6.0)]
+
+
+def padded_chunks(count):
+    """Chunks 10 s long, 0.5 s apart, whose segments start in the 0.2 s padding before them."""
+    starts = [index * 10.5 for index in range(count)]
+    return [(start, start + 10.0, [timed(start + offset - 0.2, start + offset + 3.0, f'{start:g}+{offset}')
+                                   for offset in (0, 4, 8)])
+            for start in starts]
+
+
+def test_iter_merged_segments_streams_settled_segments():
+    pulled = []
+
+    def arriving(chunks):
+        for chunk in chunks:
+            pulled.append(chunk)
+            yield chunk
+
+    streamed = [(segment['text'], len(pulled)) for segment in iter_merged_segments(arriving(padded_chunks(4)), pad=0.2)]
+
+    assert [text for text, _ in streamed] == [segment['text'] for segment in merge_segments(padded_chunks(4))]
+    assert streamed[0] == ('0+0', 2)  # out as soon as the second chunk has arrived
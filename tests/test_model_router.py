@@ -0,0 +1,35 @@
+import pytest
+
+from model_router import is_confident, models_for, summarize
+
+
+@pytest.mark.parametrize('result, expected', [
+    ({'confidence': 0.9}, True),
+    ({'confidence': 0.6}, True),
+    ({'confidence': 0.2}, False),
+    ({'confidence': '0.3'}, False),
+    ({}, True),
+    ({'confidence': None}, True),
+    ({'confidence': 'high'}, True),
+])
+def test_is_confident(result, expected):
+    assert is_confident(result, min_confidence=0.6) is expected
+
+
+def test_models_for_honours_override(monkeypatch):
+    monkeypatch.setenv('CLAUDE_MODEL_FRAMES', 'small, large ,')
+    assert models_for('frames') == ['small', 'large']
+    monkeypatch.setenv('CLAUDE_MODEL_FRAMES', ' , ')
+    assert len(models_for('frames')) == 2
+
+
+def test_summarize_groups_by_task_and_model():
+    usage = {'input_tokens': 100, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 50, 'output_tokens': 10}
+    entries = [dict(usage, task='frames', model='small', elapsed=1.0, frames=4, escalated=1),
+               dict(usage, task='frames', model='small', elapsed=3.0, frames=4),
+               dict(usage, task='frames', model='large', elapsed=2.0, frames=1)]
+    rows = {row['model']: row for row in summarize(entries)}
+    assert rows['small']['requests'] == 2 and rows['small']['items'] == 8 and rows['small']['escalated'] == 1
+    assert rows['small']['seconds_per_item'] == 0.5
+    assert rows['small']['input_tokens'] == 150
+    assert rows['large']['requests'] == 1
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from persona_index import PersonaIndex, embed_persona, add_paths
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'test_txt')
+
+
+def persona(a1='第一视角＋年轻男性＋生活情感短视频', a4=2, a9=3):
+    """An analysis with every weighted A field filled in; empty fields would embed as zero."""
+    return (f"A1. 视角＋年龄性别＋定位: {a1}\nA2. 粗分领域: 情感, 生活\nA3. 细分领域: 婚恋关系\n"
+            f"A4. 专业程度: {a4}分。\nA5. 自我标签: \"生活观察者\"\nA6. 语言特点: 幽默风趣\nA7. 个人形象: 阳光积极\n"
+            f"A8. 情感倾向 / 价值观: 注重家庭关系\nA9. 叙事结构和故事性: {a9}分。\nA10. 审美: 色彩明亮温暖\n"
+            f"A11. 主要布景／场地: 室内家庭\n")
+
+
+@pytest.fixture
+def index(tmp_path):
+    return PersonaIndex(str(tmp_path / 'index'))
+
+
+def test_identical_personas_score_100():
+    vector = embed_persona(persona())
+    assert float(vector @ vector) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_score_fields_compare_by_angle():
+    # Only A4 differs, by one point out of four, so its weighted cosine drops from 1 to cos(30°)
+    difference = embed_persona(persona(a4=2)) @ embed_persona(persona(a4=3))
+    assert float(difference) == pytest.approx(1 - 0.05 * (1 - np.cos(np.pi / 6)), abs=1e-5)
+
+
+def test_add_skips_unchanged_and_replaces_updated(index):
+    assert index.add('a', persona())
+    assert not index.add('a', persona())
+    assert index.add('a', persona(a1='第三视角＋年轻女性＋情感短剧'))
+    assert len(index) == 1
+    assert len(index.meta['rows']) == 2 and index.meta['rows'][0]['deleted']
+    np.testing.assert_allclose(index.get('a'), embed_persona(persona(a1='第三视角＋年轻女性＋情感短剧')))
+
+
+def test_index_persists_across_instances(index):
+    index.add('a', persona())
+    reopened = PersonaIndex(index.directory)
+    np.testing.assert_array_equal(reopened.get('a'), index.get('a'))
+
+
+def test_orphan_row_from_a_crash_is_dropped(index):
+    index.add('a', persona())
+    # A crash after appending a vector but before saving the metadata
+    with open(index.vectors_path, 'ab') as f:
+        f.write(embed_persona(persona(a4=4)).tobytes())
+
+    reopened = PersonaIndex(index.directory)
+    reopened.add('b', persona(a9=1))
+    np.testing.assert_array_equal(reopened.get('b'), embed_persona(persona(a9=1)))
+    assert os.path.getsize(reopened.vectors_path) == 2 * reopened.dim * 4
+
+
+def test_search_ranks_by_inner_product(index):
+    assert add_paths(index, [DATA_DIRECTORY]) == 5
+    reference = index.get('北大老孙.txt')
+    expected = sorted(((float(index.get(name) @ reference), name) for name in index.meta['names']
+                       if name != '北大老孙.txt'), reverse=True)
+
+    results = index.query('北大老孙.txt', k=10)
+    assert [result['name'] for result in results] == [name for _, name in expected]
+    assert [result['score'] for result in results] == [round(score * 100, 1) for score, _ in expected]
+
+
+def test_add_paths_skips_compare_outputs(index):
+    add_paths(index, [DATA_DIRECTORY])
+    assert not any(name.startswith('comparison_') for name in index.meta['names'])
+
+
+def test_ivf_search_with_all_lists_matches_exhaustive_search(index):
+    add_paths(index, [DATA_DIRECTORY])
+    exhaustive = index.query('二哥.txt', k=4)
+    index.train_ivf(2)
+    assert index.query('二哥.txt', k=4, nprobe=2) == exhaustive
+    # Additions after training are assigned to a list too
+    index.add('new.txt', persona())
+    assert len(index.meta['lists']) == len(index.meta['rows'])
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from compare import MAX_LLM_CANDIDATES, select_candidates
+from persona_similarity import (A_WEIGHTS, LOCAL_THRESHOLD, char_ngrams, field_similarity, parse_persona,
+                                score_personas, tfidf_similarity)
+
+
+def persona(position, domain, language, a4='3分', a9='3分'):
+    return '\n'.join([
+        'A. 人设定位',
+        f'A1. 视角＋年龄性别＋定位: {position}',
+        f'A2. 粗分领域: {domain}',
+        f'A3. 细分领域: {domain}',
+        f'A4. 专业程度: {a4}',
+        f'A5. 自我标签: {position}',
+        f'A6. 语言特点: {language}',
+        f'A7. 个人形象: {position}',
+        f'A8. 情感倾向/价值观: {language}',
+        f'A9. 叙事结构和故事性: {a9}',
+        f'A10. 审美风格: {language}',
+        f'A11. 主要布景／场地: {domain}',
+    ])
+
+
+REFERENCE = persona('第一人称 中年男性 大学教授', '教育 高考志愿填报', '幽默 直白 爱讲故事')
+TWIN = persona('第一人称 中年男性 大学教授', '教育 高考志愿填报', '幽默 直白 爱讲故事')
+COUSIN = persona('第一人称 青年女性 高中老师', '教育 学习方法', '温和 耐心')
+STRANGER = persona('第三人称 美妆博主', '时尚 口红试色', '活泼 夸张', a4='1分', a9='1分')
+
+
+def test_parse_persona_skips_headers_and_joins_continuation_lines():
+    text = ('A. 人设定位\n'
+            'A1. 视角: 第一人称\n'
+            '  中年男性\n'
+            '<analysis>\n'
+            'A2．粗分领域：教育\n'
+            'E. 总结: 稳定输出\n')
+    assert parse_persona(text) == {'A1': '第一人称\n中年男性', 'A2': '教育', 'E': '稳定输出'}
+
+
+def test_parse_persona_without_colon_keeps_empty_value():
+    assert parse_persona('B3. 更新频率') == {'B3': ''}
+
+
+def test_char_ngrams_drops_pure_whitespace_and_punctuation():
+    assert char_ngrams('教育，  AB') == ['教', '育', 'a', 'b', '教育', '育，', ' a', 'ab']
+
+
+def test_tfidf_similarity_identical_and_disjoint_texts():
+    similarity = tfidf_similarity(['高考志愿', '高考志愿', '口红试色'], 0)
+    assert similarity == pytest.approx([1.0, 1.0, 0.0], abs=1e-6)
+
+
+def test_tfidf_similarity_without_any_ngrams():
+    assert list(tfidf_similarity(['', '，'], 0)) == [0, 0]
+
+
+def test_field_similarity_compares_scores_and_falls_back_to_text():
+    similarity = field_similarity(['4分', '1分', '3分', '专业'], 0, 'A4')
+    assert similarity[:3] == pytest.approx([1.0, 0.0, 2 / 3])
+    assert similarity[3] == pytest.approx(tfidf_similarity(['4分', '1分', '3分', '专业'], 0)[3])
+
+
+def test_score_personas_ranks_closest_persona_first():
+    analyses = {'ref.txt': REFERENCE, 'stranger.txt': STRANGER, 'cousin.txt': COUSIN, 'twin.txt': TWIN}
+    ranking = score_personas(analyses, 'ref.txt')
+
+    assert [entry['name'] for entry in ranking] == ['twin.txt', 'cousin.txt', 'stranger.txt']
+    assert ranking[0]['score'] == pytest.approx(100.0)
+    assert set(ranking[0]['fields']) == set(A_WEIGHTS)
+    assert ranking[2]['fields']['A4'] == pytest.approx(round(100 / 3, 1))
+
+
+def test_score_personas_missing_reference():
+    with pytest.raises(KeyError):
+        score_personas({'a.txt': REFERENCE}, 'ref.txt')
+
+
+def test_local_threshold_separates_related_from_unrelated_personas():
+    ranking = score_personas({'ref.txt': REFERENCE, 'cousin.txt': COUSIN, 'stranger.txt': STRANGER}, 'ref.txt')
+    scores = {entry['name']: entry['score'] for entry in ranking}
+
+    assert scores['cousin.txt'] >= LOCAL_THRESHOLD > scores['stranger.txt']
+    assert select_candidates(ranking) == ['cousin.txt']
+
+
+def test_select_candidates_caps_at_max_llm_candidates():
+    ranking = [{'name': f'{index}.txt', 'score': float(score)}
+               for index, score in enumerate(np.linspace(100, LOCAL_THRESHOLD, MAX_LLM_CANDIDATES + 2))]
+    assert select_candidates(ranking) == [f'{index}.txt' for index in range(MAX_LLM_CANDIDATES)]
+    assert select_candidates(ranking, threshold=101) == []
@@ -0,0 +1,43 @@
+import os
+import shutil
+
+from persona_store import parse_tags, build_record, connect, save_record, load_records, import_directory
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'test_txt')
+ANALYSIS = ("A1. 视角＋年龄性别＋定位: 第一视角＋年轻男性＋生活情感短视频\n"
+            "A4. 专业程度: 2分。博主分享个人生活经验。\n"
+            "A5. 自我标签: \"生活观察者\", “情感分享达人”、幽默暖男。其余为解释\n")
+
+
+def test_parse_tags_splits_and_unquotes():
+    assert parse_tags('"宠妻达人", "甜蜜日常"') == ['宠妻达人', '甜蜜日常']
+    assert parse_tags('情感；生活/美食') == ['情感', '生活', '美食']
+    assert parse_tags('') == []
+
+
+def test_build_record_extracts_scores_and_tags():
+    record = build_record('二哥', ANALYSIS, source='folder')
+    assert record['a1'] == '第一视角＋年轻男性＋生活情感短视频'
+    assert record['a4_score'] == 2
+    assert record['a9_score'] is None
+    assert record['a5_tags'] == ['生活观察者', '情感分享达人', '幽默暖男']
+
+
+def test_records_round_trip_through_sqlite(tmp_path):
+    connection = connect(str(tmp_path / 'personas.sqlite'))
+    save_record(connection, build_record('二哥', ANALYSIS))
+    save_record(connection, build_record('二哥', ANALYSIS.replace('2分', '3分')))
+    records = load_records(connection, 'a4_score >= ?', (3,))
+    connection.close()
+    assert [record['name'] for record in records] == ['二哥']
+    assert records[0]['a5_tags'] == ['生活观察者', '情感分享达人', '幽默暖男']
+
+
+def test_import_directory_skips_compare_outputs(tmp_path):
+    directory = tmp_path / 'txt'
+    shutil.copytree(DATA_DIRECTORY, directory)
+    connection = connect(str(tmp_path / 'personas.sqlite'))
+    assert import_directory(connection, str(directory)) == 5
+    names = [record['name'] for record in load_records(connection)]
+    connection.close()
+    assert '北大老孙' in names and not any(name.startswith('comparison_') for name in names)
@@ -0,0 +1,248 @@
+import os
+import json
+import hashlib
+import time
+import logging
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Callable, Optional
+
+import requests
+
+from claude_api import iter_json_body
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_JOBS_DIRECTORY = os.environ.get('BATCH_JOBS_DIRECTORY', os.path.join(
+    os.path.dirname(SCRIPT_DIR), 'Data', 'batch_jobs'))
+MAX_BATCH_BYTES = 200 * 1024 * 1024  # the API accepts up to 256 MB per batch
+MAX_BATCH_REQUESTS = 100_000
+POLL_INITIAL_DELAY = float(os.environ.get('BATCH_POLL_DELAY', 10))  # seconds
+POLL_MAX_DELAY = 300  # seconds
+POLL_BACKOFF = 1.5
+REQUEST_TIMEOUT = 60  # seconds
+
+
+class BatchJob:
+    """
+    Checkpointed Message Batches run that fans results back out by custom_id.
+
+    Requests are spooled to JSON-lines shards under the job directory, each shard
+    becomes one batch, and the checkpoint records every batch id and which
+    results have been handled. Running the same job again after a crash or
+    restart re-attaches to the submitted batches instead of creating new ones,
+    and skips results that were already written.
+    """
+
+    def __init__(self, name: str, batches_url: str, headers: Dict[str, str],
+                 directory: str = BATCH_JOBS_DIRECTORY):
+        """
+        Args:
+            name (str): Job name; the same name re-attaches to an existing job.
+            batches_url (str): Message Batches endpoint, e.g. https://api.anthropic.com/v1/messages/batches.
+            headers (Dict[str, str]): API headers including the key and version.
+            directory (str): Parent directory for job state.
+        """
+        self.name = name
+        self.batches_url = batches_url.rstrip('/')
+        self.headers = headers
+        self.job_directory = os.path.join(directory, name)
+        self.checkpoint_path = os.path.join(self.job_directory, 'checkpoint.json')
+        self.done_path = os.path.join(self.job_directory, 'done.txt')
+        os.makedirs(self.job_directory, exist_ok=True)
+
+        self.checkpoint: Dict[str, Any] = {'shards': [], 'targets': {}}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.checkpoint = json.load(f)
+        self.done = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path, 'r', encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    @property
+    def prepared(self) -> bool:
+        return bool(self.checkpoint['shards'])
+
+    def _save_checkpoint(self) -> None:
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def prepare(self, items: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> int:
+        """
+        Spool requests to disk, splitting them into shards that fit one batch each.
+
+        Requests are written one at a time, so memory use does not grow with the
+        number of requests.
+
+        Args:
+            items (Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]]): Tuples of
+                custom_id, Messages API params, and target info handed back to the
+                result handler (e.g. the output path).
+
+        Returns:
+            int: Number of spooled requests.
+        """
+        shards = []
+        handle, shard_bytes, shard_count, total = None, 0, 0, 0
+        for custom_id, params, target in items:
+            line = b''.join(iter_json_body({'custom_id': custom_id, 'params': params})) + b'\n'
+            if handle is None or shard_bytes + len(line) > MAX_BATCH_BYTES or shard_count >= MAX_BATCH_REQUESTS:
+                if handle is not None:
+                    handle.close()
+                path = os.path.join(self.job_directory, f'requests_{len(shards):03d}.jsonl')
+                shards.append({'path': path, 'batch_id': None, 'status': None})
+                handle, shard_bytes, shard_count = open(path, 'wb'), 0, 0
+            handle.write(line)
+            shard_bytes += len(line)
+            shard_count += 1
+            total += 1
+            self.checkpoint['targets'][custom_id] = target
+        if handle is not None:
+            handle.close()
+
+        self.checkpoint['shards'] = shards
+        self._save_checkpoint()
+        logger.info(f"Spooled {total} requests into {len(shards)} batch file(s) for job '{self.name}'")
+        return total
+
+    @staticmethod
+    def _request_body(path: str) -> Iterator[bytes]:
+        """Stream a shard as a {"requests": [...]} body without loading it into memory."""
+        yield b'{"requests": ['
+        with open(path, 'rb') as f:
+            for i, line in enumerate(f):
+                yield (b',' if i else b'') + line.rstrip(b'\n')
+        yield b']}'
+
+    def submit(self) -> None:
+        """Create a batch for every shard that has not been submitted yet."""
+        for shard in self.checkpoint['shards']:
+            if shard['batch_id']:
+                continue
+            response = requests.post(self.batches_url, headers=self.headers,
+                                     data=self._request_body(shard['path']), timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            batch = response.json()
+            shard['batch_id'] = batch['id']
+            shard['status'] = batch.get('processing_status')
+            # Checkpoint after every batch so a crash never submits the same shard twice
+            self._save_checkpoint()
+            logger.info(f"Submitted batch {batch['id']} from {os.path.basename(shard['path'])}")
+
+    def wait(self, initial_delay: float = POLL_INITIAL_DELAY, max_delay: float = POLL_MAX_DELAY) -> None:
+        """Poll all batches with exponential backoff until every one has ended."""
+        delay = initial_delay
+        while True:
+            pending = [shard for shard in self.checkpoint['shards'] if shard['status'] != 'ended']
+            if not pending:
+                return
+            for shard in pending:
+                response = requests.get(f"{self.batches_url}/{shard['batch_id']}", headers=self.headers,
+                                        timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                batch = response.json()
+                shard['status'] = batch.get('processing_status')
+                shard['results_url'] = batch.get('results_url')
+                counts = batch.get('request_counts', {})
+                logger.info(f"Batch {shard['batch_id']}: {shard['status']} "
+                            f"({counts.get('processing', '?')} processing, {counts.get('succeeded', '?')} succeeded, "
+                            f"{counts.get('errored', '?')} errored)")
+            self._save_checkpoint()
+            if all(shard['status'] == 'ended' for shard in self.checkpoint['shards']):
+                return
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, max_delay)
+
+    def collect(self, handler: Callable[[str, Dict[str, Any], Dict[str, Any]], None]) -> int:
+        """
+        Stream every ended batch's results and hand each one to handler once.
+
+        Args:
+            handler (Callable): Called as handler(custom_id, result, target), where
+                result is the batch result object ({'type': 'succeeded', 'message': ...}
+                or an error/expired/canceled result) and target is the info given to prepare.
+
+        Returns:
+            int: Number of results handled in this call.
+        """
+        handled = 0
+        with open(self.done_path, 'a', encoding='utf-8') as done_file:
+            for shard in self.checkpoint['shards']:
+                if shard['status'] != 'ended':
+                    continue
+                results_url = shard.get('results_url') or f"{self.batches_url}/{shard['batch_id']}/results"
+                with requests.get(results_url, headers=self.headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        custom_id = entry['custom_id']
+                        if custom_id in self.done:
+                            continue
+                        try:
+                            handler(custom_id, entry['result'], self.checkpoint['targets'].get(custom_id, {}))
+                        except Exception as e:
+                            logger.error(f"Failed to handle result {custom_id}: {str(e)}")
+                            continue
+                        self.done.add(custom_id)
+                        done_file.write(custom_id + '\n')
+                        done_file.flush()
+                        handled += 1
+        logger.info(f"Handled {handled} results for job '{self.name}' ({len(self.done)} total)")
+        return handled
+
+    def run(self, items: Optional[Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]]],
+            handler: Callable[[str, Dict[str, Any], Dict[str, Any]], None]) -> int:
+        """
+        Prepare (unless re-attaching), submit, wait and collect.
+
+        Args:
+            items (Optional[Iterable]): Requests for prepare; ignored when the job
+                was already prepared by an earlier run.
+            handler (Callable): Result handler for collect.
+
+        Returns:
+            int: Number of results handled in this run.
+        """
+        if self.prepared:
+            logger.info(f"Re-attaching to batch job '{self.name}'")
+        elif items is not None:
+            self.prepare(items)
+        self.submit()
+        self.wait()
+        return self.collect(handler)
+
+
+def input_fingerprint(path: str) -> str:
+    """Describe a file, or the files directly in a folder, by name, size and modification time."""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}\t{stat.st_size}\t{stat.st_mtime_ns}"
+    entries = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                     for entry in os.scandir(path) if entry.is_file())
+    return '\n'.join([os.path.abspath(path)] + [f"{name}\t{size}\t{mtime}" for name, size, mtime in entries])
+
+
+def default_job_name(prefix: str, inputs: List[str]) -> str:
+    """
+    Derive a job name that stays the same across restarts for the same inputs.
+
+    The name covers the inputs' files as well as their paths, so a later run on
+    folders whose images were added, removed or replaced starts a new job instead
+    of re-attaching to a finished one and reusing its results.
+    """
+    fingerprint = '\n\n'.join(sorted(input_fingerprint(path) for path in inputs))
+    digest = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+    return f"{prefix}_{digest[:12]}"
+
+
+def result_text(result: Dict[str, Any]) -> Optional[str]:
+    """Return the response text of a succeeded batch result, or None."""
+    if result.get('type') != 'succeeded':
+        return None
+    return ''.join(block.get('text', '') for block in result['message'].get('content', [])
+                   if block.get('type') == 'text')
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import List, Dict, Any
+
+from extract_frames import extract_frames, extract_frames_parallel, extract_frames_at
+
+# Constants
+DEFAULT_DURATION = 600  # seconds of synthetic video
+DEFAULT_SIZE = '1280x720'
+DEFAULT_RATE = 30
+KEYFRAME_INTERVAL = 60  # frames between keyframes (2 s at 30 fps), typical of phone and web video
+
+
+def make_video(path: str, duration: int, size: str, rate: int) -> None:
+    """Encode a synthetic testsrc video with H.264 and regular keyframes."""
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi',
+                    '-i', f'testsrc=duration={duration}:size={size}:rate={rate}',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(KEYFRAME_INTERVAL),
+                    '-pix_fmt', 'yuv420p', path], check=True)
+
+
+def run(video_path: str, fps: float, workers: int, output_dir: str) -> Dict[str, Any]:
+    """Extract all frames into a fresh folder and time it; workers=1 is the single-process path."""
+    output_folder = os.path.join(output_dir, f"workers_{workers}")
+    os.makedirs(output_folder)
+    start_time = time.time()
+    if workers == 1:
+        extract_frames(video_path, fps, output_folder)
+    else:
+        extract_frames_parallel(video_path, fps, workers, output_folder)
+    return {'workers': workers, 'seconds': round(time.time() - start_time, 2),
+            'frames': sorted(os.listdir(output_folder))}
+
+
+def run_sparse(video_path: str, count: int, output_dir: str) -> Dict[str, Any]:
+    """Grab count evenly spaced frames by seeking and time it."""
+    output_folder = os.path.join(output_dir, f"sparse_{count}")
+    os.makedirs(output_folder)
+    start_time = time.time()
+    frames = extract_frames_at(video_path, count=count, output_folder=output_folder)
+    return {'seconds': round(time.time() - start_time, 2),
+            'frames': sum(path is not None for path in frames.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time single-process, segmented parallel and sparse frame extraction.")
+    parser.add_argument("video_path", nargs="?", help="Video to extract (a synthetic testsrc video if omitted)")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION, help="Seconds of synthetic video")
+    parser.add_argument("--size", default=DEFAULT_SIZE, help="Synthetic video size")
+    parser.add_argument("--fps", type=float, default=1, help="Frames per second to extract")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1],
+                        help="Parallel worker counts to compare with the single-process path")
+    parser.add_argument("--sparse", type=int, metavar="N",
+                        help="Also time grabbing N evenly spaced frames by seeking")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = args.video_path
+        if not video_path:
+            video_path = os.path.join(temp_dir, 'testsrc.mp4')
+            print(f"Encoding {args.duration} s of {args.size} testsrc video...")
+            make_video(video_path, args.duration, args.size, DEFAULT_RATE)
+
+        results: List[Dict[str, Any]] = []
+        for workers in [1] + sorted(set(args.workers) - {1}):
+            results.append(run(video_path, args.fps, workers, temp_dir))
+
+        baseline = results[0]
+        print(f"\n{os.cpu_count()} CPUs, {len(baseline['frames'])} frames at {args.fps} fps")
+        for result in results:
+            match = "same frames" if result['frames'] == baseline['frames'] else "FRAMES DIFFER"
+            print(f"{result['workers']:>3} worker(s): {result['seconds']:>7} s  "
+                  f"x{baseline['seconds'] / result['seconds']:.2f}  {match}")
+        if args.sparse:
+            sparse = run_sparse(video_path, args.sparse, temp_dir)
+            print(f"sparse {sparse['frames']:>4}: {sparse['seconds']:>7} s  "
+                  f"x{baseline['seconds'] / sparse['seconds']:.1f} faster than the full decode")
+        if any(result['frames'] != baseline['frames'] for result in results):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
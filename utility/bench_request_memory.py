@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from typing import List, Dict, Any
+
+import numpy as np
+from PIL import Image
+
+from claude_api import iter_json_body
+from image_prep import LazyImage, prepare_image, image_block, per_image_tokens
+
+# Constants
+DEFAULT_IMAGE_COUNT = 100
+SYNTHETIC_SIZE = (1284, 2778)  # a phone screenshot
+REQUEST_TOKEN_BUDGET = 160000  # large enough that every image keeps the high tier
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def make_images(directory: str, count: int) -> List[str]:
+    """Write noisy synthetic screenshots, which compress about as badly as real ones."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"screenshot_{i:03d}.png")
+        pixels = rng.integers(0, 256, size=(SYNTHETIC_SIZE[1] // 4, SYNTHETIC_SIZE[0] // 4, 3), dtype=np.uint8)
+        Image.fromarray(pixels).resize(SYNTHETIC_SIZE, Image.NEAREST).save(path)
+        paths.append(path)
+    return paths
+
+
+def build_request(content: List[Any]) -> Dict[str, Any]:
+    return {'model': 'benchmark', 'max_tokens': 1,
+            'messages': [{'role': 'user', 'content': content + [{'type': 'text', 'text': 'Describe.'}]}]}
+
+
+def run_mode(mode: str, paths: List[str]) -> Dict[str, Any]:
+    """
+    Serialize one request for all images and measure peak memory.
+
+    eager builds every base64 block up front and serializes the whole body the
+    way requests.post(json=...) does; stream writes the body with iter_json_body.
+    """
+    max_tokens = per_image_tokens(len(paths), REQUEST_TOKEN_BUDGET)
+    baseline = peak_rss_mb()
+    start_time = time.time()
+    if mode == 'eager':
+        data = build_request([image_block(prepare_image(path, max_tokens)) for path in paths])
+        body_bytes = len(json.dumps(data, allow_nan=False).encode('utf-8'))
+    else:
+        data = build_request([LazyImage(path, max_tokens) for path in paths])
+        body_bytes = sum(len(chunk) for chunk in iter_json_body(data))
+    return {'mode': mode, 'images': len(paths), 'body_mb': round(body_bytes / (1024 * 1024), 1),
+            'baseline_mb': round(baseline, 1), 'peak_mb': round(peak_rss_mb(), 1),
+            'seconds': round(time.time() - start_time, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of building one many-image request, eager vs streamed.")
+    parser.add_argument("image_folder", nargs="?", help="Folder of images (synthetic screenshots if omitted)")
+    parser.add_argument("--images", type=int, default=DEFAULT_IMAGE_COUNT, help="Number of synthetic images")
+    parser.add_argument("--mode", choices=["eager", "stream"], help="Run one mode in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        paths = sorted(os.path.join(args.image_folder, name) for name in os.listdir(args.image_folder)
+                       if name.lower().endswith(('.png', '.jpg', '.jpeg')))
+        print(json.dumps(run_mode(args.mode, paths)))
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_folder = args.image_folder
+        if not image_folder:
+            print(f"Writing {args.images} synthetic screenshots...")
+            make_images(temp_dir, args.images)
+            image_folder = temp_dir
+        # Each mode runs in a fresh process so one's peak does not hide the other's
+        for mode in ("eager", "stream"):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), image_folder, "--mode", mode],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['mode']:>6}: {result['images']} images, body {result['body_mb']} MB, "
+                  f"peak RSS {result['peak_mb']} MB (+{round(result['peak_mb'] - result['baseline_mb'], 1)} MB), "
+                  f"{result['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
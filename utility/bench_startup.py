@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from typing import List, Tuple
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OMEGA = os.path.join(SCRIPT_DIR, 'omega.py')
+BUDGET_MS = 100  # 'omega --help' must stay under this
+DEFAULT_REPEAT = 20
+
+
+def time_command(command: List[str], repeat: int) -> Tuple[float, float, int]:
+    """Run a command repeatedly and return its minimum and median wall time in ms, and its exit code."""
+    times = []
+    returncode = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start_time) * 1000)
+        returncode = result.returncode
+    return min(times), statistics.median(times), returncode
+
+
+def slowest_imports(command: List[str], count: int = 8) -> List[Tuple[int, str]]:
+    """Return the imports with the largest cumulative time (us) under python -X importtime."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime'] + command,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), name.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast the omega CLI starts.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per measurement")
+    parser.add_argument("--commands", nargs="*",
+                        help="Also time 'omega <command> --help' for these commands (all if given without names)")
+    args = parser.parse_args()
+
+    _, interpreter, _ = time_command([sys.executable, '-c', 'pass'], args.repeat)
+    best, median, _ = time_command([sys.executable, OMEGA, '--help'], args.repeat)
+    print(f"python -c pass       median {interpreter:6.1f} ms")
+    print(f"omega --help         median {median:6.1f} ms (best {best:.1f} ms, budget {BUDGET_MS} ms, "
+          f"{median - interpreter:+.1f} ms over the interpreter)")
+
+    print("\nslowest imports for omega --help (cumulative):")
+    for cumulative, name in slowest_imports([OMEGA, '--help']):
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    if args.commands is not None:
+        sys.path.insert(0, SCRIPT_DIR)
+        from omega import PASSTHROUGH_COMMANDS, DIRECT_COMMANDS
+        commands = args.commands or list(PASSTHROUGH_COMMANDS) + list(DIRECT_COMMANDS)
+        print()
+        for command in commands:
+            _, command_median, returncode = time_command([sys.executable, OMEGA, command, '--help'],
+                                                         max(1, args.repeat // 4))
+            status = "" if returncode == 0 else f"  (exit {returncode}, missing dependencies?)"
+            print(f"omega {command + ' --help':<24} median {command_median:7.1f} ms{status}")
+
+    if median > BUDGET_MS:
+        print(f"\nomega --help took {median:.1f} ms, over the {BUDGET_MS} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
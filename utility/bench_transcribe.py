@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+import time
+import argparse
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from extract_audio import iter_pcm, SAMPLE_RATE
+from generate_srt import load_model, transcribe, transcription_pool, transcribe_worker, MODEL_NAME
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_AUDIO = os.path.join(os.path.dirname(SCRIPT_DIR), 'Data', 'audio.mp3')
+# BACKEND:WORKERS runs; the first one is the reference the others are scored against
+DEFAULT_CONFIGS = ['whisper:1', 'faster-whisper:1', f'faster-whisper:{max(2, os.cpu_count() or 1)}']
+CJK = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+SRT_TEXT = re.compile(r'^\d+\s*\n[^\n]*-->[^\n]*\n(.*?)(?:\n\s*\n|\Z)', re.S | re.M)
+
+
+def tokens(text: str) -> List[str]:
+    """Split a transcript into the units errors are counted in: characters for CJK text, words otherwise."""
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    if CJK.search(text):
+        return [character for character in text if not character.isspace()]
+    return text.split()
+
+
+def error_rate(reference: List[str], hypothesis: List[str]) -> float:
+    """Word (or character) error rate: edit distance between the token lists over the reference length."""
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, token in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, other in enumerate(hypothesis, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (token != other))
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def srt_text(srt_path: str) -> str:
+    """Return the subtitle text of an SRT file."""
+    with open(srt_path, 'r', encoding='utf-8-sig') as f:
+        return ' '.join(block.replace('\n', ' ') for block in SRT_TEXT.findall(f.read()))
+
+
+def run(audio_path: str, backend: str, workers: int, model_name: str, language: Optional[str]) -> Dict[str, Any]:
+    """Load a backend, then transcribe the file and time both steps."""
+    start_time = time.time()
+    if workers > 1:
+        # Start the pool and load the model in every worker before timing the transcription
+        pool = transcription_pool(backend, model_name, workers)
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        list(pool.map(transcribe_worker, [(0.0, silence, language or 'en')] * workers))
+    else:
+        load_model(model_name, backend=backend)
+    load_seconds = time.time() - start_time
+
+    start_time = time.time()
+    segments = list(transcribe(audio_path, language, model_name=model_name, backend=backend, workers=workers))
+    return {'label': f"{backend} x{workers}", 'load': load_seconds, 'seconds': time.time() - start_time,
+            'text': ' '.join(segment['text'].strip() for segment in segments)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription backends by speed and accuracy.")
+    parser.add_argument("audio_path", nargs="?", default=DEFAULT_AUDIO, help="Audio or video file")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, metavar="BACKEND:WORKERS",
+                        help="Backends and worker counts to run; the first is the reference")
+    parser.add_argument("--model", default=MODEL_NAME, help="Whisper model name")
+    parser.add_argument("--language", help="Language code (default: auto-detect)")
+    parser.add_argument("--reference", help="SRT with the correct transcript to score every run against")
+    args = parser.parse_args()
+
+    duration = sum(len(samples) for _, samples in iter_pcm(args.audio_path)) / SAMPLE_RATE
+    results = []
+    for config in args.configs:
+        backend, _, workers = config.partition(':')
+        try:
+            results.append(run(args.audio_path, backend, int(workers or 1), args.model, args.language))
+        except (ImportError, RuntimeError) as e:
+            print(f"Skipping {config}: {e}")
+
+    if not results:
+        sys.exit(1)
+    reference_text = srt_text(args.reference) if args.reference else results[0]['text']
+    reference_name = os.path.basename(args.reference) if args.reference else results[0]['label']
+    reference = tokens(reference_text)
+    print(f"\n{os.path.basename(args.audio_path)}: {duration:.1f} s of audio, model {args.model}, "
+          f"{os.cpu_count()} CPUs; error rate against {reference_name}")
+    print(f"{'backend':<20} {'load s':>7} {'run s':>7} {'RTF':>6} {'speed':>7} {'error':>6}")
+    for result in results:
+        rtf = result['seconds'] / duration if duration else 0.0
+        print(f"{result['label']:<20} {result['load']:>7.1f} {result['seconds']:>7.1f} {rtf:>6.2f} "
+              f"{results[0]['seconds'] / result['seconds']:>6.2f}x {error_rate(reference, tokens(result['text'])):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import re
+import json
+import time
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+USAGE_LOG = os.environ.get('CLAUDE_USAGE_LOG', os.path.join(os.path.dirname(SCRIPT_DIR), 'Data', 'claude_usage.jsonl'))
+USAGE_FIELDS = ['input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens']
+CONNECT_TIMEOUT = 10  # seconds
+STREAM_IDLE_TIMEOUT = 30  # seconds without any stream data before the connection counts as dropped
+MAX_STREAM_RESUMES = 2
+BODY_CHUNK_SIZE = 64 * 1024  # bytes per upload chunk of a serialized content block
+LAZY_MARKER = '__lazy_content_block__:'
+
+
+class StreamInterrupted(requests.RequestException):
+    """Raised when a streamed response drops and cannot be resumed."""
+
+
+class MissingAPIKey(ValueError):
+    """Raised when a request needs an API key that is not set in the environment."""
+
+
+def require_api_key(name: str = 'CLAUDE_API_KEY') -> str:
+    """
+    Return an API key from the environment, checked only when a request is made.
+
+    Args:
+        name (str): Environment variable holding the key.
+
+    Returns:
+        str: The key.
+
+    Raises:
+        MissingAPIKey: If the variable is not set.
+    """
+    key = os.environ.get(name)
+    if not key:
+        raise MissingAPIKey(f"{name} environment variable is not set")
+    return key
+
+
+def cached_system(*texts: str) -> List[Dict[str, Any]]:
+    """
+    Build a system prompt whose blocks are cached as one stable prefix.
+
+    Only the last block carries the cache breakpoint; the cached prefix covers
+    everything up to and including it, so callers should pass the fixed
+    instructions first and any per-run but reusable context after them.
+
+    Args:
+        *texts (str): System prompt blocks, most stable first.
+
+    Returns:
+        List[Dict[str, Any]]: Text blocks for the 'system' request field.
+    """
+    blocks = [{'type': 'text', 'text': text} for text in texts if text]
+    if blocks:
+        blocks[-1]['cache_control'] = {'type': 'ephemeral'}
+    return blocks
+
+
+def record_usage(task: str, usage: Optional[Dict[str, Any]], elapsed: Optional[float] = None,
+                 log_path: Optional[str] = USAGE_LOG, **extra: Any) -> Dict[str, Any]:
+    """
+    Log a response's token usage, including prompt cache reads and writes.
+
+    Args:
+        task (str): Name of the calling task, e.g. "persona".
+        usage (Optional[Dict[str, Any]]): The response's usage object.
+        elapsed (Optional[float]): Request duration in seconds.
+        log_path (Optional[str]): JSON-lines file to append the entry to, or None.
+        **extra (Any): Additional fields to record.
+
+    Returns:
+        Dict[str, Any]: The recorded entry.
+    """
+    usage = usage or {}
+    entry = {'time': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'task': task}
+    entry.update({field: usage.get(field) or 0 for field in USAGE_FIELDS})
+    if elapsed is not None:
+        entry['elapsed'] = round(elapsed, 3)
+    entry.update({key: round(value, 3) if isinstance(value, float) else value for key, value in extra.items()})
+
+    logger.info(f"[{task}] tokens in={entry['input_tokens']} out={entry['output_tokens']} "
+                f"cache_write={entry['cache_creation_input_tokens']} cache_read={entry['cache_read_input_tokens']}")
+    if log_path:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def iter_json_body(data: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Serialize a request body to JSON bytes piece by piece.
+
+    Values with a content_block() method, such as image_prep.LazyImage, are
+    turned into their content block only when the writer reaches them and are
+    released right after, so a request with many images never holds more than
+    one encoded image. Pass the result as requests' data= argument to upload it
+    with chunked transfer encoding; call it again for every retry.
+
+    Args:
+        data (Dict[str, Any]): Request body.
+
+    Yields:
+        bytes: Consecutive, non-empty pieces of the JSON document.
+    """
+    lazy_values = []
+
+    def placeholder(value: Any) -> str:
+        if hasattr(value, 'content_block'):
+            lazy_values.append(value)
+            return f'{LAZY_MARKER}{len(lazy_values) - 1}'
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    skeleton = json.dumps(data, ensure_ascii=False, default=placeholder)
+    for i, piece in enumerate(re.split(f'"{LAZY_MARKER}(\\d+)"', skeleton)):
+        if i % 2 == 0:
+            # An empty chunk would end a chunked upload early, so skip empty pieces
+            if piece:
+                yield piece.encode('utf-8')
+            continue
+        block = json.dumps(lazy_values[int(piece)].content_block(), ensure_ascii=False)
+        for start in range(0, len(block), BODY_CHUNK_SIZE):
+            yield block[start:start + BODY_CHUNK_SIZE].encode('utf-8')
+
+
+def post_message(url: str, headers: Dict[str, str], data: Dict[str, Any], task: str, max_retries: int = 3,
+                 retry_delay: float = 5, timeout: float = 120, **extra: Any) -> Dict[str, Any]:
+    """
+    Send a non-streaming Messages API request, retrying failures, and record its usage.
+
+    Rate-limited responses are retried after their retry-after header when the
+    server sends one, otherwise after retry_delay.
+
+    Args:
+        url (str): Messages API URL.
+        headers (Dict[str, str]): Request headers.
+        data (Dict[str, Any]): Request body; may contain lazy content blocks.
+        task (str): Task name for the usage log.
+        max_retries (int): Attempts before giving up.
+        retry_delay (float): Seconds between attempts.
+        timeout (float): Seconds to wait for the response.
+        **extra (Any): Additional fields for the usage log.
+
+    Returns:
+        Dict[str, Any]: The response message.
+
+    Raises:
+        requests.RequestException: If every attempt fails.
+    """
+    for attempt in range(max_retries):
+        try:
+            start_time = time.time()
+            response = requests.post(url, headers=headers, data=iter_json_body(data), timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            record_usage(task, result.get('usage'), time.time() - start_time, model=data.get('model'), **extra)
+            return result
+        except requests.RequestException as e:
+            logger.warning(f"[{task}] attempt {attempt + 1} failed: {str(e)}")
+            if attempt == max_retries - 1:
+                raise
+            retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+            time.sleep(float(retry_after) if retry_after else retry_delay)
+
+
+def _parse_sse_data(data_lines: List[str]) -> Dict[str, Any]:
+    """Decode the data of one event; a line cut off by a dropped connection counts as an interrupted stream."""
+    try:
+        return json.loads('\n'.join(data_lines))
+    except json.JSONDecodeError as e:
+        raise StreamInterrupted(f"Truncated stream event: {str(e)}") from e
+
+
+def _iter_sse(response: requests.Response):
+    """Yield (event, data) pairs from a server-sent events response."""
+    event, data_lines = None, []
+    # SSE is always UTF-8; split bytes first so no decoded character can act as a line break
+    for raw_line in response.iter_lines():
+        try:
+            line = raw_line.decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise StreamInterrupted(f"Truncated stream event: {str(e)}") from e
+        if line == '':
+            if data_lines:
+                yield event, _parse_sse_data(data_lines)
+            event, data_lines = None, []
+        elif line.startswith('event:'):
+            event = line[len('event:'):].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[len('data:'):].strip())
+    if data_lines:
+        yield event, _parse_sse_data(data_lines)
+
+
+def _stream_once(url: str, headers: Dict[str, str], data: Dict[str, Any], output, parts: List[str],
+                 usage: Dict[str, Any], idle_timeout: float) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Run one streaming request, writing text deltas to output as they arrive.
+
+    Received text is appended to parts as it arrives, so it survives a dropped
+    connection. Token counts are added to usage.
+
+    Returns:
+        Tuple[Optional[str], Optional[float]]: Stop reason (None if the stream
+            ended without message_stop) and seconds until the first text delta.
+    """
+    start_time = time.time()
+    first_token = None
+    stop_reason = None
+    with requests.post(url, headers=headers, data=iter_json_body(dict(data, stream=True)), stream=True,
+                       timeout=(CONNECT_TIMEOUT, idle_timeout)) as response:
+        response.raise_for_status()
+        for event, payload in _iter_sse(response):
+            kind = payload.get('type', event)
+            if kind == 'message_start':
+                for key, value in payload['message'].get('usage', {}).items():
+                    if key != 'output_tokens' and isinstance(value, int):
+                        usage[key] = usage.get(key, 0) + value
+            elif kind == 'content_block_delta' and payload['delta'].get('type') == 'text_delta':
+                if first_token is None:
+                    first_token = time.time() - start_time
+                parts.append(payload['delta']['text'])
+                output.write(payload['delta']['text'])
+                output.flush()
+            elif kind == 'message_delta':
+                stop_reason = payload.get('delta', {}).get('stop_reason')
+                usage['output_tokens'] = usage.get('output_tokens', 0) + payload.get('usage', {}).get('output_tokens', 0)
+            elif kind == 'message_stop':
+                return stop_reason or 'end_turn', first_token
+            elif kind == 'error':
+                raise requests.RequestException(f"Stream error: {payload.get('error')}")
+    return None, first_token
+
+
+def stream_message(url: str, headers: Dict[str, str], data: Dict[str, Any], output_file: str,
+                   preamble: str = '', idle_timeout: float = STREAM_IDLE_TIMEOUT,
+                   max_resumes: int = MAX_STREAM_RESUMES) -> Tuple[str, Dict[str, Any], Optional[float]]:
+    """
+    Stream a Messages API response into a file as the tokens arrive.
+
+    The connection only times out when no data arrives for idle_timeout seconds,
+    so long generations are not cut off by a total-time limit. If the stream
+    drops after some text has arrived, the request is re-sent with that text as
+    an assistant prefill and the continuation is appended. Output goes to
+    output_file + '.partial' and is renamed into place only once the response is
+    complete, so a failed run never leaves a truncated file that looks finished.
+
+    Args:
+        url (str): Messages API URL.
+        headers (Dict[str, str]): Request headers.
+        data (Dict[str, Any]): Request body without the stream flag.
+        output_file (str): Path of the final output file.
+        preamble (str): Text written at the top of the file before the response.
+        idle_timeout (float): Seconds of silence before the stream counts as dropped.
+        max_resumes (int): How often a dropped stream is resumed before giving up.
+
+    Returns:
+        Tuple[str, Dict[str, Any], Optional[float]]: Full response text, token
+            usage summed over all attempts, and seconds until the first token.
+
+    Raises:
+        StreamInterrupted: If the stream dropped and could not be resumed.
+        requests.RequestException: If the request fails before any text arrives.
+    """
+    partial_file = output_file + '.partial'
+    usage: Dict[str, Any] = {}
+    parts: List[str] = []
+    first_token = None
+    with open(partial_file, 'w', encoding='utf-8') as output:
+        output.write(preamble)
+        for attempt in range(max_resumes + 1):
+            request = data
+            if parts:
+                # Continue from what already arrived; the API rejects a prefill
+                # ending in whitespace, so any trailing whitespace is dropped
+                # from the text and the file too, keeping all three in step
+                prefill = ''.join(parts).rstrip()
+                if prefill != ''.join(parts):
+                    parts[:] = [prefill] if prefill else []
+                    output.seek(0)
+                    output.truncate()
+                    output.write(preamble + prefill)
+                if parts:
+                    request = dict(data, messages=data['messages'] + [{'role': 'assistant', 'content': prefill}])
+            try:
+                stop_reason, attempt_first_token = _stream_once(url, headers, request, output, parts, usage,
+                                                                idle_timeout)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    StreamInterrupted) as e:
+                if not parts:
+                    raise
+                logger.warning(f"Stream dropped after {len(''.join(parts))} characters: {str(e)}")
+                continue
+            if first_token is None:
+                first_token = attempt_first_token
+            if stop_reason is not None:
+                break
+            logger.warning(f"Stream ended without message_stop after {len(''.join(parts))} characters")
+        else:
+            raise StreamInterrupted(f"Stream could not be resumed after {max_resumes} resumes; "
+                                    f"partial output kept in {partial_file}")
+    os.replace(partial_file, output_file)
+    return ''.join(parts), usage, first_token
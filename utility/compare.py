@@ -7,23 +7,31 @@
 #   - top_k: Not specified in code
 
 import os
+import re
+import csv
+import json
+import argparse
+import hashlib
 import requests
 import logging
 import time
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import List, Dict, Any, Optional, Tuple
+from persona_similarity import score_personas, format_similarity_table, LOCAL_THRESHOLD, OUTPUT_PREFIXES
+from model_router import model_for
+from claude_api import cached_system, record_usage, stream_message, post_message, require_api_key
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Constants
-CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY')
-if not CLAUDE_API_KEY:
-    raise ValueError("CLAUDE_API_KEY environment variable is not set")
-
-CLAUDE_API_URL = 'https://api.anthropic.com/v1/messages'
+CLAUDE_API_URL = os.environ.get('CLAUDE_API_URL', 'https://api.anthropic.com/v1/messages')
+MODEL = model_for('compare')  # see model_router.TASK_POLICIES
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
+STREAM = os.environ.get('CLAUDE_STREAM', '1') != '0'  # stream responses into the output file
 
 # Get the path to the directory containing the current script (utility folder)
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,11 +39,15 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # Go up one level to the parent directory, then into the Data folder
 INPUT_DIRECTORY = os.path.join(os.path.dirname(current_dir), 'Data', 'test_txt')
 OUTPUT_DIRECTORY = os.path.join(os.path.dirname(current_dir), 'Data', 'test_txt')
+REFERENCE_FILE = '北大老孙.txt'
+MAX_LLM_CANDIDATES = 5  # most similar influencers sent to Claude after local pre-screening
+MATRIX_WORKERS = int(os.environ.get('COMPARE_MATRIX_WORKERS', '4'))  # concurrent pair requests
+PAIR_CACHE_DIRECTORY = os.environ.get('COMPARE_PAIR_CACHE',
+                                      os.path.join(os.path.dirname(current_dir), 'Data', 'compare_pairs'))
 
-COMPARISON_PROMPT = """
-上载的几个文件中有数位短视频博主的画像，请以'北大老孙.txt'为参考，给出在A项中其他几位博主与'北大老孙.txt'相似度的"人设相似度评分"　0%为截然不同，100%为完全一致。用下表中权重：
-
-A1: 视角+年龄性别+定位 25%
+# Sent as a cached system prompt together with the reference analysis; the other
+# analyses go into the user message.
+A_WEIGHT_TABLE = """A1: 视角+年龄性别+定位 25%
 A2: 粗分领域 5%
 A3: 细分领域 12%
 A4: 专业程度 5%
@@ -45,17 +57,22 @@ A7: 个人形象 5%
 A8: 情感倾向/价值观 8%
 A9.叙事结构和故事性 10%
 A10: 审美风格 5%
-A11.主要布景／场地 5%
+A11.主要布景／场地 5%"""
 
-如果A项评分小于70%可以忽略下一步。如果A项评分大于70%请继续分析Ｂ，Ｃ，Ｄ项的异同，并给出以'北大老孙.txt'为参考的"值得模仿评分" (0%为'北大老孙.txt'无法模仿，100%为'北大老孙.txt'完全可以复制）
-
-B. 内容策略 50%
+BCD_WEIGHT_TABLE = """B. 内容策略 50%
 C. 受众画像 25%
-D. 制作专业度 25%
+D. 制作专业度 25%"""
+
+COMPARISON_PROMPT = f"""
+上载的几个文件中有数位短视频博主的画像，请以'北大老孙.txt'为参考，给出在A项中其他几位博主与'北大老孙.txt'相似度的"人设相似度评分"　0%为截然不同，100%为完全一致。用下表中权重：
 
-Here are the influencer analyses you will be comparing:
+{A_WEIGHT_TABLE}
 
-{{INFLUENCER_ANALYSES}}
+如果A项评分小于70%可以忽略下一步。如果A项评分大于70%请继续分析Ｂ，Ｃ，Ｄ项的异同，并给出以'北大老孙.txt'为参考的"值得模仿评分" (0%为'北大老孙.txt'无法模仿，100%为'北大老孙.txt'完全可以复制）
+
+{BCD_WEIGHT_TABLE}
+
+The influencer analyses you will be comparing are provided in the user's message.
 
 Please provide your analysis using the following structure:
 
@@ -73,9 +90,39 @@ Please provide your analysis using the following structure:
 请确保您的分析基于提供的信息，客观公正，不要做出超出给定数据的假设。
 """
 
+# Pairwise prompt for the matrix mode. Persona similarity is symmetric, so one
+# request per pair answers it once and gives the imitation score in both directions.
+PAIR_PROMPT = f"""
+用户消息中有两位短视频博主的画像。请给出两人在A项中的"人设相似度评分"　0%为截然不同，100%为完全一致。用下表中权重：
+
+{A_WEIGHT_TABLE}
+
+人设相似度是对称的，只需给出一个评分。如果A项评分小于70%可以忽略下一步。如果A项评分大于70%请继续分析Ｂ，Ｃ，Ｄ项的异同，并分别以每位博主为参考给出"值得模仿评分" (0%为参考博主无法模仿，100%为参考博主完全可以复制）
+
+{BCD_WEIGHT_TABLE}
+
+Please provide your analysis using the following structure:
+
+<analysis>
+1. 人设相似度评分: [评分]%
+   (详细说明各A项权重的计算过程和结果)
+
+2. 值得模仿评分: [如果适用，分别以两位博主为参考给出评分]%
+   (如果A项评分大于70%，分析B、C和D项的异同，并解释评分理由)
+
+3. 总结:
+   (简要总结两位博主的主要相似点和差异，以及可能的模仿价值)
+</analysis>
+
+最后在<scores>标签中输出一行JSON，imitation 的键是作为参考的博主文件名，不适用时为 null，例如：
+<scores>{{"similarity": 75, "imitation": {{"博主甲.txt": 80, "博主乙.txt": 65}}}}</scores>
+
+请确保您的分析基于提供的信息，客观公正，不要做出超出给定数据的假设。
+"""
+
 def read_analysis_files(directory: str) -> Dict[str, str]:
     """
-    Read all .txt files in the specified directory.
+    Read all persona .txt files in the specified directory, skipping earlier comparison output.
 
     Args:
         directory (str): Path to the directory containing analysis files.
@@ -85,54 +132,65 @@ def read_analysis_files(directory: str) -> Dict[str, str]:
     """
     analyses = {}
     for filename in os.listdir(directory):
-        if filename.endswith('.txt'):
+        if filename.endswith('.txt') and not filename.startswith(OUTPUT_PREFIXES):
             with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
                 analyses[filename] = f.read()
     return analyses
 
-def compare_influencers(analyses: Dict[str, str], output_file: str) -> None:
+def compare_influencers(analyses: Dict[str, str], output_file: str, stream: bool = STREAM) -> None:
     """
     Compare influencers using the Claude API and save the results.
 
     Args:
         analyses (Dict[str, str]): Dictionary of analysis contents.
         output_file (str): Path to save the comparison results.
+        stream (bool): Stream the response into output_file as it is generated.
 
     Raises:
         requests.RequestException: If there's an error communicating with the Claude API.
     """
     headers = {
         'Content-Type': 'application/json',
-        'X-API-Key': CLAUDE_API_KEY,
+        'X-API-Key': require_api_key(),
         'anthropic-version': '2023-06-01'
     }
     
+    # The reference analysis is the same on every run, so it joins the cached prefix
+    others = {filename: content for filename, content in analyses.items() if filename != REFERENCE_FILE}
+    reference_block = (f"Reference influencer ({REFERENCE_FILE}):\n{analyses[REFERENCE_FILE]}"
+                       if REFERENCE_FILE in analyses else '')
     influencer_analyses = "\n\n".join([f"Influencer {i+1} ({filename}):\n{content}" 
-                                       for i, (filename, content) in enumerate(analyses.items())])
+                                       for i, (filename, content) in enumerate(others.items())])
     
     data = {
-        'model': 'claude-3-5-sonnet-20240620',
+        'model': MODEL,
         'max_tokens': 5000,
         'temperature': 1.0,
+        'system': cached_system(COMPARISON_PROMPT, reference_block),
         'messages': [
             {
                 'role': 'user',
-                'content': [{'type': 'text', 'text': COMPARISON_PROMPT.replace('{{INFLUENCER_ANALYSES}}', influencer_analyses)}]
+                'content': [{'type': 'text', 'text': influencer_analyses}]
             }
         ]
     }
     
+    if not stream:
+        result = post_message(CLAUDE_API_URL, headers, data, 'compare', MAX_RETRIES, RETRY_DELAY,
+                              output=os.path.basename(output_file))
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(f"Comparison of influencers:\n\n")
+            f.write(result['content'][0]['text'])
+        logger.info(f"Comparison completed. Results saved to {output_file}")
+        return
+
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(CLAUDE_API_URL, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            comparison = result['content'][0]['text']
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"Comparison of influencers:\n\n")
-                f.write(comparison)
-            
+            start_time = time.time()
+            comparison, usage, first_token = stream_message(CLAUDE_API_URL, headers, data, output_file,
+                                                            preamble=f"Comparison of influencers:\n\n")
+            record_usage('compare', usage, time.time() - start_time, first_token=first_token, model=MODEL,
+                         output=os.path.basename(output_file))
             logger.info(f"Comparison completed. Results saved to {output_file}")
             return
         except requests.RequestException as e:
@@ -144,13 +202,241 @@ def compare_influencers(analyses: Dict[str, str], output_file: str) -> None:
                 logger.error("Max retries reached. Unable to complete comparison.")
                 raise
 
+def content_hash(text: str) -> str:
+    """SHA-1 of an analysis, used to key cached pair results."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def pair_cache_path(hash_a: str, hash_b: str, cache_dir: str = PAIR_CACHE_DIRECTORY) -> str:
+    """Cache file for a pair, keyed by both contents, the model and the prompt but not by order or file names."""
+    key = hashlib.sha1('\n'.join([MODEL, PAIR_PROMPT] + sorted([hash_a, hash_b])).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+def build_pair_request(name_a: str, text_a: str, name_b: str, text_b: str) -> Dict[str, Any]:
+    """
+    Build the request comparing two influencers with PAIR_PROMPT.
+
+    Args:
+        name_a (str): Filename of the first analysis.
+        text_a (str): Content of the first analysis.
+        name_b (str): Filename of the second analysis.
+        text_b (str): Content of the second analysis.
+
+    Returns:
+        Dict[str, Any]: Messages API request body.
+    """
+    pair_analyses = f"Influencer 1 ({name_a}):\n{text_a}\n\nInfluencer 2 ({name_b}):\n{text_b}"
+    return {
+        'model': MODEL,
+        'max_tokens': 5000,
+        'temperature': 1.0,
+        'system': cached_system(PAIR_PROMPT),
+        'messages': [{'role': 'user', 'content': [{'type': 'text', 'text': pair_analyses}]}]
+    }
+
+def parse_pair_scores(text: str, name_a: str, name_b: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the scores from a pair comparison.
+
+    Reads the <scores> JSON line and falls back to the 人设相似度评分 line of the
+    analysis when it is missing; imitation scores are only taken from the JSON.
+
+    Args:
+        text (str): Claude's answer.
+        name_a (str): Filename of the first analysis.
+        name_b (str): Filename of the second analysis.
+
+    Returns:
+        Optional[Dict[str, Any]]: {'similarity': float, 'imitation': {name: float or None}},
+            or None if no similarity score was found.
+    """
+    match = re.search(r'<scores>(.*?)</scores>', text, re.S)
+    if match:
+        try:
+            scores = json.loads(match.group(1))
+            imitation = scores.get('imitation') or {}
+            return {
+                'similarity': float(scores['similarity']),
+                'imitation': {name: None if imitation.get(name) is None else float(imitation[name])
+                              for name in (name_a, name_b)}
+            }
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning(f"Unreadable <scores> for {name_a} / {name_b}: {match.group(1)}")
+    match = re.search(r'人设相似度评分[:：]\s*(\d+(?:\.\d+)?)\s*%', text)
+    if not match:
+        return None
+    return {'similarity': float(match.group(1)), 'imitation': {name_a: None, name_b: None}}
+
+def compare_pair(name_a: str, text_a: str, name_b: str, text_b: str,
+                 cache_dir: str = PAIR_CACHE_DIRECTORY) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Score one pair of influencers, reusing the cached result while neither analysis changes.
+
+    Args:
+        name_a (str): Filename of the first analysis.
+        text_a (str): Content of the first analysis.
+        name_b (str): Filename of the second analysis.
+        text_b (str): Content of the second analysis.
+        cache_dir (str): Directory of cached pair results.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], bool]: The scores as returned by parse_pair_scores
+            (None if Claude's answer had none), and whether they came from the cache.
+
+    Raises:
+        requests.RequestException: If there's an error communicating with the Claude API.
+    """
+    hash_a, hash_b = content_hash(text_a), content_hash(text_b)
+    cache_path = pair_cache_path(hash_a, hash_b, cache_dir)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        # Imitation scores are stored by content hash so renamed files still hit the cache
+        imitation = {name_a: cached['imitation'][hash_a], name_b: cached['imitation'][hash_b]}
+        return {'similarity': cached['similarity'], 'imitation': imitation}, True
+
+    headers = {
+        'Content-Type': 'application/json',
+        'X-API-Key': require_api_key(),
+        'anthropic-version': '2023-06-01'
+    }
+    result = post_message(CLAUDE_API_URL, headers, build_pair_request(name_a, text_a, name_b, text_b),
+                          'compare_pair', MAX_RETRIES, RETRY_DELAY, pair=f"{name_a}|{name_b}")
+    analysis = result['content'][0]['text']
+    scores = parse_pair_scores(analysis, name_a, name_b)
+    if scores is None:
+        # Not cached, so the pair is asked again on the next run
+        logger.warning(f"No similarity score in the comparison of {name_a} and {name_b}")
+        return None, False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    record = {
+        'similarity': scores['similarity'],
+        'imitation': {hash_a: scores['imitation'][name_a], hash_b: scores['imitation'][name_b]},
+        'files': {hash_a: name_a, hash_b: name_b},
+        'analysis': analysis
+    }
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, cache_path)
+    return scores, False
+
+def write_matrix(path: str, names: List[str], matrix: Dict[str, Dict[str, Optional[float]]],
+                 matrix_format: str) -> None:
+    """
+    Write a square score matrix with one row and one column per influencer.
+
+    Args:
+        path (str): Output path without extension.
+        names (List[str]): Influencer filenames, in row and column order.
+        matrix (Dict[str, Dict[str, Optional[float]]]): Scores by row and column name; None is left empty.
+        matrix_format (str): 'csv' or 'parquet'.
+
+    Raises:
+        ImportError: If Parquet output is requested and pyarrow is not installed.
+    """
+    if matrix_format == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet matrices require pyarrow: pip install pyarrow") from e
+        columns = {'influencer': pa.array(names, pa.string())}
+        for column in names:
+            columns[column] = pa.array([matrix[row][column] for row in names], pa.float64())
+        pq.write_table(pa.table(columns), f"{path}.parquet")
+        return
+
+    with open(f"{path}.csv", 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['influencer'] + names)
+        for row in names:
+            writer.writerow([row] + ['' if matrix[row][column] is None else matrix[row][column] for column in names])
+
+def compare_matrix(analyses: Dict[str, str], output_dir: str, matrix_format: str = 'csv',
+                   workers: int = MATRIX_WORKERS, cache_dir: str = PAIR_CACHE_DIRECTORY) -> Dict[str, int]:
+    """
+    Compare every influencer with every other and save similarity and imitation matrices.
+
+    Similarity is symmetric, so each unordered pair is one request that also
+    returns the imitation score with either influencer as the reference. Pairs
+    run concurrently and are cached by the content of both analyses, so after
+    editing one file only the pairs that involve it are sent again.
+
+    Args:
+        analyses (Dict[str, str]): Dictionary of analysis contents.
+        output_dir (str): Directory for similarity_matrix and imitation_matrix.
+        matrix_format (str): 'csv' or 'parquet'.
+        workers (int): Concurrent pair requests.
+        cache_dir (str): Directory of cached pair results.
+
+    Returns:
+        Dict[str, int]: Number of pairs, cache hits, fresh comparisons and failures.
+    """
+    names = sorted(analyses)
+    pairs = list(combinations(names, 2))
+    similarity = {row: {column: (100.0 if row == column else None) for column in names} for row in names}
+    # Rows are the influencer, columns the reference they would imitate
+    imitation = {row: {column: None for column in names} for row in names}
+    stats = {'pairs': len(pairs), 'cached': 0, 'compared': 0, 'failed': 0}
+
+    def run_pair(pair: Tuple[str, str]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        name_a, name_b = pair
+        try:
+            return compare_pair(name_a, analyses[name_a], name_b, analyses[name_b], cache_dir)
+        except requests.RequestException as e:
+            logger.error(f"Comparison of {name_a} and {name_b} failed: {str(e)}")
+            return None, False
+
+    logger.info(f"Comparing {len(names)} influencers in {len(pairs)} pairs with {workers} workers")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (name_a, name_b), (scores, cached) in zip(pairs, executor.map(run_pair, pairs)):
+            if scores is None:
+                stats['failed'] += 1
+                continue
+            stats['cached' if cached else 'compared'] += 1
+            similarity[name_a][name_b] = similarity[name_b][name_a] = scores['similarity']
+            imitation[name_a][name_b] = scores['imitation'][name_b]
+            imitation[name_b][name_a] = scores['imitation'][name_a]
+
+    write_matrix(os.path.join(output_dir, 'similarity_matrix'), names, similarity, matrix_format)
+    write_matrix(os.path.join(output_dir, 'imitation_matrix'), names, imitation, matrix_format)
+    logger.info(f"Matrices saved to {output_dir}: {stats['cached']} cached, {stats['compared']} compared, "
+                f"{stats['failed']} failed")
+    return stats
+
+def select_candidates(ranking: List[Dict[str, Any]], threshold: float = LOCAL_THRESHOLD,
+                      limit: int = MAX_LLM_CANDIDATES) -> List[str]:
+    """
+    Pick the influencers worth a Claude comparison from a local similarity ranking.
+
+    Args:
+        ranking (List[Dict[str, Any]]): Output of persona_similarity.score_personas, best match first.
+        threshold (float): Minimum local score (0-100) to be considered.
+        limit (int): Maximum number of influencers to return.
+
+    Returns:
+        List[str]: Filenames of the closest influencers at or above the threshold.
+    """
+    return [entry['name'] for entry in ranking if entry['score'] >= threshold][:limit]
+
+
 def main():
     """
     Main function to run the influencer comparison process.
     """
+    parser = argparse.ArgumentParser(description="Compare analyzed influencers with the reference persona.")
+    parser.add_argument("--input-dir", default=INPUT_DIRECTORY, help="Directory of persona analysis .txt files")
+    parser.add_argument("--output-dir", default=OUTPUT_DIRECTORY, help="Directory for the similarity and comparison files")
+    parser.add_argument("--matrix", action="store_true",
+                        help="Compare every influencer with every other instead of only with the reference")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Matrix file format")
+    parser.add_argument("--workers", type=int, default=MATRIX_WORKERS, help="Concurrent pair requests in matrix mode")
+    args = parser.parse_args()
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    input_dir = os.path.normpath(os.path.join(script_dir, '..', INPUT_DIRECTORY))
-    output_dir = os.path.normpath(os.path.join(script_dir, '..', OUTPUT_DIRECTORY))
+    input_dir = os.path.normpath(os.path.join(script_dir, '..', args.input_dir))
+    output_dir = os.path.normpath(os.path.join(script_dir, '..', args.output_dir))
 
     if not os.path.isdir(input_dir):
         logger.error(f"Error: The directory '{input_dir}' does not exist.")
@@ -164,9 +450,27 @@ def main():
             logger.error("No analysis files found in the input directory.")
             return
 
-        influencer_names = "_vs_".join(os.path.splitext(os.path.basename(file))[0] for file in analyses)
+        if args.matrix:
+            compare_matrix(analyses, output_dir, args.format, args.workers)
+            return
+
+        # Rank everyone locally and only send the closest matches to Claude
+        ranking = score_personas(analyses, REFERENCE_FILE)
+        reference_name = os.path.splitext(REFERENCE_FILE)[0]
+        table_file = os.path.join(output_dir, f"similarity_{reference_name}.txt")
+        with open(table_file, 'w', encoding='utf-8') as f:
+            f.write(format_similarity_table(ranking, REFERENCE_FILE))
+        logger.info(f"Local similarity table saved to {table_file}")
+
+        candidates = select_candidates(ranking)
+        if not candidates:
+            logger.info(f"No influencer reached the local threshold of {LOCAL_THRESHOLD}%, skipping Claude comparison.")
+            return
+        selected = {name: analyses[name] for name in [REFERENCE_FILE] + candidates}
+
+        influencer_names = "_vs_".join(os.path.splitext(os.path.basename(file))[0] for file in selected)
         output_file = os.path.join(output_dir, f"comparison_{influencer_names}.txt")
-        compare_influencers(analyses, output_file)
+        compare_influencers(selected, output_file)
     except Exception as e:
         logger.exception(f"An error occurred during influencer comparison: {str(e)}")
 
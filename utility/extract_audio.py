@@ -1,55 +1,426 @@
+# Audio Extraction Utility
+#
+# Extracts the audio track of videos with ffmpeg. The source codec is probed
+# first and the audio packets are copied into the target container when it can
+# hold them (e.g. AAC into .m4a, MP3 into .mp3), which is limited by disk speed
+# rather than decoding; otherwise the audio is transcoded.
+#
+# iter_pcm() decodes a video or audio file straight to mono float PCM chunks
+# for transcription, without writing an audio file, and speech_chunks() splits
+# PCM into chunks of speech with a simple energy-based voice activity detector.
+#
+# Usage: python extract_audio.py <video or folder> [--format mp3|m4a|...|auto]
+# [--workers N] [--transcode], or run it without arguments and follow the prompts.
+# --format auto keeps the source codec and picks a matching container.
+
 import os
-from moviepy.editor import VideoFileClip
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from extract_frames import probe_video
+
+# format: (codecs that can be copied into the container, ffmpeg arguments for transcoding)
+AUDIO_FORMATS = {
+    'mp3': ({'mp3'}, ['-c:a', 'libmp3lame', '-q:a', '2']),
+    'm4a': ({'aac', 'alac'}, ['-c:a', 'aac', '-b:a', '192k']),
+    'aac': ({'aac'}, ['-c:a', 'aac', '-b:a', '192k']),
+    'opus': ({'opus'}, ['-c:a', 'libopus', '-b:a', '128k']),
+    'ogg': ({'vorbis', 'opus', 'flac'}, ['-c:a', 'libvorbis', '-q:a', '5']),
+    'flac': ({'flac'}, ['-c:a', 'flac']),
+    'wav': ({'pcm_s16le', 'pcm_s24le', 'pcm_f32le', 'pcm_u8'}, ['-c:a', 'pcm_s16le']),
+    'mka': (None, ['-c:a', 'flac']),  # Matroska holds any codec
+}
+# Container for --format auto, by source codec; other codecs go into mka
+AUTO_FORMATS = {'aac': 'm4a', 'alac': 'm4a', 'mp3': 'mp3', 'opus': 'opus', 'vorbis': 'ogg', 'flac': 'flac',
+                'pcm_s16le': 'wav', 'pcm_s24le': 'wav', 'pcm_f32le': 'wav', 'pcm_u8': 'wav'}
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.mkv', '.webm', '.avi', '.flv', '.ts', '.wmv')
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.wav', '.flac', '.ogg', '.opus', '.mka')
+AUDIO_WORKERS = 4  # concurrent ffmpeg processes in folder mode
+SAMPLE_RATE = 16000  # Whisper's input rate
+PCM_CHUNK_SECONDS = 600  # 38 MB of float32 samples per chunk at 16 kHz
+SPLIT_SEARCH_SECONDS = 5  # chunks end at the quietest point of their last seconds
+SPLIT_WINDOW_SECONDS = 0.1
+VAD_FRAME_SECONDS = 0.03
+VAD_MARGIN_DB = 12  # frames this much louder than the noise floor are speech
+VAD_FLOOR_DB = -55  # never treat quieter frames as speech, e.g. in digital silence
+VAD_LOUD_DB = -35  # always treat louder frames as speech, e.g. talking over music
+VAD_MIN_SILENCE = 0.5  # shorter pauses do not end a speech region
+VAD_MIN_SPEECH = 0.25  # shorter speech regions are dropped as clicks
+SPEECH_CHUNK_SECONDS = 29  # Whisper hears 30 s at a time; leave room for the padding
+SPEECH_PAD_SECONDS = 0.2  # audio kept around each speech chunk
+
+def audio_stream(video_info):
+    """Return the first audio stream of ffprobe's output, or None if the file has none."""
+    for stream in video_info.get('streams', []):
+        if stream.get('codec_type') == 'audio':
+            return stream
+    return None
+
+def audio_codec_args(codec, output_format, transcode=False):
+    """
+    Choose between copying and transcoding a codec into an output format.
+
+    Args:
+    codec (str): Source audio codec name from ffprobe.
+    output_format (str): One of AUDIO_FORMATS.
+    transcode (bool): Always re-encode, even if the codec could be copied.
+
+    Returns:
+    tuple: ('copy' or 'transcode', ffmpeg codec arguments).
+    """
+    copyable, transcode_args = AUDIO_FORMATS[output_format]
+    if not transcode and (copyable is None or codec in copyable):
+        return 'copy', ['-c:a', 'copy']
+    return 'transcode', transcode_args
+
+def default_audio_path(video_path, output_format, output_folder=None):
+    """Return <output folder or Data>/<video name>_audio.<format>, creating the folder."""
+    # Get the video file name without extension
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    # Create the output folder in the Data directory unless another one was given
+    if output_folder is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        output_folder = os.path.join(os.path.dirname(script_dir), 'Data')
+    os.makedirs(output_folder, exist_ok=True)
+    return os.path.join(output_folder, f"{video_name}_audio.{output_format}")
+
+def extract_audio_file(video_path, output_format='mp3', output_path=None, transcode=False, output_folder=None):
+    """
+    Extract the first audio track of a video and time it.
+
+    Args:
+    video_path (str): Path to the input video file.
+    output_format (str): One of AUDIO_FORMATS, or 'auto' to keep the source codec.
+    output_path (str): Output file; defaults to Data/<video name>_audio.<format>.
+    transcode (bool): Re-encode even if the audio could be copied.
+    output_folder (str): Folder for the default output file name instead of Data.
+
+    Returns:
+    dict: video, output, mode ('copy' or 'transcode'), codec, duration and
+        seconds (elapsed), and speed (audio seconds per second of work).
 
-def extract_audio(video_path, output_format='mp3'):
+    Raises:
+    ValueError: If the video cannot be probed, has no audio or the format is unknown.
+    subprocess.CalledProcessError: If ffmpeg fails.
+    """
+    start_time = time.time()
+    video_info = probe_video(video_path)
+    if video_info is None:
+        raise ValueError(f"Unable to probe video: {video_path}")
+    stream = audio_stream(video_info)
+    if stream is None:
+        raise ValueError(f"The file has no audio stream: {video_path}")
+    codec = stream.get('codec_name', '')
+    if output_format == 'auto':
+        output_format = AUTO_FORMATS.get(codec, 'mka')
+    if output_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    mode, codec_args = audio_codec_args(codec, output_format, transcode)
+    output_path = output_path or default_audio_path(video_path, output_format, output_folder)
+    ffmpeg_command = [
+        'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-y',
+        '-i', video_path,
+        '-map', '0:a:0', '-vn', '-sn', '-dn',
+        *codec_args,
+        output_path
+    ]
+    result = subprocess.run(ffmpeg_command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, ffmpeg_command, stderr=result.stderr)
+
+    elapsed = time.time() - start_time
+    duration = float(stream.get('duration') or video_info.get('format', {}).get('duration') or 0)
+    return {'video': video_path, 'output': output_path, 'mode': mode, 'codec': codec,
+            'duration': duration, 'seconds': elapsed, 'speed': duration / elapsed if elapsed else 0.0}
+
+def format_report(stats):
+    """One line per extracted file: mode, codec and speed relative to real time."""
+    return (f"{os.path.basename(stats['output'])}: {stats['mode']} {stats['codec']}, "
+            f"{stats['duration']:.1f} s of audio in {stats['seconds']:.2f} s (x{stats['speed']:.0f} real time)")
+
+def extract_audio(video_path, output_format='mp3', output_path=None, transcode=False):
     """
     Extract audio from a video file and save it in the Data directory.
-    
+
     Args:
     video_path (str): Path to the input video file.
-    output_format (str): Desired output audio format (default is 'mp3').
-    
+    output_format (str): Desired output audio format (default is 'mp3'), or 'auto' to keep the source codec.
+    output_path (str): Output file instead of Data/<video name>_audio.<format>.
+    transcode (bool): Re-encode even if the audio could be copied.
+
     Returns:
-    str: Path to the extracted audio file.
+    str: Path to the extracted audio file, or None if extraction failed.
     """
     try:
-        # Get the video file name without extension
-        video_name = os.path.splitext(os.path.basename(video_path))[0]
-        
-        # Create the output folder in the Data directory
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        data_dir = os.path.join(os.path.dirname(script_dir), 'Data')
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Create output audio file path
-        output_path = os.path.join(data_dir, f"{video_name}_audio.{output_format}")
-        
-        # Load the video file
-        video = VideoFileClip(video_path)
-        
-        # Extract the audio
-        audio = video.audio
-        
-        # Write the audio to a file
-        audio.write_audiofile(output_path)
-        
-        # Close the video to release resources
-        video.close()
-        
-        print(f"Audio extracted successfully: {output_path}")
-        return output_path
-    
+        stats = extract_audio_file(video_path, output_format, output_path, transcode)
+    except subprocess.CalledProcessError as e:
+        print(f"Error extracting audio: {e.stderr.strip()}")
+        return None
     except Exception as e:
         print(f"Error extracting audio: {str(e)}")
         return None
 
-if __name__ == "__main__":
-    video_path = input("Enter the path to your video file: ").strip("'\"")
-    output_format = input("Enter the desired output audio format (default is mp3): ") or 'mp3'
-    
-    extracted_audio_path = extract_audio(video_path, output_format)
-    
+    print(f"Audio extracted successfully: {format_report(stats)}")
+    return stats['output']
+
+def quietest_point(samples, search_samples, window_samples):
+    """Return the index of the middle of the quietest window among the last search_samples samples."""
+    search_samples = min(search_samples, len(samples))
+    windows = search_samples // window_samples
+    if windows < 2:
+        return len(samples)
+    tail = samples[len(samples) - windows * window_samples:]
+    energy = np.square(tail).reshape(windows, window_samples).mean(axis=1)
+    return len(samples) - windows * window_samples + int(np.argmin(energy)) * window_samples + window_samples // 2
+
+def speech_regions(samples, sample_rate=SAMPLE_RATE, min_silence=VAD_MIN_SILENCE, min_speech=VAD_MIN_SPEECH):
+    """
+    Find the speech in PCM samples by frame energy relative to the noise floor.
+
+    This errs towards keeping audio: anything above VAD_LOUD_DB counts as
+    speech, so speech over background music is kept whole rather than cut up.
+
+    Args:
+    samples (np.ndarray): Mono float samples.
+    sample_rate (int): Sample rate in Hz.
+    min_silence (float): Pauses shorter than this many seconds are bridged.
+    min_speech (float): Regions shorter than this many seconds are dropped.
+
+    Returns:
+    list: (start, end) sample indices of the speech regions, ascending.
+    """
+    frame = max(1, int(VAD_FRAME_SECONDS * sample_rate))
+    frames = len(samples) // frame
+    if frames == 0:
+        return []
+    energy = 10 * np.log10(np.square(samples[:frames * frame]).reshape(frames, frame).mean(axis=1) + 1e-10)
+    threshold = min(max(float(np.percentile(energy, 10)) + VAD_MARGIN_DB, VAD_FLOOR_DB), VAD_LOUD_DB)
+    speech = np.concatenate(([0], (energy > threshold).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(speech)).reshape(-1, 2) * frame
+    # The last partial frame belongs to the region that reaches the end
+    edges[edges == frames * frame] = len(samples)
+
+    regions = []
+    for start, end in edges.tolist():
+        if regions and start - regions[-1][1] < min_silence * sample_rate:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [(start, end) for start, end in regions if end - start >= min_speech * sample_rate]
+
+def speech_chunks(samples, regions=None, sample_rate=SAMPLE_RATE, max_seconds=SPEECH_CHUNK_SECONDS):
+    """
+    Group speech regions into chunks for transcription, dropping the silence between them.
+
+    Neighbouring regions share a chunk while it stays within max_seconds;
+    longer regions are split at their quietest point.
+
+    Args:
+    samples (np.ndarray): Mono float samples.
+    regions (list): (start, end) sample indices of speech, ascending; found with speech_regions if None.
+    sample_rate (int): Sample rate in Hz.
+    max_seconds (float): Maximum chunk length in seconds.
+
+    Returns:
+    list: (start, end) sample indices of the chunks, ascending and not overlapping.
+    """
+    max_samples = int(max_seconds * sample_rate)
+    window_samples = max(1, int(SPLIT_WINDOW_SECONDS * sample_rate))
+    pieces = []
+    for start, end in speech_regions(samples, sample_rate) if regions is None else regions:
+        while end - start > max_samples:
+            cut = start + quietest_point(samples[start:start + max_samples], max_samples // 3, window_samples)
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= max_samples:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+    return [(start, end) for start, end in chunks]
+
+def iter_pcm(input_path, chunk_seconds=PCM_CHUNK_SECONDS, sample_rate=SAMPLE_RATE, split_search=SPLIT_SEARCH_SECONDS):
+    """
+    Decode the first audio track of a video or audio file to mono float PCM, chunk by chunk.
+
+    ffmpeg decodes and resamples the audio once and writes raw float32
+    samples to a pipe, so no intermediate file is written and memory stays at
+    about one chunk however long the input is. Each chunk but the last ends
+    at the quietest point of its last split_search seconds, so chunk
+    boundaries rarely cut through a word.
+
+    Args:
+    input_path (str): Video or audio file.
+    chunk_seconds (float): Maximum chunk length in seconds.
+    sample_rate (int): Output sample rate in Hz.
+    split_search (float): Seconds at the end of a chunk searched for a quiet split point.
+
+    Yields:
+    tuple: (chunk start in seconds, float32 array of samples in -1..1).
+
+    Raises:
+    subprocess.CalledProcessError: If ffmpeg fails, e.g. the file has no audio.
+    """
+    ffmpeg_command = [
+        'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-i', input_path,
+        '-map', '0:a:0', '-vn', '-sn', '-dn',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 'f32le',
+        'pipe:1'
+    ]
+    process = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    messages = []
+    def read_stderr():
+        for line in iter(process.stderr.readline, b''):
+            messages.append(line.decode('utf-8', 'replace').rstrip())
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    reader.start()
+
+    chunk_samples = max(1, int(chunk_seconds * sample_rate))
+    search_samples = int(split_search * sample_rate)
+    window_samples = max(1, int(SPLIT_WINDOW_SECONDS * sample_rate))
+    carry = np.empty(0, dtype=np.float32)
+    offset = 0  # samples yielded so far
+    finished = False
+    try:
+        while True:
+            # Every chunk gets its own buffer, since the consumer may keep the previous one
+            chunk = np.empty(chunk_samples, dtype=np.float32)
+            chunk[:len(carry)] = carry
+            view = memoryview(chunk).cast('B')
+            filled = len(carry) * 4
+            while filled < len(view):
+                count = process.stdout.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if filled < len(view):
+                samples = filled // 4
+                if samples:
+                    yield offset / sample_rate, chunk[:samples]
+                break
+            cut = quietest_point(chunk, search_samples, window_samples)
+            yield offset / sample_rate, chunk[:cut]
+            carry = chunk[cut:].copy()
+            offset += cut
+        finished = True
+    finally:
+        # Stop ffmpeg if the consumer stopped early
+        if process.poll() is None and not finished:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        reader.join()
+        process.stderr.close()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, ffmpeg_command, stderr='\n'.join(messages[-20:]))
+
+def pcm_hash(input_path, chunk_seconds=PCM_CHUNK_SECONDS):
+    """
+    Hash the decoded mono 16 kHz PCM of a file.
+
+    The hash depends only on the audio, not on the container, file name or
+    metadata, so the same audio downloaded twice or muxed into another
+    video hashes the same.
+
+    Returns:
+    tuple: (hex SHA-1 digest, duration in seconds).
+    """
+    digest = hashlib.sha1()
+    samples = 0
+    for _, chunk in iter_pcm(input_path, chunk_seconds):
+        digest.update(chunk.tobytes())
+        samples += len(chunk)
+    return digest.hexdigest(), samples / SAMPLE_RATE
+
+def extract_audio_worker(task):
+    """Run extract_audio_file for one (video_path, output_format, transcode, output_folder) task in a pool."""
+    video_path, output_format, transcode, output_folder = task
+    try:
+        return extract_audio_file(video_path, output_format, transcode=transcode, output_folder=output_folder)
+    except subprocess.CalledProcessError as e:
+        return {'video': video_path, 'error': e.stderr.strip()}
+    except Exception as e:
+        return {'video': video_path, 'error': str(e)}
+
+def extract_audio_folder(input_folder, output_format='mp3', workers=AUDIO_WORKERS, transcode=False, output_folder=None):
+    """
+    Extract the audio of every video in a folder with a pool of processes.
+
+    Args:
+    input_folder (str): Folder with the videos (not searched recursively).
+    output_format (str): One of AUDIO_FORMATS, or 'auto'.
+    workers (int): Concurrent extractions.
+    transcode (bool): Re-encode even if the audio could be copied.
+    output_folder (str): Folder for the audio files instead of Data.
+
+    Returns:
+    list: extract_audio_file results, with only video and error keys for failed files.
+    """
+    video_paths = [os.path.join(input_folder, filename) for filename in sorted(os.listdir(input_folder))
+                   if filename.lower().endswith(VIDEO_EXTENSIONS)]
+    if not video_paths:
+        print(f"No videos found in {input_folder}")
+        return []
+
+    start_time = time.time()
+    tasks = [(video_path, output_format, transcode, output_folder) for video_path in video_paths]
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+        for stats in executor.map(extract_audio_worker, tasks):
+            if 'error' in stats:
+                print(f"Error extracting audio from {os.path.basename(stats['video'])}: {stats['error']}")
+            else:
+                print(format_report(stats))
+            results.append(stats)
+
+    elapsed = time.time() - start_time
+    done = [stats for stats in results if 'error' not in stats]
+    total = sum(stats['duration'] for stats in done)
+    print(f"Extracted {len(done)} of {len(results)} files: {total:.1f} s of audio in {elapsed:.2f} s "
+          f"(x{total / elapsed if elapsed else 0:.0f} real time)")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the audio track of a video, or of every video in a folder.")
+    parser.add_argument("video_path", nargs="?", help="Video file or folder of videos (prompted for if omitted)")
+    parser.add_argument("--format", choices=list(AUDIO_FORMATS) + ['auto'],
+                        help="Output audio format (default mp3; prompted for without video_path); "
+                             "auto keeps the source codec")
+    parser.add_argument("--output", help="Output file for a single video, or output folder for a folder")
+    parser.add_argument("--workers", type=int, default=AUDIO_WORKERS, help="Concurrent extractions in folder mode")
+    parser.add_argument("--transcode", action="store_true", help="Re-encode even if the audio could be copied")
+    args = parser.parse_args()
+
+    video_path = args.video_path or input("Enter the path to your video file: ").strip("'\"")
+    output_format = args.format
+    if output_format is None:
+        output_format = 'mp3' if args.video_path else input("Enter the desired output audio format (default is mp3): ") or 'mp3'
+
+    if os.path.isdir(video_path):
+        results = extract_audio_folder(video_path, output_format, args.workers, args.transcode, args.output)
+        return 1 if any('error' in stats for stats in results) else None
+
+    extracted_audio_path = extract_audio(video_path, output_format, args.output, args.transcode)
     if extracted_audio_path:
         print(f"Audio extraction completed. Output file: {extracted_audio_path}")
     else:
         print("Audio extraction failed.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,79 @@
 # Video Frame Extraction Utility
-# 
+#
 # This script provides functionality to extract frames from a video file at a specified frame rate.
 # It uses ffmpeg and ffprobe to process the video and extract information.
 #
 # Main components:
-# 1. extract_frames(video_path, output_fps): Extracts frames from the given video at the specified fps
-# 2. main(): Handles user input and calls extract_frames
+# 1. iter_frames(video_path, fps, size, pix_fmt): Streams decoded frames from ffmpeg as NumPy arrays
+# 2. save_frames(frames, output_folder, video_name): Optional disk sink writing frames as JPEGs
+# 3. extract_frames(video_path, output_fps): Extracts frames from the given video at the specified fps
+# 4. extract_frames_parallel(video_path, output_fps, workers): Same output, decoded in keyframe-aligned segments
+# 5. extract_scene_frames(video_path): Extracts one frame per shot plus a JSON shot list
+# 6. extract_frames_at(video_path, timestamps): Grabs frames at given times (or SRT line starts) by seeking
+# 7. main(): Handles user input and calls the extraction for the chosen mode
+#
+# Every mode can write a single indexed frame pack (see frame_pack.py) instead
+# of a folder of JPEGs with --pack.
 #
-# Usage: Run the script and follow the prompts to input video path and desired frame rate.
+# Usage: python extract_frames.py <video> [--fps N [--workers N] | --mode scene |
+# --mode sparse --at T... / --srt FILE / --count N] [--pack], or run it without
+# arguments and follow the prompts to input video path and desired frame rate.
 
 import subprocess
 import os
+import re
 import json
-from datetime import timedelta
+import math
+import bisect
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
 
-def extract_frames(video_path, output_fps=1):
-    # Generate output folder name based on video filename
-    video_name = os.path.splitext(os.path.basename(video_path))[0]
-    
-    # Create the output folder in the Data directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_dir = os.path.join(os.path.dirname(script_dir), 'Data')
-    output_folder = os.path.join(data_dir, f"output_{video_name}_fps{output_fps}")
+import numpy as np
+from PIL import Image
+
+from frame_filter import format_timestamp, MIN_INTERVAL, MAX_INTERVAL
+from frame_pack import FramePackWriter, PACK_EXTENSION
+
+# Bytes per pixel of the raw pixel formats iter_frames can produce
+PIXEL_FORMATS = {'rgb24': 3, 'bgr24': 3, 'rgba': 4, 'gray': 1}
+JPEG_QUALITY = 95  # close to ffmpeg's -q:v 2
+TIMESTAMP_WAIT = 30  # seconds to wait for a frame's showinfo line before giving up
+PTS_TIME = re.compile(r'\bpts_time:\s*(-?[\d.]+)')
+SCENE_THRESHOLD = 0.3  # ffmpeg scene score (0..1) that starts a new shot
+SHOT_LIST_FILE = 'shots.json'
+MERGE_WINDOW = 0.5  # seconds; requested times closer than this share one frame
+SEEK_WORKERS = 4  # concurrent ffmpeg seeks in extract_frames_at
+FFMPEG_VERSION = re.compile(r'^ffmpeg version n?(\d+)\.(\d+)')
+SRT_START = re.compile(r'^(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->', re.M)
+
+_modern_ffmpeg = None
+
+def modern_ffmpeg():
+    """
+    Check once whether ffmpeg is 5.1 or newer, which added -fps_mode and showinfo's checksum option.
     
-    # Create output folder if it doesn't exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    Development builds ("ffmpeg version N-...") have no release number and count as new.
+    """
+    global _modern_ffmpeg
+    if _modern_ffmpeg is None:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-version'], capture_output=True, text=True)
+        match = FFMPEG_VERSION.match(result.stdout)
+        _modern_ffmpeg = match is None or (int(match.group(1)), int(match.group(2))) >= (5, 1)
+    return _modern_ffmpeg
 
-    # Get video information using ffprobe
+def probe_video(video_path):
+    """
+    Read a video's format and stream information with ffprobe.
+
+    Args:
+    video_path (str): Path to the video file.
+
+    Returns:
+    dict: ffprobe's JSON output, or None if ffprobe failed.
+    """
     probe_command = [
         'ffprobe',
         '-v', 'quiet',
@@ -37,63 +83,559 @@ def extract_frames(video_path, output_fps=1):
         video_path
     ]
     probe_result = subprocess.run(probe_command, capture_output=True, text=True)
-    
+
     if probe_result.returncode != 0:
         print(f"Error: ffprobe command failed. Error output:")
         print(probe_result.stderr)
-        return
+        return None
 
     try:
-        video_info = json.loads(probe_result.stdout)
+        return json.loads(probe_result.stdout)
     except json.JSONDecodeError:
         print("Error: Unable to parse ffprobe output. ffprobe output:")
         print(probe_result.stdout)
-        return
+        return None
 
-    # Extract video properties
-    try:
-        duration = float(video_info['format']['duration'])
-    except KeyError:
-        print("Error: Unable to extract video duration. Video info:")
-        print(json.dumps(video_info, indent=2))
-        return
+def video_stream(video_info):
+    """Return the first video stream of ffprobe's output."""
+    for stream in video_info.get('streams', []):
+        if stream.get('codec_type') == 'video':
+            return stream
+    raise ValueError("The file has no video stream")
+
+def frame_size(video_info, size=None):
+    """
+    Resolve the size of the frames ffmpeg will output.
+
+    Args:
+    video_info (dict): ffprobe output from probe_video.
+    size (tuple): (width, height); None keeps the video's size and -1 for one
+        side keeps the aspect ratio.
+
+    Returns:
+    tuple: (width, height) in pixels.
+    """
+    stream = video_stream(video_info)
+    width, height = int(stream['width']), int(stream['height'])
+    # ffmpeg applies the rotation of phone videos while decoding
+    rotation = stream.get('tags', {}).get('rotate') or next(
+        (data.get('rotation') for data in stream.get('side_data_list', []) if 'rotation' in data), 0)
+    if int(float(rotation)) % 180 != 0:
+        width, height = height, width
+
+    if size is None:
+        return width, height
+    target_width, target_height = size
+    if target_width == -1 and target_height == -1:
+        return width, height
+    if target_width == -1:
+        target_width = max(2, round(width * target_height / height / 2) * 2)
+    elif target_height == -1:
+        target_height = max(2, round(height * target_width / width / 2) * 2)
+    return int(target_width), int(target_height)
+
+def iter_frames(video_path, fps=1, size=None, pix_fmt='rgb24', copy=False, filters=None, video_info=None,
+                start=None, end=None, threads=None, max_frames=None):
+    """
+    Decode a video with ffmpeg and yield its frames as NumPy arrays, without touching the disk.
 
-    total_frames = int(duration * output_fps)
+    ffmpeg writes rawvideo to a pipe and every frame is read into one reused
+    buffer, so the array yielded for a frame is overwritten by the next one;
+    pass copy=True, or copy the frames you keep. Timestamps come from the
+    frames' presentation times (ffmpeg's showinfo filter), measured from the
+    start of the video.
 
-    # FFmpeg command to extract frames
+    Args:
+    video_path (str): Path to the video file.
+    fps (float): Frames per second to sample, or None to keep every frame.
+    size (tuple): Output (width, height), see frame_size; None keeps the video's size.
+    pix_fmt (str): One of PIXEL_FORMATS; 'gray' yields 2-D arrays.
+    copy (bool): Yield an independent copy of every frame.
+    filters (list): Extra ffmpeg filters applied after fps sampling, e.g. a select expression.
+    video_info (dict): ffprobe output, if the caller already probed the video.
+    start (float): Seconds into the video to start decoding at, found by input seeking.
+    end (float): Seconds into the video to stop before.
+    threads (int): Decoder threads; None lets ffmpeg decide.
+    max_frames (int): Stop after this many frames.
+
+    Yields:
+    tuple: (timestamp in seconds, uint8 array of shape (height, width[, channels])).
+
+    Raises:
+    subprocess.CalledProcessError: If ffmpeg fails.
+    """
+    if pix_fmt not in PIXEL_FORMATS:
+        raise ValueError(f"Unsupported pixel format: {pix_fmt}")
+    video_info = video_info or probe_video(video_path)
+    if video_info is None:
+        raise ValueError(f"Unable to probe video: {video_path}")
+    width, height = frame_size(video_info, size)
+    # With -copyts, pts_time is on the file's own clock, which begins at start_time
+    start_time = float(video_info.get('format', {}).get('start_time', 0) or 0)
+
+    video_filters = []
+    if fps and start:
+        # Continue the sampling grid of a full decode, which begins at the first frame
+        grid_start = start_time + math.ceil(start * fps - 1e-6) / fps
+        video_filters.append(f'fps=fps={fps}:start_time={grid_start}')
+    elif fps:
+        video_filters.append(f'fps={fps}')
+    video_filters += filters or []
+    if (width, height) != frame_size(video_info):
+        video_filters.append(f'scale={width}:{height}')
+    # Per-frame checksums would cost as much as the scaling; older ffmpeg cannot turn them off
+    video_filters.append('showinfo=checksum=0' if modern_ffmpeg() else 'showinfo')
     ffmpeg_command = [
-        'ffmpeg',
+        'ffmpeg', '-hide_banner', '-nostdin', '-nostats', '-loglevel', 'info',
+        *(['-threads', str(threads)] if threads else []),
+        *(['-ss', str(start)] if start else []),
+        *(['-to', str(end)] if end is not None else []),
+        '-copyts',
         '-i', video_path,
-        '-vf', f'fps={output_fps},format=yuv420p',  # Add format filter
-        '-q:v', '2',  # Quality setting (lower is better, 2-5 is good range)
-        f'{output_folder}/{video_name}_%06d.jpg'
+        '-vf', ','.join(video_filters),
+        # One output frame per filtered frame; the default would duplicate frames to a constant rate
+        '-fps_mode' if modern_ffmpeg() else '-vsync', 'passthrough',
+        *(['-frames:v', str(max_frames)] if max_frames else []),
+        '-f', 'rawvideo',
+        '-pix_fmt', pix_fmt,
+        'pipe:1'
+    ]
+    process = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # showinfo reports each frame's pts on stderr; read it alongside the pixels
+    timestamps, messages = Queue(), []
+    def read_stderr():
+        for line in iter(process.stderr.readline, b''):
+            line = line.decode('utf-8', 'replace')
+            if 'Parsed_showinfo' not in line:
+                messages.append(line.rstrip())
+                continue
+            match = PTS_TIME.search(line)
+            if match:
+                timestamps.put(float(match.group(1)))
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    reader.start()
+
+    shape = (height, width) if pix_fmt == 'gray' else (height, width, PIXEL_FORMATS[pix_fmt])
+    frame_bytes = width * height * PIXEL_FORMATS[pix_fmt]
+    buffer = bytearray(frame_bytes)
+    view = memoryview(buffer)
+    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+    finished = False
+    try:
+        while True:
+            filled = 0
+            while filled < frame_bytes:
+                count = process.stdout.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+            if filled < frame_bytes:
+                break
+            try:
+                timestamp = timestamps.get(timeout=TIMESTAMP_WAIT)
+            except Empty:
+                raise RuntimeError("ffmpeg sent a frame without its showinfo timestamp")
+            yield max(0.0, timestamp - start_time), frame.copy() if copy else frame
+        finished = True
+    finally:
+        # Stop ffmpeg if the consumer stopped early
+        if process.poll() is None and not finished:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        reader.join()
+        process.stderr.close()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, ffmpeg_command, stderr='\n'.join(messages[-20:]))
+
+def save_frames(frames, output_folder, video_name, quality=JPEG_QUALITY):
+    """
+    Write frames as JPEGs named <video_name>_<H:MM:SS[.fff]>.jpg.
+
+    Args:
+    frames (iterable): (timestamp, array) pairs of RGB or grayscale frames, e.g. from iter_frames.
+    output_folder (str or FramePackWriter): Folder to write to, which must exist, or an open frame pack.
+    video_name (str): Filename prefix.
+    quality (int): JPEG quality; a pack uses its own.
+
+    Returns:
+    list: Paths of the written frames, in order (paths inside the pack for a pack).
+    """
+    paths = []
+    for timestamp, frame in frames:
+        name = f"{video_name}_{format_timestamp(timestamp)}.jpg"
+        if isinstance(output_folder, FramePackWriter):
+            paths.append(output_folder.add(name, timestamp, frame))
+            continue
+        path = os.path.join(output_folder, name)
+        Image.fromarray(frame).save(path, quality=quality)
+        paths.append(path)
+    return paths
+
+def output_folder_for(video_path, suffix, pack=False):
+    """Create and return Data/output_<video name>_<suffix> for a video's frames, or the path of its .fpack."""
+    # Generate output folder name based on video filename
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    # Create the output folder in the Data directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(os.path.dirname(script_dir), 'Data')
+    output_folder = os.path.join(data_dir, f"output_{video_name}_{suffix}")
+    if pack:
+        os.makedirs(data_dir, exist_ok=True)
+        return output_folder + PACK_EXTENSION
+
+    # Create output folder if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    return output_folder
+
+def open_output(video_path, suffix, output_folder=None, pack=False, metadata=None):
+    """
+    Resolve where a video's frames go and open it for save_frames.
+
+    Returns:
+    tuple: (output path, the folder path or a FramePackWriter to pass to save_frames).
+    """
+    output_folder = output_folder or output_folder_for(video_path, suffix, pack)
+    if not pack:
+        return output_folder, output_folder
+    metadata = {'video': os.path.basename(video_path), **(metadata or {})}
+    return output_folder, FramePackWriter(output_folder, metadata)
+
+def extract_frames(video_path, output_fps=1, output_folder=None, pack=False):
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    # Get video information using ffprobe
+    video_info = probe_video(video_path)
+    if video_info is None:
+        return
+
+    output_folder, output = open_output(video_path, f"fps{output_fps}", output_folder, pack, {'fps': output_fps})
+    # Frames are named by their presentation time as they are written, so no renaming pass is needed
+    with output if pack else contextlib.nullcontext():
+        paths = save_frames(iter_frames(video_path, output_fps, video_info=video_info), output, video_name)
+
+    print(f"Frame extraction completed: {len(paths)} frames. Output folder: {output_folder}")
+    return output_folder
+
+def keyframe_times(video_path, video_info):
+    """
+    List the keyframe times of a video's first video stream from its packet flags, without decoding.
+
+    Args:
+    video_path (str): Path to the video file.
+    video_info (dict): ffprobe output from probe_video.
+
+    Returns:
+    list: Keyframe times in seconds from the start of the video, ascending.
+    """
+    probe_command = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        video_path
     ]
+    probe_result = subprocess.run(probe_command, capture_output=True, text=True, check=True)
+    start_time = float(video_info.get('format', {}).get('start_time', 0) or 0)
+    times = set()
+    for line in probe_result.stdout.splitlines():
+        fields = line.split(',')
+        if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+            times.add(max(0.0, float(fields[0]) - start_time))
+    return sorted(times)
+
+def split_segments(keyframes, duration, count):
+    """
+    Split a video into about equally long segments that start on keyframes.
+
+    Input seeking to a keyframe is exact and cheap, so every segment decodes
+    only its own frames. Fewer segments are returned when keyframes are sparse.
+
+    Args:
+    keyframes (list): Keyframe times in seconds, ascending.
+    duration (float): Video duration in seconds.
+    count (int): Desired number of segments.
+
+    Returns:
+    list: (start, end) pairs in seconds; the last end is None (until the end of the video).
+    """
+    bounds = [0.0]
+    for i in range(1, count):
+        target = duration * i / count
+        position = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, position - 1):position + 1]
+        if not candidates:
+            continue
+        nearest = min(candidates, key=lambda time: abs(time - target))
+        if nearest > bounds[-1]:
+            bounds.append(nearest)
+    return list(zip(bounds, bounds[1:] + [None]))
+
+def extract_frames_parallel(video_path, output_fps=1, workers=None, output_folder=None, pack=False):
+    """
+    Extract frames like extract_frames, decoding keyframe-aligned segments in parallel.
+
+    Every worker runs its own ffmpeg with input seeking to its segment and keeps
+    the sampling grid and timestamps of a full decode, so the frames and their
+    names match extract_frames.
+
+    Args:
+    video_path (str): Path to the video file.
+    output_fps (float): Frames per second to extract.
+    workers (int): Parallel ffmpeg processes; defaults to the number of CPUs.
+    output_folder (str): Folder for the frames; defaults to Data/output_<video>_fps<N>.
+    pack (bool): Write one frame pack (Data/output_<video>_fps<N>.fpack) instead of a folder.
+
+    Returns:
+    str: The output folder or pack, or None if the video could not be probed.
+    """
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    workers = workers or os.cpu_count() or 1
+
+    video_info = probe_video(video_path)
+    if video_info is None:
+        return
+    output_folder, output = open_output(video_path, f"fps{output_fps}", output_folder, pack, {'fps': output_fps})
+
+    duration = float(video_info.get('format', {}).get('duration', 0) or 0)
+    segments = split_segments(keyframe_times(video_path, video_info), duration, workers)
+    # Split the cores between the workers instead of letting every decoder start one thread per core
+    threads = max(1, (os.cpu_count() or 1) // len(segments))
+
+    def extract_segment(segment):
+        start, end = segment
+        frames = iter_frames(video_path, output_fps, video_info=video_info, start=start, end=end, threads=threads)
+        return save_frames(frames, output, video_name)
+
+    # Segments finish out of order; a pack sorts its index by timestamp when it is closed
+    with output if pack else contextlib.nullcontext(), ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        segment_paths = list(executor.map(extract_segment, segments))
+    # A frame on a segment boundary can come from both neighbours under the same name
+    paths = list(dict.fromkeys(path for paths in segment_paths for path in paths))
+
+    print(f"Frame extraction completed: {len(paths)} frames from {len(segments)} segments. "
+          f"Output folder: {output_folder}")
+    return output_folder
+
+def srt_start_times(srt_path):
+    """Return the start times in seconds of the subtitle lines of an SRT file."""
+    with open(srt_path, 'r', encoding='utf-8-sig') as f:
+        content = f.read()
+    return [int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, '0')) / 1000
+            for hours, minutes, seconds, fraction in SRT_START.findall(content)]
+
+def evenly_spaced_times(duration, count):
+    """Return count times at the middle of equal slices of a video."""
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+def merge_times(timestamps, window=MERGE_WINDOW):
+    """
+    Merge duplicate and nearby timestamps so each frame is only grabbed once.
+
+    Args:
+    timestamps (list): Requested times in seconds, in any order.
+    window (float): Times less than this many seconds after a kept time reuse its frame.
+
+    Returns:
+    tuple: The sorted times to grab, and a dict mapping every requested time to one of them.
+    """
+    kept, mapping = [], {}
+    for timestamp in sorted(set(timestamps)):
+        if not kept or timestamp - kept[-1] >= window:
+            kept.append(timestamp)
+        mapping[timestamp] = kept[-1]
+    return kept, mapping
+
+def grab_frame(video_path, timestamp, video_info, size=None, pix_fmt='rgb24'):
+    """
+    Decode the first frame at or after a time with input seeking.
+
+    ffmpeg seeks to the keyframe before the time and decodes only from there,
+    so the cost does not depend on how far into the video the time is.
 
-    # Run FFmpeg command
-    subprocess.run(ffmpeg_command, check=True)
-
-    # Rename files to include timestamp
-    for i in range(1, total_frames + 1):
-        old_filename = f'{video_name}_{i:06d}.jpg'
-        timestamp = str(timedelta(seconds=i/output_fps)).rstrip('0').rstrip('.')
-        new_filename = f'{video_name}_{timestamp}.jpg'
-        
-        old_path = os.path.join(output_folder, old_filename)
-        new_path = os.path.join(output_folder, new_filename)
-        
-        if os.path.exists(old_path):
-            os.rename(old_path, new_path)
-            print(f"Renamed frame {i}/{total_frames}")
+    Returns:
+    tuple: (frame timestamp, array), or None if the time is past the last frame.
+    """
+    for frame in iter_frames(video_path, None, size, pix_fmt, copy=True, video_info=video_info,
+                             start=timestamp, threads=1, max_frames=1):
+        return frame
+    return None
+
+def extract_frames_at(video_path, timestamps=None, srt_path=None, count=None, output_folder=None,
+                      workers=SEEK_WORKERS, window=MERGE_WINDOW, pack=False):
+    """
+    Extract frames at specific times only, instead of decoding the whole video.
+
+    The times come from timestamps, the line starts of an SRT file, or count
+    evenly spaced points. Nearby times are merged and the remaining ones are
+    grabbed concurrently by separate seeking ffmpeg processes. Frames are named
+    by their own presentation time.
+
+    Args:
+    video_path (str): Path to the video file.
+    timestamps (list): Times in seconds.
+    srt_path (str): SRT file whose line start times are used.
+    count (int): Number of evenly spaced times.
+    output_folder (str): Folder for the frames; defaults to Data/output_<video>_sparse.
+    workers (int): Concurrent ffmpeg processes.
+    window (float): Seconds within which requested times share a frame.
+    pack (bool): Write one frame pack (Data/output_<video>_sparse.fpack) instead of a folder.
+
+    Returns:
+    dict: Mapping of every requested time to its frame path (None past the end of the video).
+    """
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    video_info = probe_video(video_path)
+    if video_info is None:
+        return {}
+
+    requested = list(timestamps or [])
+    if srt_path:
+        requested += srt_start_times(srt_path)
+    if count:
+        requested += evenly_spaced_times(float(video_info['format']['duration']), count)
+    if not requested:
+        return {}
+    output_folder, output = open_output(video_path, "sparse", output_folder, pack)
+
+    to_grab, mapping = merge_times(requested, window)
+    def grab(timestamp):
+        frame = grab_frame(video_path, timestamp, video_info)
+        if frame is None:
+            print(f"No frame at {format_timestamp(timestamp)}, past the end of the video")
+            return None
+        return save_frames([frame], output, video_name)[0]
+
+    with output if pack else contextlib.nullcontext(), ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        paths = dict(zip(to_grab, executor.map(grab, to_grab)))
+
+    print(f"Extracted {sum(path is not None for path in paths.values())} frames for {len(requested)} "
+          f"requested times. Output folder: {output_folder}")
+    return {timestamp: paths[mapping[timestamp]] for timestamp in requested}
+
+def scene_select_filter(threshold=SCENE_THRESHOLD, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+    """
+    Build the ffmpeg select filter that keeps the first frame of every shot.
+
+    A frame starts a new shot when its scene score exceeds threshold and at
+    least min_interval seconds have passed since the last kept frame. Static
+    shots are re-sampled every max_interval seconds, as in frame_filter.
+
+    Returns:
+    str: Filter for iter_frames' filters argument.
+    """
+    expression = f"isnan(prev_selected_t)+gt(scene,{threshold})*gte(t-prev_selected_t,{min_interval})"
+    if max_interval is not None:
+        expression += f"+gte(t-prev_selected_t,{max_interval})"
+    return f"select='{expression}'"
+
+def build_shot_list(timestamps, duration):
+    """
+    Turn the start times of consecutive shots into shot records.
+
+    Args:
+    timestamps (list): Shot start times in seconds, ascending.
+    duration (float): Video duration in seconds; the end of the last shot.
+
+    Returns:
+    list: One dict per shot with keys index, start and end (seconds).
+    """
+    ends = timestamps[1:] + [max(duration, timestamps[-1])] if timestamps else []
+    return [{'index': i, 'start': round(start, 3), 'end': round(end, 3)}
+            for i, (start, end) in enumerate(zip(timestamps, ends))]
+
+def extract_scene_frames(video_path, threshold=SCENE_THRESHOLD, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                         pack=False):
+    """
+    Extract one frame per shot in a single decode pass, with a JSON shot list.
+
+    ffmpeg's scene score picks the first frame of every shot; each frame is
+    named by its presentation time and shots.json in the output folder gives
+    the span of video every frame stands for. frame_explain uses the shot list
+    instead of filtering the folder again. A pack stores the shot list in its
+    metadata under 'shots' instead.
+
+    Args:
+    video_path (str): Path to the video file.
+    threshold (float): Scene score (0..1) that starts a new shot.
+    min_interval (float): Minimum shot length in seconds.
+    max_interval (float): Maximum shot length in seconds, or None.
+    pack (bool): Write one frame pack (Data/output_<video>_scene.fpack) instead of a folder.
+
+    Returns:
+    str: The output folder or pack, or None if the video could not be probed.
+    """
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    video_info = probe_video(video_path)
+    if video_info is None:
+        return
+    output_folder, output = open_output(video_path, "scene", None, pack)
+
+    # Decode every frame (no fps sampling) so cuts are found at the exact frame
+    shots = []
+    def shot_frames():
+        select = scene_select_filter(threshold, min_interval, max_interval)
+        for timestamp, frame in iter_frames(video_path, None, filters=[select], video_info=video_info):
+            shots.append(timestamp)
+            yield timestamp, frame
+    with output if pack else contextlib.nullcontext():
+        paths = save_frames(shot_frames(), output, video_name)
+
+        duration = float(video_info.get('format', {}).get('duration', 0) or 0)
+        shot_list = build_shot_list(shots, duration)
+        for shot, path in zip(shot_list, paths):
+            shot['frame'] = os.path.basename(path)
+        shots_info = {'video': os.path.basename(video_path), 'duration': duration, 'threshold': threshold,
+                      'shots': shot_list}
+        if pack:
+            output.metadata.update(shots_info)
         else:
-            print(f"Frame {i} not found, skipping...")
+            with open(os.path.join(output_folder, SHOT_LIST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(shots_info, f, ensure_ascii=False, indent=2)
 
-    print(f"Frame extraction completed. Output folder: {output_folder}")
+    print(f"Scene extraction completed: {len(paths)} shots. Output folder: {output_folder}")
+    return output_folder
 
 def main():
-    video_path = input("Enter the path to your video file: ").strip("'\"")  # Remove quotes if present
-    output_fps = float(input("Enter the desired output frame rate (e.g., 1 for 1 frame per second): "))
-    
-    extract_frames(video_path, output_fps)
+    parser = argparse.ArgumentParser(description="Extract frames from a video with ffmpeg.")
+    parser.add_argument("video_path", nargs="?", help="Video file (prompted for if omitted)")
+    parser.add_argument("--fps", type=float,
+                        help="Frames per second to extract in fps mode (default 1; prompted for without video_path)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Decode this many keyframe-aligned segments in parallel in fps mode (0: one per CPU)")
+    parser.add_argument("--mode", choices=["fps", "scene", "sparse"], default="fps",
+                        help="fps: sample at a fixed rate; scene: one frame per shot plus shots.json; "
+                             "sparse: only the frames at --at, --srt or --count times")
+    parser.add_argument("--at", type=float, nargs="+", help="Times in seconds to extract in sparse mode")
+    parser.add_argument("--srt", help="Extract the frames at the line starts of this SRT file in sparse mode")
+    parser.add_argument("--count", type=int, help="Extract this many evenly spaced frames in sparse mode")
+    parser.add_argument("--threshold", type=float, default=SCENE_THRESHOLD, help="Scene score that starts a new shot")
+    parser.add_argument("--pack", action="store_true",
+                        help="Write a single indexed .fpack file instead of a folder of JPEGs")
+    args = parser.parse_args()
+
+    video_path = args.video_path or input("Enter the path to your video file: ").strip("'\"")  # Remove quotes if present
+    if args.mode == "scene":
+        extract_scene_frames(video_path, args.threshold, pack=args.pack)
+        return
+    if args.mode == "sparse":
+        if not (args.at or args.srt or args.count):
+            parser.error("sparse mode needs --at, --srt or --count")
+        extract_frames_at(video_path, args.at, args.srt, args.count, pack=args.pack)
+        return
+    output_fps = args.fps
+    if output_fps is None:
+        output_fps = 1 if args.video_path else float(input("Enter the desired output frame rate (e.g., 1 for 1 frame per second): "))
+
+    if args.workers != 1:
+        extract_frames_parallel(video_path, output_fps, args.workers or None, pack=args.pack)
+    else:
+        extract_frames(video_path, output_fps, pack=args.pack)
 
 if __name__ == "__main__":
     main()
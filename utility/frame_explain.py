@@ -1,105 +1,348 @@
 import os
 import json
-import anthropic
-import base64
+import time
+import argparse
+from frame_filter import filter_frames, format_timestamp
+from extract_frames import SHOT_LIST_FILE
+from frame_pack import is_pack, open_pack, open_image, list_frames, member_path
+from batch_jobs import BatchJob, result_text, default_job_name
+import image_prep
+import model_router
 
-# Initialize the Anthropic client with the API key from environment variable
-client = anthropic.Anthropic(
-    api_key=os.environ.get("ANTHROPIC_API_KEY")
-)
+ANTHROPIC_BASE_URL = os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
 
-def process_frame(image_path):
+# Anthropic client, created on first use so importing this module needs no API key
+client = None
+
+TASK = "frames"  # model policy in model_router: a fast model first, a larger one when its answer is rejected
+FIELDS = ["environment", "action", "goods", "expression", "transcript"]
+IMAGE_TOKEN_BUDGET = 12000  # image tokens allowed in one batched request
+FRAME_IMAGE_TOKENS = image_prep.QUALITY_TIERS[os.environ.get("FRAME_IMAGE_QUALITY", "medium")]  # cap per frame
+MAX_BATCH_SIZE = 10  # frames per request; also keeps the JSON answer within max_tokens
+TOKENS_PER_FRAME_RESPONSE = 350
+MAX_RESPONSE_TOKENS = 4096
+
+FRAME_PROMPT = """Analyze this image and provide the following information:
+    1. Environment: Describe the setting or location.
+    2. Action: Describe any actions or activities taking place.
+    3. Goods: List any notable objects or items visible.
+    4. Expression: Describe the facial expressions or emotions of any people.
+    5. Transcript: If there's any text visible in the image, provide a transcript.
+
+    Please format your response as a JSON object with keys: environment, action, goods, expression, transcript, and confidence (a number from 0 to 1 for how sure you are of this description).
     """
-    Process a single frame using Claude API.
+
+BATCH_PROMPT = """Each image above is a video frame, preceded by a line giving its timestamp. For every frame, provide the following information:
+    1. Environment: Describe the setting or location.
+    2. Action: Describe any actions or activities taking place.
+    3. Goods: List any notable objects or items visible.
+    4. Expression: Describe the facial expressions or emotions of any people.
+    5. Transcript: If there's any text visible in the image, provide a transcript.
+
+    Please format your response as a JSON array with one object per frame, in the same order as the frames. Each object must have the keys: timestamp (copied exactly from the frame's label), environment, action, goods, expression, transcript, and confidence (a number from 0 to 1 for how sure you are of this frame's description). Respond with the JSON array only.
+    """
+
+def get_client():
+    """Return the Anthropic client, creating it with the API key from the environment on first use."""
+    global client
+    if client is None:
+        # Imported here because the SDK takes seconds to load and most callers never need it
+        import anthropic
+        client = anthropic.Anthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY"),
+            base_url=ANTHROPIC_BASE_URL
+        )
+    return client
+
+def frame_timestamp(image_path):
+    """Return the timestamp part of a frame filename, e.g. '0:00:01.5'."""
+    return os.path.splitext(os.path.basename(image_path))[0].split('_')[-1]
+
+def image_block(image_path):
+    """
+    Downscale a frame to FRAME_IMAGE_TOKENS and wrap it in a base64 image content block.
     
     Args:
     image_path (str): Path to the image file.
     
     Returns:
-    dict: Extracted information from the frame.
+    tuple: Image content block for the messages API and its estimated input tokens.
     """
-    # Extract timestamp from filename
-    timestamp = os.path.basename(image_path).split('_')[-1].split('.')[0]
-    
-    # Read the image file and encode to base64
-    with open(image_path, "rb") as img_file:
-        img_data = base64.b64encode(img_file.read()).decode('utf-8')
+    prepared = image_prep.prepare_image(image_path, FRAME_IMAGE_TOKENS)
+    return image_prep.image_block(prepared), prepared["estimated_tokens"]
 
-    # Prepare the prompt for Claude
-    prompt = f"""Analyze this image and provide the following information:
-    1. Environment: Describe the setting or location.
-    2. Action: Describe any actions or activities taking place.
-    3. Goods: List any notable objects or items visible.
-    4. Expression: Describe the facial expressions or emotions of any people.
-    5. Transcript: If there's any text visible in the image, provide a transcript.
+def estimate_image_tokens(image_path):
+    """Estimate the input tokens a frame costs once image_block has downscaled it."""
+    with open_image(image_path) as img:
+        width, height = image_prep.fit_size(img.width, img.height, FRAME_IMAGE_TOKENS)
+    return image_prep.estimate_image_tokens(width, height)
+
+def choose_batch_size(image_paths, image_token_budget=IMAGE_TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE):
+    """
+    Choose how many frames to pack into one request.
+    
+    Args:
+    image_paths (list): Frames that will be processed; their sizes drive the estimate.
+    image_token_budget (int): Maximum image tokens per request.
+    max_batch_size (int): Upper bound on frames per request.
+    
+    Returns:
+    int: Number of frames per request, at least 1.
+    """
+    if not image_paths:
+        return 1
+    # Frames from one video share a size, so a handful of samples is enough
+    step = max(1, len(image_paths) // 5)
+    tokens_per_image = max(estimate_image_tokens(path) for path in image_paths[::step])
+    output_limit = (MAX_RESPONSE_TOKENS - 200) // TOKENS_PER_FRAME_RESPONSE
+    return max(1, min(max_batch_size, output_limit, image_token_budget // tokens_per_image))
 
-    Please format your response as a JSON object with keys: environment, action, goods, expression, and transcript.
+def parse_batch_response(text, timestamps):
     """
+    Split a batched JSON array response back into per-frame results.
+    
+    Args:
+    text (str): Claude's response text.
+    timestamps (list): Timestamps of the frames that were sent.
+    
+    Returns:
+    dict: Mapping of timestamp to result for every frame that parsed correctly.
+    """
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end < start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    results = {}
+    for item in items:
+        if not isinstance(item, dict) or not all(field in item for field in FIELDS):
+            continue
+        timestamp = str(item.get("timestamp", ""))
+        if timestamp in timestamps and timestamp not in results:
+            results[timestamp] = {field: item[field] for field in FIELDS}
+            if "confidence" in item:
+                results[timestamp]["confidence"] = item["confidence"]
+    return results
+
+def frame_accepted(result):
+    """Whether a parsed frame result can be kept without asking the next model of the chain."""
+    return result is not None and model_router.is_confident(result)
 
-    # Call Claude API
-    response = client.messages.create(
-        model="claude-3-sonnet-20240229",
-        max_tokens=1000,
-        messages=[
+def build_frame_request(image_path, model=None):
+    """Build the Messages API request for a single frame, with its estimated image tokens."""
+    block, estimated_tokens = image_block(image_path)
+    return {
+        "model": model or model_router.model_for(TASK),
+        "max_tokens": 1000,
+        "messages": [
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": img_data
-                        }
-                    },
+                    block,
                     {
                         "type": "text",
-                        "text": prompt
+                        "text": FRAME_PROMPT
                     }
                 ]
             }
         ]
-    )
+    }, estimated_tokens
+
+def log_usage(response, start_time, estimated_tokens, frames, model, escalated=0):
+    """Record a response's token usage and latency next to the image token estimate."""
+    usage = response.usage.model_dump() if getattr(response, "usage", None) is not None else None
+    model_router.record_call(TASK, model, usage, time.time() - start_time, escalated=escalated,
+                             estimated_image_tokens=estimated_tokens, frames=frames)
 
-    # Parse Claude's response
+def parse_frame_response(text):
+    """Parse a single-frame JSON response, or return None if it lacks any field."""
+    start, end = text.find('{'), text.rfind('}')
     try:
-        result = json.loads(response.content[0].text)
+        result = json.loads(text[start:end + 1]) if start != -1 and end > start else None
     except json.JSONDecodeError:
-        result = {
-            "environment": "Error parsing response",
-            "action": "Error parsing response",
-            "goods": "Error parsing response",
-            "expression": "Error parsing response",
-            "transcript": "Error parsing response"
-        }
+        return None
+    if not isinstance(result, dict) or not all(field in result for field in FIELDS):
+        return None
+    return result
+
+def process_frame(image_path, models=None):
+    """
+    Process a single frame using Claude API.
+    
+    The frame goes to the first model of the task's chain and moves on to the
+    next one only while the answer does not parse or reports low confidence.
+    
+    Args:
+    image_path (str): Path to the image file.
+    models (list): Models to try in order; defaults to the frames policy.
+    
+    Returns:
+    dict: Extracted information from the frame.
+    """
+    # Extract timestamp from filename
+    timestamp = frame_timestamp(image_path)
+    models = models or model_router.models_for(TASK)
+
+    result = None
+    for i, model in enumerate(models):
+        request, estimated_tokens = build_frame_request(image_path, model)
+        start_time = time.time()
+        response = get_client().messages.create(**request)
+        parsed = parse_frame_response(response.content[0].text)
+        escalate = not frame_accepted(parsed) and i < len(models) - 1
+        log_usage(response, start_time, estimated_tokens, 1, model, escalated=int(escalate))
+        # A low-confidence answer still beats none if no larger model is left
+        result = parsed or result
+        if not escalate:
+            break
+        print(f"Escalating frame {timestamp} from {model} to {models[i + 1]}")
+
+    if result is None:
+        result = {field: "Error parsing response" for field in FIELDS}
 
     # Add timestamp to the result
     result["timestamp"] = timestamp
 
     return result
 
-def process_frames(input_folder, output_file):
+def build_batch_request(image_paths, model=None):
+    """Build one Messages API request covering several labeled frames, with its estimated image tokens."""
+    content = []
+    estimated_tokens = 0
+    for image_path in image_paths:
+        block, tokens = image_block(image_path)
+        content.append({"type": "text", "text": f"Frame timestamp: {frame_timestamp(image_path)}"})
+        content.append(block)
+        estimated_tokens += tokens
+    content.append({"type": "text", "text": BATCH_PROMPT})
+
+    return {
+        "model": model or model_router.model_for(TASK),
+        "max_tokens": min(MAX_RESPONSE_TOKENS, 200 + TOKENS_PER_FRAME_RESPONSE * len(image_paths)),
+        "messages": [{"role": "user", "content": content}]
+    }, estimated_tokens
+
+def split_batch_response(text, image_paths):
     """
-    Process all frames in a folder and write results to a text file.
+    Match a batched response to its frames.
     
     Args:
-    input_folder (str): Path to the folder containing frame images.
-    output_file (str): Path to the output text file.
+    text (str): Claude's response text, or None if the request failed.
+    image_paths (list): Frames that were sent.
+    
+    Returns:
+    list: One result per frame in input order, or None where the frame needs a retry.
     """
+    timestamps = [frame_timestamp(path) for path in image_paths]
+    parsed = parse_batch_response(text, set(timestamps)) if text else {}
     results = []
+    for timestamp in timestamps:
+        result = parsed.get(timestamp)
+        if result is not None:
+            result["timestamp"] = timestamp
+        results.append(result)
+    return results
+
+def process_frame_batch(image_paths):
+    """
+    Process several frames in one Claude API request.
+    
+    Frames are sent as separate labeled image blocks and Claude answers with one
+    JSON array. The batch goes to the first model of the task's chain; frames
+    whose answer is missing, fails to parse or reports low confidence are sent
+    again, as a smaller batch, to the next model. Frames the last model still
+    leaves unanswered are retried individually with process_frame.
+    
+    Args:
+    image_paths (list): Paths to the image files.
+    
+    Returns:
+    list: Extracted information for each frame, in input order.
+    """
+    models = model_router.models_for(TASK)
+    results = [None] * len(image_paths)
+    pending = list(range(len(image_paths)))
+    for level, model in enumerate(models):
+        last = level == len(models) - 1
+        paths = [image_paths[i] for i in pending]
+        request, estimated_tokens = build_batch_request(paths, model)
+        start_time = time.time()
+        response = get_client().messages.create(**request)
+        answers = split_batch_response(response.content[0].text, paths)
+        for i, answer in zip(pending, answers):
+            # The last model's low-confidence answers are kept; there is nobody left to ask
+            if frame_accepted(answer) or (last and answer is not None):
+                results[i] = answer
+        pending = [i for i in pending if results[i] is None]
+        log_usage(response, start_time, estimated_tokens, len(paths), model, escalated=0 if last else len(pending))
+        if not pending:
+            break
+        if not last:
+            print(f"Escalating {len(pending)} of {len(paths)} frames from {model} to {models[level + 1]}")
 
-    # Process each frame in the input folder
-    for filename in sorted(os.listdir(input_folder)):
-        if filename.endswith(('.jpg', '.jpeg', '.png')):
-            image_path = os.path.join(input_folder, filename)
-            print(f"Processing frame: {filename}")
-            result = process_frame(image_path)
-            results.append(result)
+    for i in pending:
+        print(f"Retrying frame individually: {os.path.basename(image_paths[i])}")
+        results[i] = process_frame(image_paths[i], models[-1:])
+    return results
 
-    # Write results to the output file
+def load_shot_list(input_folder):
+    """Return the frames of a folder or pack written by extract_frames --mode scene, or None for others."""
+    if is_pack(input_folder):
+        shots = open_pack(input_folder).metadata.get('shots')
+        if shots is None:
+            return None
+        return [{'path': member_path(input_folder, shot['frame']), 'start': shot['start'], 'end': shot['end']}
+                for shot in shots]
+    shot_list_path = os.path.join(input_folder, SHOT_LIST_FILE)
+    if not os.path.exists(shot_list_path):
+        return None
+    with open(shot_list_path, 'r', encoding='utf-8') as f:
+        shots = json.load(f)['shots']
+    return [{'path': os.path.join(input_folder, shot['frame']), 'start': shot['start'], 'end': shot['end']}
+            for shot in shots]
+
+def select_frames(input_folder, scene_filter=True):
+    """
+    List the frames in a folder or frame pack, keeping one per scene if scene_filter is set.
+    
+    Folders and packs extracted in scene mode already hold one frame per shot;
+    their shot list is used as is.
+    
+    Returns:
+    list: Frame records with keys path, start and end (None without scene filtering).
+    """
+    shots = load_shot_list(input_folder)
+    if shots is not None:
+        print(f"Using the shot list of {len(shots)} shots")
+        return shots
+
+    image_paths = list_frames(input_folder)
+
+    if not scene_filter:
+        return [{'path': path, 'start': None, 'end': None} for path in image_paths]
+
+    frames = filter_frames(image_paths)
+    print(f"Scene filter kept {len(frames)} of {len(image_paths)} frames")
+    return frames
+
+def add_span(result, frame):
+    """Record the span of video a scene-filtered frame stands for."""
+    if frame['start'] is not None:
+        result["span"] = f"{format_timestamp(frame['start'])} - {format_timestamp(frame['end'])}"
+    return result
+
+def write_results(results, output_file):
+    """Write frame results to the output text file."""
     with open(output_file, 'w', encoding='utf-8') as f:
         for result in results:
             f.write(f"Timestamp: {result['timestamp']}\n")
+            if 'span' in result:
+                f.write(f"Span: {result['span']}\n")
             f.write(f"Environment: {result['environment']}\n")
             f.write(f"Action: {result['action']}\n")
             f.write(f"Goods: {result['goods']}\n")
@@ -109,7 +352,108 @@ def process_frames(input_folder, output_file):
 
     print(f"Processing complete. Results written to {output_file}")
 
-if __name__ == "__main__":
+def process_frames(input_folder, output_file, scene_filter=True, batch=True):
+    """
+    Process all frames in a folder and write results to a text file.
+    
+    Args:
+    input_folder (str): Path to the folder containing frame images.
+    output_file (str): Path to the output text file.
+    scene_filter (bool): Only send one representative frame per scene to Claude.
+    batch (bool): Pack several frames into each request, sized by IMAGE_TOKEN_BUDGET.
+    
+    Each result covers the span of video between its Span start and end, so the
+    timeline stays complete when near-identical frames are skipped.
+    """
+    results = []
+    frames = select_frames(input_folder, scene_filter)
+
+    # Process the kept frames, several per request when batching
+    batch_size = choose_batch_size([frame['path'] for frame in frames]) if batch else 1
+    for i in range(0, len(frames), batch_size):
+        chunk = frames[i:i + batch_size]
+        print(f"Processing frames: {', '.join(os.path.basename(frame['path']) for frame in chunk)}")
+        if batch_size == 1:
+            chunk_results = [process_frame(chunk[0]['path'])]
+        else:
+            chunk_results = process_frame_batch([frame['path'] for frame in chunk])
+        for frame, result in zip(chunk, chunk_results):
+            results.append(add_span(result, frame))
+
+    write_results(results, output_file)
+    print(model_router.format_summary(model_router.summarize(model_router.session_entries())))
+
+def process_frames_offline(input_folder, output_file, scene_filter=True, job_name=None):
+    """
+    Process all frames in a folder through the Message Batches API.
+    
+    Frames are packed as in process_frames, submitted as one checkpointed batch
+    job, and written to the same output format once the batch has ended. Running
+    again with the same job name re-attaches to the submitted batch. Frames whose
+    result is missing or unparseable are retried individually with process_frame.
+    
+    Args:
+    input_folder (str): Path to the folder containing frame images.
+    output_file (str): Path to the output text file.
+    scene_filter (bool): Only send one representative frame per scene to Claude.
+    job_name (str): Checkpoint name; defaults to one derived from the input folder.
+    """
+    headers = {
+        "content-type": "application/json",
+        "x-api-key": os.environ.get("ANTHROPIC_API_KEY"),
+        "anthropic-version": "2023-06-01"
+    }
+    job = BatchJob(job_name or default_job_name('frames', [input_folder]),
+                   f"{ANTHROPIC_BASE_URL}/v1/messages/batches", headers)
+    results_dir = os.path.join(job.job_directory, 'results')
+    os.makedirs(results_dir, exist_ok=True)
+
+    frames = select_frames(input_folder, scene_filter)
+    batch_size = choose_batch_size([frame['path'] for frame in frames])
+    chunks = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+
+    def requests_to_send():
+        for i, chunk in enumerate(chunks):
+            request, estimated_tokens = build_batch_request([frame['path'] for frame in chunk])
+            yield f"frames_{i:06d}", request, {'chunk': i, 'estimated_tokens': estimated_tokens}
+
+    def handle_result(custom_id, result, target):
+        # Persist each chunk's parsed results so a restart does not lose them
+        chunk_paths = [frame['path'] for frame in chunks[target['chunk']]]
+        if result.get('type') == 'succeeded':
+            model_router.record_call(TASK, result['message'].get('model'), result['message'].get('usage'),
+                                     estimated_image_tokens=target.get('estimated_tokens'),
+                                     frames=len(chunk_paths), batch=True)
+        with open(os.path.join(results_dir, f"{custom_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(split_batch_response(result_text(result), chunk_paths), f, ensure_ascii=False)
+
+    job.run(requests_to_send(), handle_result)
+
+    results = []
+    for i, chunk in enumerate(chunks):
+        chunk_file = os.path.join(results_dir, f"frames_{i:06d}.json")
+        chunk_results = [None] * len(chunk)
+        if os.path.exists(chunk_file):
+            with open(chunk_file, 'r', encoding='utf-8') as f:
+                chunk_results = json.load(f)
+        for frame, result in zip(chunk, chunk_results):
+            if not frame_accepted(result):
+                print(f"Retrying frame individually: {os.path.basename(frame['path'])}")
+                # The batch used the first model; start from the next one unless it is the only one
+                result = process_frame(frame['path'], model_router.models_for(TASK)[1:] or None)
+            results.append(add_span(result, frame))
+
+    write_results(results, output_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Describe video frames with Claude.")
+    parser.add_argument("input_folder", nargs="?", default="output_test2_fps1.0",
+                        help="Folder of frames named <video>_<timestamp>.jpg, or a .fpack frame pack")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit the frames as a Message Batches job and wait for the results")
+    parser.add_argument("--job", help="Batch job name; reuse it to re-attach after a restart")
+    args = parser.parse_args()
+
     if not os.environ.get("ANTHROPIC_API_KEY"):
         print("Error: ANTHROPIC_API_KEY environment variable is not set.")
         print("Please set your API key using:")
@@ -117,10 +461,10 @@ if __name__ == "__main__":
         exit(1)
 
     # Set input_folder
-    input_folder = "output_test2_fps1.0"
+    input_folder = args.input_folder
 
     # Extract video name from input folder
-    video_name = input_folder.split('_')[1]  # Assumes format "output_videoname_fps1.0"
+    video_name = os.path.basename(os.path.normpath(input_folder)).split('_')[1]  # Assumes format "output_videoname_fps1.0"
 
     # Set output_file based on video name
     output_file = f"{video_name}_frame_analysis.txt"
@@ -140,4 +484,10 @@ if __name__ == "__main__":
     print(f"Processing frames from: {input_folder}")
     print(f"Writing output to: {output_file}")
 
-    process_frames(input_folder, output_file)
+    if args.batch:
+        process_frames_offline(input_folder, output_file, job_name=args.job)
+    else:
+        process_frames(input_folder, output_file)
+
+if __name__ == "__main__":
+    main()
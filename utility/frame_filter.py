@@ -0,0 +1,181 @@
+import os
+import logging
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from PIL import Image
+
+from frame_pack import open_image
+
+logger = logging.getLogger(__name__)
+
+# Constants
+THUMBNAIL_SIZE = (64, 64)  # frames are compared as small grayscale thumbnails
+HISTOGRAM_BINS = 32
+HASH_SIZE = 8  # dHash uses a (HASH_SIZE, HASH_SIZE + 1) thumbnail -> 64 bit hash
+HISTOGRAM_THRESHOLD = 0.25  # half L1 distance between normalized histograms, 0..1
+HASH_THRESHOLD = 12  # hamming distance in bits, 0..64
+MIN_INTERVAL = 1.0  # seconds; never start two scenes closer than this
+MAX_INTERVAL = 10.0  # seconds; force a new representative at least this often
+
+
+def parse_timestamp(filename: str) -> float:
+    """
+    Parse the timestamp written by extract_frames into a frame filename.
+
+    Args:
+        filename (str): Frame filename or path, e.g. "video_0:01:02.5.jpg".
+
+    Returns:
+        float: Timestamp in seconds.
+
+    Raises:
+        ValueError: If the filename does not end in an H:MM:SS timestamp.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parts = stem.split('_')[-1].split(':')
+    if '.' not in parts[-1] and len(parts) in (2, 3):
+        # Older extract_frames versions stripped trailing zeros from whole-second names,
+        # down into the minutes on exact minutes and hours ("0:00:10" -> "0:00:1", "0:10:00" -> "0:1", "1:00:00" -> "1:")
+        parts = [parts[0]] + [part.ljust(2, '0') for part in parts[1:]] + ['00'] * (3 - len(parts))
+    if len(parts) != 3 or not parts[0].isdigit():
+        raise ValueError(f"No timestamp found in frame filename: {filename}")
+    hours, minutes, seconds = parts
+    try:
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        raise ValueError(f"No timestamp found in frame filename: {filename}") from None
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as H:MM:SS with a fractional part only when needed."""
+    text = str(timedelta(seconds=round(seconds, 3)))
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def load_thumbnails(image_paths: List[str]) -> np.ndarray:
+    """
+    Load frames as grayscale thumbnails stacked into one array.
+
+    Args:
+        image_paths (List[str]): Paths to the frame images or frame pack members.
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, height, width).
+    """
+    width, height = THUMBNAIL_SIZE
+    thumbs = np.empty((len(image_paths), height, width), dtype=np.uint8)
+    for i, path in enumerate(image_paths):
+        with open_image(path) as img:
+            img.draft('L', THUMBNAIL_SIZE)  # lets JPEG decode at reduced scale
+            thumbs[i] = np.asarray(img.convert('L').resize(THUMBNAIL_SIZE, Image.BILINEAR))
+    return thumbs
+
+
+def histogram_distances(thumbs: np.ndarray) -> np.ndarray:
+    """
+    Compute histogram distances between consecutive thumbnails.
+
+    Args:
+        thumbs (np.ndarray): uint8 array of shape (N, height, width).
+
+    Returns:
+        np.ndarray: Array of shape (N,), where element i is the distance between
+            frame i and frame i - 1 (element 0 is 0). Values are in [0, 1].
+    """
+    n = len(thumbs)
+    if n == 0:
+        return np.zeros(0)
+    bins = thumbs.reshape(n, -1).astype(np.intp) * HISTOGRAM_BINS // 256
+    # Offset each frame's bins so a single bincount builds all histograms at once
+    bins += np.arange(n)[:, None] * HISTOGRAM_BINS
+    hists = np.bincount(bins.ravel(), minlength=n * HISTOGRAM_BINS).reshape(n, HISTOGRAM_BINS)
+    hists = hists / hists.sum(axis=1, keepdims=True)
+    distances = np.zeros(n)
+    distances[1:] = 0.5 * np.abs(np.diff(hists, axis=0)).sum(axis=1)
+    return distances
+
+
+def dhashes(thumbs: np.ndarray) -> np.ndarray:
+    """
+    Compute 64 bit difference hashes for all thumbnails.
+
+    Args:
+        thumbs (np.ndarray): uint8 array of shape (N, height, width).
+
+    Returns:
+        np.ndarray: Boolean array of shape (N, HASH_SIZE * HASH_SIZE).
+    """
+    n, height, width = thumbs.shape
+    # Block-average down to (HASH_SIZE, HASH_SIZE + 1) without a per-frame resize
+    rows = np.linspace(0, height, HASH_SIZE + 1).astype(int)
+    cols = np.linspace(0, width, HASH_SIZE + 2).astype(int)
+    small = np.add.reduceat(np.add.reduceat(thumbs.astype(np.float32), rows[:-1], axis=1), cols[:-1], axis=2)
+    small /= np.outer(np.diff(rows), np.diff(cols))
+    return (small[:, :, 1:] > small[:, :, :-1]).reshape(n, -1)
+
+
+def filter_frames(image_paths: List[str],
+                  histogram_threshold: float = HISTOGRAM_THRESHOLD,
+                  hash_threshold: int = HASH_THRESHOLD,
+                  min_interval: float = MIN_INTERVAL,
+                  max_interval: Optional[float] = MAX_INTERVAL) -> List[Dict[str, Any]]:
+    """
+    Keep one representative frame per scene.
+
+    A new scene starts when the histogram distance to the previous frame or the
+    dHash distance to the current scene's first frame exceeds its threshold, and
+    at least min_interval seconds have passed since the scene started. Static
+    shots are re-sampled every max_interval seconds so long scenes are not
+    collapsed into a single frame.
+
+    Args:
+        image_paths (List[str]): Paths to frames named by extract_frames.
+        histogram_threshold (float): Histogram distance that counts as a cut.
+        hash_threshold (int): dHash hamming distance that counts as a cut.
+        min_interval (float): Minimum scene length in seconds.
+        max_interval (Optional[float]): Maximum scene length in seconds, or None.
+
+    Returns:
+        List[Dict[str, Any]]: One record per kept frame with keys path,
+            timestamp (seconds), start and end (seconds of the span it stands for).
+    """
+    if not image_paths:
+        return []
+
+    frames = sorted(image_paths, key=parse_timestamp)
+    times = np.array([parse_timestamp(path) for path in frames])
+    thumbs = load_thumbnails(frames)
+    hist_dist = histogram_distances(thumbs)
+    hashes = dhashes(thumbs)
+
+    # Scene boundaries depend on where the previous scene started, so this pass is
+    # sequential; every comparison in it is a cheap lookup into precomputed arrays.
+    starts = [0]
+    for i in range(1, len(frames)):
+        start = starts[-1]
+        elapsed = times[i] - times[start]
+        if max_interval is not None and elapsed >= max_interval:
+            starts.append(i)
+        elif elapsed >= min_interval and (
+                hist_dist[i] > histogram_threshold
+                or np.count_nonzero(hashes[i] != hashes[start]) > hash_threshold):
+            starts.append(i)
+
+    frame_step = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    ends = starts[1:] + [len(frames)]
+    kept = []
+    for start, end in zip(starts, ends):
+        # The middle frame avoids transition blur at the cut itself
+        middle = (start + end - 1) // 2
+        span_end = times[end] if end < len(frames) else times[-1] + frame_step
+        kept.append({
+            'path': frames[middle],
+            'timestamp': float(times[middle]),
+            'start': float(times[start]),
+            'end': float(span_end),
+        })
+
+    logger.info(f"Scene filter kept {len(kept)} of {len(frames)} frames")
+    return kept
@@ -0,0 +1,261 @@
+"""
+Packed frame archives: many encoded frames in one indexed file.
+
+A pack replaces a folder of loose frame JPEGs. Frames are stored back to back
+after a magic header, followed by a JSON index (name, timestamp, offset and
+length of every frame, plus free-form metadata such as a shot list) and a
+fixed-size footer pointing at the index:
+
+    MAGIC | frame 0 | frame 1 | ... | index JSON | MAGIC + index offset (uint64 LE)
+
+Readers map the file into memory and read any frame by index, name or
+timestamp without touching the others. Frames inside a pack are addressed with
+paths of the form <pack file>/<frame name>, so code that takes frame paths can
+use open_image(), read_bytes() and list_frames() to accept packs and folders alike.
+"""
+import io
+import os
+import json
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Constants
+PACK_EXTENSION = '.fpack'
+MAGIC = b'OMEGAFPK'
+FOOTER = struct.Struct('<8sQ')  # magic, index offset
+VERSION = 1
+JPEG_QUALITY = 95
+MAX_OPEN_PACKS = 8  # readers kept open by open_image and list_frames
+
+
+class FramePackWriter:
+    """
+    Write frames into a pack.
+
+    Frames may be added in any order and from several threads; the index is
+    sorted by timestamp when the pack is closed. The pack is written to a
+    .partial file and only renamed into place by close(), so an interrupted
+    extraction never leaves a pack that looks complete.
+    """
+
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None, quality: int = JPEG_QUALITY):
+        """
+        Args:
+            path (str): Pack file to create.
+            metadata (Optional[Dict[str, Any]]): JSON-serializable data stored in the index.
+            quality (int): JPEG quality for frames added as arrays.
+        """
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.quality = quality
+        self.entries: List[Tuple[str, float, int, int]] = []
+        self.lock = threading.Lock()
+        self.file = open(f"{path}.partial", 'wb')
+        self.file.write(MAGIC)
+
+    def add(self, name: str, timestamp: float, frame: Union[np.ndarray, bytes]) -> str:
+        """
+        Append one frame.
+
+        Args:
+            name (str): Frame name, e.g. "video_0:00:01.jpg"; unique within the pack.
+            timestamp (float): Seconds from the start of the video.
+            frame (Union[np.ndarray, bytes]): RGB or grayscale array, or already encoded image bytes.
+
+        Returns:
+            str: Path of the frame inside the pack.
+        """
+        if isinstance(frame, np.ndarray):
+            buffer = io.BytesIO()
+            Image.fromarray(frame).save(buffer, format='JPEG', quality=self.quality)
+            frame = buffer.getvalue()
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(frame)
+            self.entries.append((name, float(timestamp), offset, len(frame)))
+        return member_path(self.path, name)
+
+    def close(self) -> None:
+        """Write the index and footer and move the pack into place."""
+        with self.lock:
+            if self.file.closed:
+                return
+            # Later additions of the same name replace earlier ones
+            entries = sorted({entry[0]: entry for entry in self.entries}.values(), key=lambda entry: entry[1])
+            index_offset = self.file.tell()
+            index = {'version': VERSION, 'metadata': self.metadata,
+                     'frames': [list(entry) for entry in entries]}
+            self.file.write(json.dumps(index, ensure_ascii=False).encode('utf-8'))
+            self.file.write(FOOTER.pack(MAGIC, index_offset))
+            self.file.close()
+            os.replace(f"{self.path}.partial", self.path)
+
+    def __enter__(self) -> 'FramePackWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+class FramePack:
+    """
+    Read a pack through a memory map.
+
+    Lookups by position and by exact name or timestamp are O(1); the nearest
+    frame to an arbitrary timestamp is a binary search over the sorted index.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Pack file.
+
+        Raises:
+            ValueError: If the file is not a complete pack.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < len(MAGIC) + FOOTER.size or self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a frame pack: {path}")
+        magic, index_offset = FOOTER.unpack(self.map[-FOOTER.size:])
+        if magic != MAGIC:
+            raise ValueError(f"Frame pack is incomplete: {path}")
+        index = json.loads(self.map[index_offset:len(self.map) - FOOTER.size].decode('utf-8'))
+        self.metadata: Dict[str, Any] = index.get('metadata', {})
+        frames = index['frames']
+        self.names: List[str] = [frame[0] for frame in frames]
+        self.timestamps = np.array([frame[1] for frame in frames], dtype=np.float64)
+        self.offsets = np.array([frame[2] for frame in frames], dtype=np.int64)
+        self.lengths = np.array([frame[3] for frame in frames], dtype=np.int64)
+        self.by_name = {name: i for i, name in enumerate(self.names)}
+        self.by_timestamp = {timestamp: i for i, timestamp in enumerate(self.timestamps.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def read(self, i: int) -> bytes:
+        """Return the encoded bytes of frame i."""
+        offset = int(self.offsets[i])
+        return self.map[offset:offset + int(self.lengths[i])]
+
+    def image(self, i: int) -> Image.Image:
+        """Open frame i as a PIL image."""
+        return Image.open(io.BytesIO(self.read(i)))
+
+    def index_at(self, timestamp: float) -> int:
+        """Return the position of the frame closest to a timestamp."""
+        exact = self.by_timestamp.get(timestamp)
+        if exact is not None:
+            return exact
+        position = int(np.searchsorted(self.timestamps, timestamp))
+        if position == 0:
+            return 0
+        if position == len(self.timestamps):
+            return position - 1
+        before, after = self.timestamps[position - 1], self.timestamps[position]
+        return position - 1 if timestamp - before <= after - timestamp else position
+
+    def frame_at(self, timestamp: float) -> Tuple[float, Image.Image]:
+        """Return the timestamp and image of the frame closest to a timestamp."""
+        i = self.index_at(timestamp)
+        return float(self.timestamps[i]), self.image(i)
+
+    def paths(self) -> List[str]:
+        """Paths of all frames inside the pack, in timestamp order."""
+        return [member_path(self.path, name) for name in self.names]
+
+    def close(self) -> None:
+        self.map.close()
+
+
+_open_packs: 'OrderedDict[str, FramePack]' = OrderedDict()
+_open_packs_lock = threading.Lock()
+
+
+def is_pack(path: str) -> bool:
+    """Whether a path is a pack file."""
+    return path.endswith(PACK_EXTENSION) and os.path.isfile(path)
+
+
+def member_path(pack_path: str, name: str) -> str:
+    """Path of a frame inside a pack."""
+    return os.path.join(pack_path, name)
+
+
+def split_member(path: str) -> Tuple[Optional[str], str]:
+    """Split a path into (pack file, frame name), or (None, path) for an ordinary file."""
+    pack_path, name = os.path.split(path)
+    if pack_path.endswith(PACK_EXTENSION) and os.path.isfile(pack_path):
+        return pack_path, name
+    return None, path
+
+
+def open_pack(pack_path: str) -> FramePack:
+    """Return a reader for a pack, reusing the last few opened ones."""
+    key = os.path.abspath(pack_path)
+    with _open_packs_lock:
+        pack = _open_packs.get(key)
+        if pack is None:
+            pack = _open_packs[key] = FramePack(pack_path)
+            if len(_open_packs) > MAX_OPEN_PACKS:
+                # Only dropped from the cache; readers still in use keep their map
+                _open_packs.popitem(last=False)
+        _open_packs.move_to_end(key)
+        return pack
+
+
+def open_image(path: str) -> Image.Image:
+    """
+    Open an image file, or a frame inside a pack.
+
+    Args:
+        path (str): Image path, or <pack file>/<frame name>.
+
+    Returns:
+        Image.Image: The opened image.
+
+    Raises:
+        KeyError: If the pack has no frame of that name.
+    """
+    pack_path, name = split_member(path)
+    if pack_path is None:
+        return Image.open(path)
+    pack = open_pack(pack_path)
+    return pack.image(pack.by_name[name])
+
+
+def read_bytes(path: str) -> bytes:
+    """Return the encoded bytes of an image file, or of a frame inside a pack."""
+    pack_path, name = split_member(path)
+    if pack_path is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    pack = open_pack(pack_path)
+    return pack.read(pack.by_name[name])
+
+
+def list_frames(folder: str, extensions: Tuple[str, ...] = ('.jpg', '.jpeg', '.png')) -> List[str]:
+    """
+    List the frames of a folder, sorted by filename, or of a pack, in timestamp order.
+
+    Args:
+        folder (str): Folder of image files or a pack file.
+        extensions (Tuple[str, ...]): Image file extensions to include from folders.
+
+    Returns:
+        List[str]: Frame paths usable with open_image.
+    """
+    if is_pack(folder):
+        return open_pack(folder).paths()
+    return [os.path.join(folder, filename) for filename in sorted(os.listdir(folder))
+            if filename.lower().endswith(extensions)]
@@ -1,68 +1,619 @@
+# Subtitle Generation Utility
+#
+# Transcribes video or audio files to SRT subtitles with OpenAI's Whisper.
+# Loaded models stay resident in this process (see load_model), so a batch of
+# files, a whole folder or a queue of paths read from stdin pays for loading
+# the model only once.
+#
+# Two backends are available (BACKENDS): 'whisper' runs openai-whisper in
+# PyTorch; 'faster-whisper' runs the same models with CTranslate2, int8
+# quantized on CPU, which is several times faster without a GPU. With
+# --workers N, speech chunks found by voice activity detection are transcribed
+# by N processes in parallel and merged back into one ordered SRT.
+#
+# Segments are written to the SRT (and optionally WebVTT and JSON Lines with
+# word timings) as they are transcribed, and finished transcripts are cached
+# by a hash of the decoded audio, so the same audio is never transcribed twice.
+#
+# Usage: python generate_srt.py <file or folder>... [--output-dir DIR]
+# [--language en] [--model large] [--backend faster-whisper] [--workers N]
+# [--formats srt vtt jsonl] [--no-cache],
+# or "python generate_srt.py -" to transcribe paths as they arrive on stdin,
+# one per line; without arguments it prompts for one file.
+
 import os
-import whisper
-import torch
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta
 
-def generate_srt(audio_path, output_path=None, language=None):
+from extract_audio import (iter_pcm, pcm_hash, speech_regions, speech_chunks, PCM_CHUNK_SECONDS, SAMPLE_RATE,
+                           SPEECH_PAD_SECONDS, VAD_MIN_SILENCE, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS)
+
+MODEL_NAME = os.environ.get('WHISPER_MODEL', 'large')
+BACKEND = os.environ.get('WHISPER_BACKEND', 'whisper')  # see BACKENDS
+COMPUTE_TYPE = os.environ.get('WHISPER_COMPUTE_TYPE')  # faster-whisper; int8 on CPU and float16 on CUDA if unset
+MAX_LOADED_MODELS = int(os.environ.get('WHISPER_MAX_MODELS', 1))  # large needs about 10 GB; keep one by default
+PROMPT_CHARACTERS = 200  # text carried from one chunk into the next as Whisper's initial prompt
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS + AUDIO_EXTENSIONS
+TRANSCRIPT_FORMATS = ('srt', 'vtt', 'jsonl')  # jsonl: one segment with word timings per line
+TRANSCRIPT_CACHE_DIRECTORY = os.environ.get('TRANSCRIPT_CACHE', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'transcripts'))
+
+class WhisperBackend:
+    """openai-whisper in PyTorch: fp16 on CUDA, fp32 on CPU."""
+
+    def __init__(self, model_name, device=None, threads=None):
+        import whisper
+        import torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device=self.device)
+
+    def transcribe(self, samples, language=None, initial_prompt=None):
+        """
+        Transcribe 16 kHz mono float samples.
+
+        Returns:
+        tuple: (segments as dicts with start, end, text and words, detected or given language).
+        """
+        result = self.model.transcribe(
+            samples,
+            language=language,
+            word_timestamps=True,
+            initial_prompt=initial_prompt,
+            verbose=False
+        )
+        return result["segments"], result.get("language") or language
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2): int8 weights and activations on CPU, float16 on CUDA."""
+
+    def __init__(self, model_name, device=None, threads=None):
+        import ctranslate2
+        from faster_whisper import WhisperModel
+        self.device = device or ("cuda" if ctranslate2.get_cuda_device_count() else "cpu")
+        compute_type = COMPUTE_TYPE or ("float16" if self.device == "cuda" else "int8")
+        self.model = WhisperModel(model_name, device=self.device, compute_type=compute_type, cpu_threads=threads or 0)
+
+    def transcribe(self, samples, language=None, initial_prompt=None):
+        """
+        Transcribe 16 kHz mono float samples.
+
+        Returns:
+        tuple: (segments as dicts with start, end, text and words, detected or given language).
+        """
+        segments, info = self.model.transcribe(
+            samples,
+            language=language,
+            word_timestamps=True,
+            initial_prompt=initial_prompt
+        )
+        # The segments are generated lazily; transcription happens here
+        return [{"start": segment.start, "end": segment.end, "text": segment.text,
+                 "words": [{"start": word.start, "end": word.end, "word": word.word, "probability": word.probability}
+                           for word in segment.words or []]}
+                for segment in segments], info.language
+
+BACKENDS = {'whisper': WhisperBackend, 'faster-whisper': FasterWhisperBackend}
+
+# (backend, model name, device): loaded backend, least recently used first
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+def load_model(model_name=MODEL_NAME, device=None, backend=BACKEND):
+    """
+    Return a loaded backend, loading the model only if it is not resident yet.
+
+    Up to MAX_LOADED_MODELS models stay loaded; the least recently used one
+    is released when another has to be loaded.
+
+    Args:
+    model_name (str): Whisper model name, e.g. 'large' or 'small'.
+    device (str, optional): 'cuda' or 'cpu'; CUDA when available if None.
+    backend (str): One of BACKENDS.
+
+    Returns:
+    WhisperBackend or FasterWhisperBackend: The backend, with its device in .device.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {backend} (choose from {', '.join(BACKENDS)})")
+    key = (backend, model_name, device)
+    with _models_lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+        while _models and len(_models) >= MAX_LOADED_MODELS:
+            evicted, _ = _models.popitem(last=False)
+            print(f"Releasing {evicted[0]} model {evicted[1]}")
+        print(f"Loading {backend} model {model_name}...")
+        start_time = time.time()
+        _models[key] = BACKENDS[backend](model_name, device)
+        print(f"Loaded {backend} model {model_name} on {_models[key].device} in {time.time() - start_time:.1f} s")
+        return _models[key]
+
+def transcribe_chunks(model, input_path, language=None, chunk_seconds=PCM_CHUNK_SECONDS):
+    """
+    Transcribe a video or audio file chunk by chunk from an ffmpeg PCM pipe.
+
+    Each chunk goes to Whisper as a NumPy array, so the file is decoded only
+    once and nothing is written to disk. The language detected in the first
+    chunk is kept for the rest, and the end of each chunk's text is passed as
+    the next chunk's initial prompt to keep the transcript consistent.
+
+    Args:
+    model: Backend from load_model.
+    input_path (str): Path to the input video or audio file.
+    language (str, optional): Language code; detected from the first chunk if None.
+    chunk_seconds (float): Maximum seconds of audio transcribed at once.
+
+    Yields:
+    dict: Whisper segments with start and end in seconds from the start of the file.
+    """
+    previous_text = None
+    for offset, samples in iter_pcm(input_path, chunk_seconds):
+        print(f"Transcribing {format_timedelta(timedelta(seconds=offset))} - "
+              f"{format_timedelta(timedelta(seconds=offset + len(samples) / SAMPLE_RATE))}")
+        segments, language = model.transcribe(samples, language, previous_text)
+        texts = []
+        for segment in shift_segments(segments, offset):
+            texts.append(segment["text"].strip())
+            yield segment
+        previous_text = " ".join(texts)[-PROMPT_CHARACTERS:] or previous_text
+
+def shift_segments(segments, offset):
+    """Move segment and word times by offset seconds, in place, and return the segments."""
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words") or []:
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+def detect_speech(samples):
+    """
+    Find speech regions for chunked transcription.
+
+    Uses the Silero VAD bundled with faster-whisper when it is installed and
+    extract_audio's energy detector otherwise.
+
+    Returns:
+    list: (start, end) sample indices of speech, ascending.
+    """
+    try:
+        from faster_whisper.vad import get_speech_timestamps, VadOptions
+    except ImportError:
+        return speech_regions(samples)
+    options = VadOptions(min_silence_duration_ms=int(VAD_MIN_SILENCE * 1000),
+                         speech_pad_ms=int(SPEECH_PAD_SECONDS * 1000))
+    return [(region["start"], region["end"]) for region in get_speech_timestamps(samples, options)]
+
+# Backend of a transcription pool worker process
+_worker_model = None
+
+def init_worker(backend, model_name, threads):
+    """Load the model once in each pool process."""
+    global _worker_model
+    _worker_model = BACKENDS[backend](model_name, "cpu", threads)
+
+def transcribe_worker(task):
+    """Transcribe one (padded start in seconds, samples, language) speech chunk in a pool process."""
+    start, samples, language = task
+    segments, language = _worker_model.transcribe(samples, language)
+    return shift_segments(segments, start), language
+
+# (backend, model name, workers): pool of processes with the model loaded
+_pools = {}
+
+def transcription_pool(backend, model_name, workers):
+    """Return a process pool whose workers keep a model loaded, replacing a pool with other settings."""
+    key = (backend, model_name, workers)
+    if key not in _pools:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+        # Split the cores between the workers instead of letting each start one thread per core
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Starting {workers} {backend} workers with {threads} threads each...")
+        _pools[key] = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                          initargs=(backend, model_name, threads))
+    return _pools[key]
+
+def iter_merged_segments(chunk_results, pad=float('inf')):
     """
-    Generate an SRT file from an audio file using OpenAI's Whisper large model.
-    
+    Merge the segments of consecutive speech chunks into one ordered transcript as the chunks arrive.
+
+    Chunks are padded, so neighbouring chunks can both transcribe the audio
+    around their common boundary. A segment is kept only by the chunk whose
+    share of the timeline (split halfway between the chunks) holds its
+    midpoint, and ends that run into the next segment are trimmed. A segment
+    is yielded once its successor is known and no later chunk can hold a
+    segment starting before that successor.
+
     Args:
-    audio_path (str): Path to the input audio file.
+    chunk_results (iterable): (chunk start, chunk end, segments) in seconds, ordered by start.
+    pad (float): Seconds before its start that a chunk's segments can begin; inf waits for the last chunk.
+
+    Yields:
+    dict: Segments ordered by start.
+    """
+    held, previous, low = [], None, float('-inf')
+
+    def settle(bound):
+        held.sort(key=lambda segment: segment["start"])
+        while len(held) > 1 and held[1]["start"] <= bound:
+            segment = held.pop(0)
+            segment["end"] = max(segment["start"], min(segment["end"], held[0]["start"]))
+            yield segment
+
+    for chunk in chunk_results:
+        if previous is not None:
+            high = (previous[1] + chunk[0]) / 2
+            held.extend(segment for segment in previous[2] if low <= (segment["start"] + segment["end"]) / 2 < high)
+            low = high
+            yield from settle(chunk[0] - pad)
+        previous = chunk
+    if previous is not None:
+        held.extend(segment for segment in previous[2] if low <= (segment["start"] + segment["end"]) / 2)
+    yield from settle(float('inf'))
+    yield from held
+
+def merge_segments(chunk_results):
+    """
+    Merge the segments of consecutive speech chunks into one ordered transcript.
+
+    Args:
+    chunk_results (list): (chunk start, chunk end, segments) in seconds, ordered by start.
+
+    Returns:
+    list: Segments ordered by start; see iter_merged_segments.
+    """
+    return list(iter_merged_segments(chunk_results))
+
+def transcribe_parallel(input_path, language=None, chunk_seconds=PCM_CHUNK_SECONDS, model_name=MODEL_NAME,
+                        backend=BACKEND, workers=2):
+    """
+    Transcribe the speech of a file in parallel processes on the CPU.
+
+    Voice activity detection splits the decoded audio into speech chunks of
+    up to 29 s, dropping long silences. The chunks are transcribed by a pool
+    of worker processes with the model loaded once per process. The language
+    is detected on the first chunk and used for the rest. Chunks do not see
+    each other's text, unlike transcribe_chunks. Segments are yielded in
+    order as soon as the chunks before them have been transcribed.
+
+    Args:
+    input_path (str): Path to the input video or audio file.
+    language (str, optional): Language code; detected from the first speech chunk if None.
+    chunk_seconds (float): Seconds of audio decoded and searched for speech at once.
+    model_name (str): Whisper model.
+    backend (str): One of BACKENDS.
+    workers (int): Worker processes.
+
+    Yields:
+    dict: Segments ordered by start, in seconds from the start of the file.
+    """
+    pool = transcription_pool(backend, model_name, workers)
+    pad = int(SPEECH_PAD_SECONDS * SAMPLE_RATE)
+    pending = deque()
+
+    def collect(wait_for):
+        nonlocal language
+        while len(pending) > wait_for:
+            start, end, future = pending.popleft()
+            try:
+                segments, detected = future.result()
+            except BrokenProcessPool as e:
+                # Usually the backend failed to load in the workers; start a fresh pool next time
+                _pools.pop((backend, model_name, workers), None)
+                raise RuntimeError(f"The {backend} workers stopped; is {backend} installed?") from e
+            language = language or detected
+            yield start, end, segments
+
+    def chunk_results():
+        for offset, samples in iter_pcm(input_path, chunk_seconds):
+            for start, end in speech_chunks(samples, detect_speech(samples)):
+                padded_start = max(0, start - pad)
+                task = (offset + padded_start / SAMPLE_RATE, samples[padded_start:end + pad].copy(), language)
+                pending.append((offset + start / SAMPLE_RATE, offset + end / SAMPLE_RATE,
+                                pool.submit(transcribe_worker, task)))
+                # Settle the language on the first chunk; later, keep a few chunks queued per worker
+                yield from collect(0 if language is None else 2 * workers)
+            print(f"Queued speech up to {format_timedelta(timedelta(seconds=offset + len(samples) / SAMPLE_RATE))}")
+        yield from collect(0)
+
+    # Every chunk's segments start within its padding, at most SPEECH_PAD_SECONDS before the chunk
+    yield from iter_merged_segments(chunk_results(), SPEECH_PAD_SECONDS)
+
+def srt_path_for(input_path, output_dir=None):
+    """Return <output_dir or the input's folder>/<input name>.srt."""
+    input_name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{input_name}.srt")
+
+def transcribe(input_path, language=None, chunk_seconds=PCM_CHUNK_SECONDS, model_name=MODEL_NAME, backend=BACKEND,
+               workers=1):
+    """
+    Transcribe a file with the chosen backend, sequentially or with a pool of workers.
+
+    Returns:
+    iterable: Segments ordered by start, in seconds from the start of the file.
+    """
+    if workers > 1:
+        return transcribe_parallel(input_path, language, chunk_seconds, model_name, backend, workers)
+    model = load_model(model_name, backend=backend)
+    print(f"Transcribing {os.path.basename(input_path)} using {model_name} model on {model.device}... This may take a while.")
+    return transcribe_chunks(model, input_path, language, chunk_seconds)
+
+def segment_record(segment, index):
+    """Keep the JSON-serializable timing and text of a backend segment."""
+    return {
+        "index": index,
+        "start": round(float(segment["start"]), 3),
+        "end": round(float(segment["end"]), 3),
+        "text": segment["text"].strip(),
+        "words": [{"start": round(float(word["start"]), 3), "end": round(float(word["end"]), 3),
+                   "word": word["word"], "probability": round(float(word.get("probability", 0)), 4)}
+                  for word in segment.get("words") or []]
+    }
+
+class TranscriptWriter:
+    """
+    Write segments to SRT, WebVTT and JSON Lines files as soon as they are transcribed.
+
+    Every segment is flushed to <output>.partial files, so later steps can
+    read a transcript that is still in progress. close() renames them into
+    place; files that were not closed, e.g. after an error, stay .partial and
+    never pass for a finished transcript.
+    """
+
+    def __init__(self, output_path, formats=('srt',)):
+        """
+        Args:
+        output_path (str): SRT path; the other formats go next to it with their own extension.
+        formats (tuple): Any of TRANSCRIPT_FORMATS; SRT is always written.
+        """
+        base = os.path.splitext(output_path)[0]
+        self.paths = {'srt': output_path}
+        self.paths.update({fmt: f"{base}.{fmt}" for fmt in formats if fmt != 'srt'})
+        self.files = {fmt: open(f"{path}.partial", "w", encoding="utf-8") for fmt, path in self.paths.items()}
+        if 'vtt' in self.files:
+            self.files['vtt'].write("WEBVTT\n\n")
+        self.count = 0
+
+    def add(self, record):
+        """Append one segment_record and flush it to every file."""
+        self.count += 1
+        start = format_timedelta(timedelta(seconds=record["start"]))
+        end = format_timedelta(timedelta(seconds=record["end"]))
+        self.files['srt'].write(f"{self.count}\n{start} --> {end}\n{record['text']}\n\n")
+        if 'vtt' in self.files:
+            self.files['vtt'].write(f"{start.replace(',', '.')} --> {end.replace(',', '.')}\n{record['text']}\n\n")
+        if 'jsonl' in self.files:
+            self.files['jsonl'].write(json.dumps(record, ensure_ascii=False) + "\n")
+        for f in self.files.values():
+            f.flush()
+
+    def close(self, complete=True):
+        """Close the files and, if the transcript is complete, move them into place."""
+        for fmt, f in self.files.items():
+            f.close()
+            if complete:
+                os.replace(f"{self.paths[fmt]}.partial", self.paths[fmt])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+def transcript_settings(language, chunk_seconds, model_name, backend, workers):
+    """Everything besides the audio that shapes a transcript, as part of its cache key."""
+    return {
+        "backend": backend,
+        "model": model_name,
+        "compute_type": COMPUTE_TYPE if backend == 'faster-whisper' else None,
+        "language": language,
+        # Sequential chunks see each other's text; parallel speech chunks do not
+        "mode": "parallel" if workers > 1 else f"sequential/{chunk_seconds:g}",
+    }
+
+def transcript_cache_path(audio_hash, settings, cache_dir=TRANSCRIPT_CACHE_DIRECTORY):
+    """Return the cache file of a transcript of some audio with some settings."""
+    settings_hash = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{audio_hash[:20]}_{settings_hash[:12]}.json")
+
+def generate_srt(input_path, output_path=None, language=None, chunk_seconds=PCM_CHUNK_SECONDS, model_name=MODEL_NAME,
+                 backend=BACKEND, workers=1, formats=('srt',), cache=True):
+    """
+    Generate an SRT file from a video or audio file using OpenAI's Whisper (the large model by default).
+
+    Segments are written as they are transcribed (see TranscriptWriter).
+    Finished transcripts are cached by a hash of the decoded audio and the
+    transcription settings, so the same audio under another file name is
+    written from the cache instead of being transcribed again. Hashing costs
+    one extra decode of the audio, which is fast next to transcription.
+
+    Args:
+    input_path (str): Path to the input video or audio file.
     output_path (str, optional): Path to save the output SRT file.
     language (str, optional): Language code (e.g., 'en' for English, 'zh' for Chinese).
-    
+    chunk_seconds (float): Maximum seconds of audio held in memory and transcribed at once.
+    model_name (str): Whisper model; loaded once and reused by later calls in this process.
+    backend (str): One of BACKENDS.
+    workers (int): Transcribe speech chunks in this many processes (CPU only); 1 transcribes sequentially.
+    formats (tuple): Also write these of TRANSCRIPT_FORMATS next to the SRT, e.g. ('vtt', 'jsonl').
+    cache (bool): Use and update the transcript cache.
+
     Returns:
     str: Path to the generated SRT file.
     """
-    # Load the Whisper large model
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = whisper.load_model("large", device=device)
-    
-    print(f"Transcribing audio using large model on {device}... This may take a while.")
-    
-    # Transcribe with more options
-    result = model.transcribe(
-        audio_path,
-        language=language,
-        word_timestamps=True,
-        verbose=True
-    )
-    
-    print("Transcription complete. Generating SRT file...")
-    
-    # Generate SRT content with word-level timestamps
-    srt_content = ""
-    for i, segment in enumerate(result["segments"], start=1):
-        start_time = timedelta(seconds=segment["start"])
-        end_time = timedelta(seconds=segment["end"])
-        text = segment["text"].strip()
-        
-        srt_content += f"{i}\n"
-        srt_content += f"{format_timedelta(start_time)} --> {format_timedelta(end_time)}\n"
-        srt_content += f"{text}\n\n"
-    
     # Determine output path
     if output_path is None:
-        audio_dir = os.path.dirname(audio_path)
-        audio_name = os.path.splitext(os.path.basename(audio_path))[0]
-        output_path = os.path.join(audio_dir, f"{audio_name}.srt")
-    
-    # Write SRT content to file
-    with open(output_path, "w", encoding="utf-8") as srt_file:
-        srt_file.write(srt_content)
-    
+        output_path = srt_path_for(input_path)
+
+    cached, cache_path = None, None
+    if cache:
+        audio_hash, _ = pcm_hash(input_path)
+        settings = transcript_settings(language, chunk_seconds, model_name, backend, workers)
+        cache_path = transcript_cache_path(audio_hash, settings)
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            print(f"Using the cached transcript of the same audio (first transcribed from {cached['input']})")
+
+    if cached:
+        segments = cached['segments']
+    else:
+        segments = (segment_record(segment, i)
+                    for i, segment in enumerate(transcribe(input_path, language, chunk_seconds, model_name, backend,
+                                                           workers), start=1))
+
+    # Write every segment with word-level timestamps as soon as it is transcribed
+    records = []
+    with TranscriptWriter(output_path, formats) as writer:
+        for record in segments:
+            print(f"[{format_timedelta(timedelta(seconds=record['start']))} --> "
+                  f"{format_timedelta(timedelta(seconds=record['end']))}] {record['text']}")
+            writer.add(record)
+            records.append(record)
+
+    print("Transcription complete.")
+
+    if cache_path and not cached:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'input': os.path.basename(input_path), 'audio_hash': audio_hash, 'settings': settings,
+                       'segments': records}, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+
     return output_path
 
+def media_files(input_path):
+    """List the video and audio files of a folder, sorted by name, or return [input_path] for a file."""
+    if not os.path.isdir(input_path):
+        return [input_path]
+    return [os.path.join(input_path, filename) for filename in sorted(os.listdir(input_path))
+            if filename.lower().endswith(MEDIA_EXTENSIONS)]
+
+def generate_srt_files(input_paths, output_dir=None, language=None, chunk_seconds=PCM_CHUNK_SECONDS,
+                       model_name=MODEL_NAME, overwrite=False, backend=BACKEND, workers=1, formats=('srt',),
+                       cache=True):
+    """
+    Transcribe a queue of files with one resident model.
+
+    Files whose SRT already exists and is newer than the file are skipped
+    unless overwrite is set, so an interrupted batch resumes where it stopped.
+    A failing file is reported and the rest are still transcribed.
+
+    Args:
+    input_paths (iterable): Video or audio files; may be a generator fed while the batch runs.
+    output_dir (str, optional): Folder for the SRTs instead of each input's folder.
+    language (str, optional): Language code, or None to detect it per file.
+    chunk_seconds (float): Maximum seconds of audio transcribed at once.
+    model_name (str): Whisper model.
+    overwrite (bool): Transcribe files that already have an up-to-date SRT.
+    backend (str): One of BACKENDS.
+    workers (int): Worker processes per file; the pool and its models are shared by all files.
+    formats (tuple): Extra TRANSCRIPT_FORMATS to write next to each SRT.
+    cache (bool): Use and update the transcript cache.
+
+    Returns:
+    dict: Mapping of every input path to its SRT path, or None if it failed.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    for input_path in input_paths:
+        output_path = srt_path_for(input_path, output_dir)
+        if not overwrite and os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+            print(f"Skipping {input_path}: {output_path} is up to date")
+            results[input_path] = output_path
+            continue
+        start_time = time.time()
+        try:
+            results[input_path] = generate_srt(input_path, output_path, language, chunk_seconds, model_name,
+                                               backend, workers, formats, cache)
+        except subprocess.CalledProcessError as e:
+            print(f"Error decoding {input_path}: {e.stderr.strip()}")
+            results[input_path] = None
+            continue
+        except Exception as e:
+            print(f"Error transcribing {input_path}: {str(e)}")
+            results[input_path] = None
+            continue
+        print(f"SRT file generated: {output_path} ({time.time() - start_time:.1f} s)")
+    done = sum(path is not None for path in results.values())
+    print(f"Generated or kept {done} of {len(results)} SRT files")
+    return results
+
+def read_queue(stream):
+    """Yield the paths written to a stream, one per line, until it is closed."""
+    for line in stream:
+        path = line.strip().strip("'\"")
+        if path:
+            yield from media_files(path)
+
 def format_timedelta(td):
     """Format timedelta object to SRT timestamp format."""
-    hours, remainder = divmod(td.seconds, 3600)
+    hours, remainder = divmod(td.days * 86400 + td.seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
     milliseconds = td.microseconds // 1000
     return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
 
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe video or audio files to SRT subtitles with Whisper.")
+    parser.add_argument("inputs", nargs="*",
+                        help="Files or folders to transcribe, or - to read paths from stdin (prompted for if omitted)")
+    parser.add_argument("--output", help="SRT path for a single input file (default: next to the input)")
+    parser.add_argument("--output-dir", help="Folder for the SRT files (default: next to each input)")
+    parser.add_argument("--language", help="Language code such as en or zh (default: auto-detect)")
+    parser.add_argument("--model", default=MODEL_NAME, help="Whisper model name")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=BACKEND,
+                        help="whisper: PyTorch; faster-whisper: CTranslate2, int8 on CPU")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Transcribe voice-detected speech chunks in this many CPU processes")
+    parser.add_argument("--chunk-seconds", type=float, default=PCM_CHUNK_SECONDS,
+                        help="Seconds of audio decoded and transcribed at once, bounding memory")
+    parser.add_argument("--overwrite", action="store_true", help="Transcribe files whose SRT is already up to date")
+    parser.add_argument("--formats", nargs="+", choices=TRANSCRIPT_FORMATS, default=['srt'],
+                        help="Transcript files to write; the SRT is always written")
+    parser.add_argument("--no-cache", action="store_true", help="Transcribe even if the same audio was transcribed before")
+    args = parser.parse_args()
+    options = {'chunk_seconds': args.chunk_seconds, 'model_name': args.model, 'backend': args.backend,
+               'workers': args.workers, 'formats': tuple(args.formats), 'cache': not args.no_cache}
+
+    if not args.inputs:
+        input_path = input("Enter the path to your video or audio file: ").strip("'\"")
+        language = args.language or input("Enter the language code (e.g., 'en' for English, 'zh' for Chinese), or press Enter to auto-detect: ").strip() or None
+        srt_path = generate_srt(input_path, args.output, language, **options)
+        print(f"SRT file generated successfully: {srt_path}")
+        return
+
+    if args.output:
+        if args.inputs == ['-'] or len(args.inputs) > 1 or os.path.isdir(args.inputs[0]):
+            parser.error("--output needs a single input file; use --output-dir for several")
+        srt_path = generate_srt(args.inputs[0], args.output, args.language, **options)
+        print(f"SRT file generated successfully: {srt_path}")
+        return
+
+    if args.inputs == ['-']:
+        print("Reading paths from stdin, one per line; close it (Ctrl-D) to finish.", file=sys.stderr)
+        input_paths = read_queue(sys.stdin)
+    else:
+        input_paths = (path for input_path in args.inputs for path in media_files(input_path))
+    results = generate_srt_files(input_paths, args.output_dir, args.language, overwrite=args.overwrite, **options)
+    if any(path is None for path in results.values()):
+        return 1
+
 if __name__ == "__main__":
-    audio_path = input("Enter the path to your audio file: ").strip("'\"")
-    language = input("Enter the language code (e.g., 'en' for English, 'zh' for Chinese), or press Enter to auto-detect: ").strip() or None
-    srt_path = generate_srt(audio_path, language=language)
-    print(f"SRT file generated successfully: {srt_path}")
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import io
+import math
+import base64
+import logging
+from typing import Dict, Any, Optional, Union
+
+from PIL import Image
+
+from frame_pack import open_image
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PIXELS_PER_TOKEN = 750  # Claude charges about width * height / 750 tokens per image
+MAX_LONG_EDGE = 1568  # the API downscales anything larger, so sending more is wasted bandwidth
+MAX_IMAGE_TOKENS = 1600  # about 1.15 megapixels, the API's own per-image cap
+MIN_IMAGE_TOKENS = 100  # below this even large text in the image becomes unreadable
+QUALITY_TIERS = {
+    'low': 400,  # thumbnails: layout, colours, faces
+    'medium': 800,  # enough for on-screen captions
+    'high': MAX_IMAGE_TOKENS,
+}
+JPEG_QUALITY = 85
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Estimate the input tokens an image of the given size costs.
+
+    Args:
+        width (int): Width in pixels.
+        height (int): Height in pixels.
+
+    Returns:
+        int: Estimated tokens after the API's own downscaling.
+    """
+    width, height = fit_size(width, height, MAX_IMAGE_TOKENS)
+    return math.ceil(width * height / PIXELS_PER_TOKEN)
+
+
+def fit_size(width: int, height: int, max_tokens: int) -> tuple:
+    """
+    Scale a size down, keeping its aspect ratio, until it fits a token budget.
+
+    Args:
+        width (int): Width in pixels.
+        height (int): Height in pixels.
+        max_tokens (int): Token budget for the image.
+
+    Returns:
+        tuple: (width, height) no larger than the input.
+    """
+    scale = min(1.0,
+                MAX_LONG_EDGE / max(width, height),
+                math.sqrt(max_tokens * PIXELS_PER_TOKEN / (width * height)))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def per_image_tokens(image_count: int, request_budget: Optional[int] = None, tier: str = 'high') -> int:
+    """
+    Split a per-request image token budget evenly, capped by a quality tier.
+
+    Args:
+        image_count (int): Number of images in the request.
+        request_budget (Optional[int]): Image tokens allowed for the whole request, or None.
+        tier (str): Key of QUALITY_TIERS giving the per-image cap.
+
+    Returns:
+        int: Token budget for each image.
+    """
+    cap = QUALITY_TIERS[tier]
+    if request_budget is None or image_count == 0:
+        return cap
+    share = request_budget // image_count
+    if share < MIN_IMAGE_TOKENS:
+        logger.warning(f"{image_count} images leave only {share} tokens each; using {MIN_IMAGE_TOKENS}")
+    return max(MIN_IMAGE_TOKENS, min(cap, share))
+
+
+def prepare_image(source: Union[str, Image.Image], max_tokens: int = MAX_IMAGE_TOKENS) -> Dict[str, Any]:
+    """
+    Resize an image to fit a token budget and re-encode it.
+
+    Images with transparency are encoded as PNG and everything else as JPEG, and
+    the media type always matches the bytes, whatever the source file was.
+
+    Args:
+        source (Union[str, Image.Image]): Image file path, frame pack member path or an already opened image.
+        max_tokens (int): Token budget for this image.
+
+    Returns:
+        Dict[str, Any]: data (encoded bytes), media_type, width, height and
+            estimated_tokens.
+
+    Raises:
+        IOError: If the image file cannot be read.
+    """
+    img = open_image(source) if isinstance(source, str) else source
+    try:
+        width, height = fit_size(img.width, img.height, max_tokens)
+        if img.format == 'JPEG' and (width, height) != img.size:
+            # Let the JPEG decoder do most of the downscaling
+            img.draft('RGB', (width, height))
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if has_alpha:
+            img.save(buffer, format='PNG', optimize=True)
+            media_type = 'image/png'
+        else:
+            img.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+            media_type = 'image/jpeg'
+    finally:
+        if isinstance(source, str):
+            img.close()
+
+    return {
+        'data': buffer.getvalue(),
+        'media_type': media_type,
+        'width': width,
+        'height': height,
+        'estimated_tokens': estimate_image_tokens(width, height),
+    }
+
+
+class LazyImage:
+    """
+    Image that is only resized and encoded when its content block is needed.
+
+    Only the image header is read up front, for the size and token estimate.
+    Requests built from LazyImage values are serialized with
+    claude_api.iter_json_body, which encodes one image at a time while the body
+    is being uploaded.
+    """
+
+    def __init__(self, path: str, max_tokens: int = MAX_IMAGE_TOKENS):
+        """
+        Args:
+            path (str): Image file path.
+            max_tokens (int): Token budget for this image.
+
+        Raises:
+            IOError: If the image file cannot be read.
+        """
+        self.path = path
+        self.max_tokens = max_tokens
+        with open_image(path) as img:
+            self.width, self.height = fit_size(img.width, img.height, max_tokens)
+        self.estimated_tokens = estimate_image_tokens(self.width, self.height)
+
+    def content_block(self) -> Dict[str, Any]:
+        """Resize, encode and wrap the image in a base64 image content block."""
+        return image_block(prepare_image(self.path, self.max_tokens))
+
+
+def image_block(prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a prepared image in a base64 image content block."""
+    return {
+        'type': 'image',
+        'source': {
+            'type': 'base64',
+            'media_type': prepared['media_type'],
+            'data': base64.b64encode(prepared['data']).decode('utf-8')
+        }
+    }
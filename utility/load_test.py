@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import itertools
+import importlib
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+
+import requests
+from PIL import Image
+
+from mock_anthropic import start_server, add_server_arguments, state_from_arguments
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ['persona', 'compare', 'frames', 'persona_batch', 'frames_batch']
+IMAGES_PER_FOLDER = 3
+FRAMES_PER_BATCH = 4
+FOLDERS_PER_JOB = 4  # influencer folders in each persona_batch job
+FRAMES_PER_JOB = 12  # frames in each frames_batch job
+BATCH_POLL_DELAY = 0.2  # seconds; the mock ends batches after --batch-seconds
+
+
+def configure_environment(base_url: str, work_dir: str) -> None:
+    """Point every utility at the mock server; must run before they are imported."""
+    os.environ['CLAUDE_API_URL'] = f"{base_url}/v1/messages"
+    os.environ['ANTHROPIC_BASE_URL'] = base_url
+    os.environ.setdefault('CLAUDE_API_KEY', 'mock-key')
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'mock-key')
+    os.environ['CLAUDE_USAGE_LOG'] = os.path.join(work_dir, 'usage.jsonl')
+    os.environ['PERSONA_SHARD_CACHE'] = os.path.join(work_dir, 'persona_shards')
+    os.environ['BATCH_JOBS_DIRECTORY'] = os.path.join(work_dir, 'batch_jobs')
+    os.environ['BATCH_POLL_DELAY'] = str(BATCH_POLL_DELAY)
+
+
+def make_image(path: str, seed: int) -> None:
+    Image.new('RGB', (720, 1280), ((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256)).save(path)
+
+
+def make_influencer_folders(work_dir: str, count: int) -> List[str]:
+    """Create small screenshot folders, one per influencer."""
+    folders = []
+    for i in range(count):
+        folder = os.path.join(work_dir, 'persona', f"influencer_{i:04d}")
+        os.makedirs(folder, exist_ok=True)
+        for j in range(IMAGES_PER_FOLDER):
+            make_image(os.path.join(folder, f"screenshot_{j}.png"), i * IMAGES_PER_FOLDER + j)
+        folders.append(folder)
+    return folders
+
+
+def persona_scenario(work_dir: str, calls: int, stream: bool) -> Callable[[int], Any]:
+    """Each call analyzes its own small screenshot folder with persona.analyze_images."""
+    persona = importlib.import_module('persona')
+    folders = make_influencer_folders(work_dir, calls)
+    return lambda i: persona.analyze_images(folders[i], os.path.join(folders[i], 'analysis.txt'), stream=stream)
+
+
+def compare_scenario(work_dir: str, calls: int, stream: bool) -> Callable[[int], Any]:
+    """Each call compares the analyses in Data/test_txt with compare.compare_influencers."""
+    compare = importlib.import_module('compare')
+    analyses = compare.read_analysis_files(compare.INPUT_DIRECTORY)
+    output_dir = os.path.join(work_dir, 'compare')
+    os.makedirs(output_dir, exist_ok=True)
+    return lambda i: compare.compare_influencers(analyses, os.path.join(output_dir, f"comparison_{i:04d}.txt"),
+                                                 stream=stream)
+
+
+def frames_scenario(work_dir: str, calls: int, stream: bool) -> Callable[[int], Any]:
+    """Each call describes one batch of frames with frame_explain.process_frame_batch (never streamed)."""
+    frame_explain = importlib.import_module('frame_explain')
+    frame_dir = os.path.join(work_dir, 'frames')
+    os.makedirs(frame_dir, exist_ok=True)
+    paths = []
+    for i in range(FRAMES_PER_BATCH):
+        path = os.path.join(frame_dir, f"video_0:00:{i:02d}.jpg")
+        make_image(path, i)
+        paths.append(path)
+    return lambda i: frame_explain.process_frame_batch(paths)
+
+
+def persona_batch_scenario(work_dir: str, calls: int, stream: bool) -> Callable[[int], Any]:
+    """Each call analyzes FOLDERS_PER_JOB folders as one job with persona.analyze_folders_batch."""
+    persona = importlib.import_module('persona')
+    folders = make_influencer_folders(work_dir, FOLDERS_PER_JOB)
+    output_dir = os.path.join(work_dir, 'persona_batch')
+    os.makedirs(output_dir, exist_ok=True)
+    # A fresh job name per call; reusing one would re-attach to the finished job
+    job_ids = itertools.count()
+
+    def call(i: int) -> None:
+        handled = persona.analyze_folders_batch(folders, output_dir, job_name=f"load_persona_{next(job_ids)}")
+        if handled != len(folders):
+            raise RuntimeError(f"Only {handled} of {len(folders)} folders got a result")
+    return call
+
+
+def frames_batch_scenario(work_dir: str, calls: int, stream: bool) -> Callable[[int], Any]:
+    """Each call describes FRAMES_PER_JOB frames as one job with frame_explain.process_frames_offline."""
+    frame_explain = importlib.import_module('frame_explain')
+    frame_dir = os.path.join(work_dir, 'frames_batch')
+    os.makedirs(frame_dir, exist_ok=True)
+    for i in range(FRAMES_PER_JOB):
+        make_image(os.path.join(frame_dir, f"video_0:00:{i:02d}.jpg"), i)
+    output_dir = os.path.join(work_dir, 'frames_batch_output')
+    os.makedirs(output_dir, exist_ok=True)
+    job_ids = itertools.count()
+
+    def call(i: int) -> None:
+        job_id = next(job_ids)
+        frame_explain.process_frames_offline(frame_dir, os.path.join(output_dir, f"frames_{job_id:04d}.txt"),
+                                             scene_filter=False, job_name=f"load_frames_{job_id}")
+    return call
+
+
+SCENARIO_BUILDERS = {'persona': persona_scenario, 'compare': compare_scenario, 'frames': frames_scenario,
+                     'persona_batch': persona_batch_scenario, 'frames_batch': frames_batch_scenario}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_level(call: Callable[[int], Any], calls: int, concurrency: int, base_url: str) -> Dict[str, Any]:
+    """
+    Run calls at one concurrency level and summarize client latency and server statistics.
+
+    Returns:
+        Dict[str, Any]: Throughput, latency percentiles, failures, retries
+            (server requests beyond one per call), batched requests, injected
+            errors and cache reads.
+    """
+    requests.post(f"{base_url}/stats/reset", timeout=10).raise_for_status()
+    latencies, failures = [], 0
+
+    def timed(i: int) -> Optional[float]:
+        start_time = time.time()
+        try:
+            call(i)
+        except Exception as e:
+            logger.debug(f"Call {i} failed: {str(e)}")
+            return None
+        return time.time() - start_time
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(timed, range(calls)):
+            if latency is None:
+                failures += 1
+            else:
+                latencies.append(latency)
+    elapsed = time.time() - start_time
+
+    stats = requests.get(f"{base_url}/stats", timeout=10).json()
+    cached = stats['cache_read_input_tokens']
+    total_input = stats['input_tokens'] + stats['cache_creation_input_tokens'] + cached
+    return {
+        'concurrency': concurrency,
+        'calls': calls,
+        'failed': failures,
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50': round(percentile(latencies, 0.50), 3),
+        'p95': round(percentile(latencies, 0.95), 3),
+        'p99': round(percentile(latencies, 0.99), 3),
+        'mean': round(statistics.mean(latencies), 3) if latencies else 0.0,
+        'server_requests': stats['requests'],
+        'retries': max(0, stats['requests'] - calls) if not stats['batches'] else stats['requests'],
+        'batch_requests': stats['batch_requests'],
+        'rate_limited': stats['rate_limited'],
+        'overloaded': stats['overloaded'] + stats['batch_errored'],
+        'dropped': stats['dropped'],
+        'max_in_flight': stats['max_in_flight'],
+        'cache_read_share': round(cached / total_input, 3) if total_input else 0.0,
+    }
+
+
+def print_table(scenario: str, rows: List[Dict[str, Any]]) -> None:
+    print(f"\n{scenario}")
+    print(f"{'conc':>5} {'ok/calls':>9} {'calls/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'reqs':>5} {'batch':>5} {'retry':>5} {'429':>4} {'529':>4} {'drop':>4} {'cache':>6}")
+    for row in rows:
+        print(f"{row['concurrency']:>5} {row['calls'] - row['failed']:>4}/{row['calls']:<4} {row['throughput']:>8} "
+              f"{row['p50']:>7} {row['p95']:>7} {row['p99']:>7} {row['server_requests']:>5} {row['batch_requests']:>5} "
+              f"{row['retries']:>5} "
+              f"{row['rate_limited']:>4} {row['overloaded']:>4} {row['dropped']:>4} {row['cache_read_share']:>6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Claude utilities against the mock Anthropic server.")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to run")
+    parser.add_argument("--calls", type=int, default=32, help="Calls per concurrency level")
+    parser.add_argument("--stream", action="store_true", help="Use streamed responses in persona and compare")
+    parser.add_argument("--retry-delay", type=float,
+                        help="Override the fixed RETRY_DELAY of persona and compare to keep runs short")
+    parser.add_argument("--url", help="Base URL of an already running mock server (otherwise one is started)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    unknown = [scenario for scenario in args.scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(state_from_arguments(args))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(base_url, work_dir)
+        sys.path.insert(0, SCRIPT_DIR)
+        for scenario in args.scenarios or SCENARIOS:
+            call = SCENARIO_BUILDERS[scenario](work_dir, args.calls, args.stream)
+            # The utilities log every request; keep the report readable
+            logging.getLogger().setLevel(logging.WARNING)
+            logging.getLogger('httpx').setLevel(logging.WARNING)
+            if args.retry_delay is not None:
+                for module_name in ('persona', 'compare'):
+                    if module_name in sys.modules:
+                        sys.modules[module_name].RETRY_DELAY = args.retry_delay
+            results[scenario] = [run_level(call, args.calls, concurrency, base_url)
+                                 for concurrency in args.concurrency]
+            print_table(scenario, results[scenario])
+
+        # Routed requests (frames) also report per model, including escalations
+        if 'model_router' in sys.modules:
+            model_router = sys.modules['model_router']
+            print(f"\nper task and model\n{model_router.format_summary(model_router.summarize(model_router.session_entries()))}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+import io
+import re
+import json
+import time
+import random
+import base64
+import hashlib
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+
+from PIL import Image
+
+from image_prep import estimate_image_tokens
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CHARS_PER_TOKEN = 2  # rough average for the mixed Chinese/English text these utilities send
+MIN_CACHEABLE_TOKENS = 1024  # shorter prefixes are never cached, as with the real API
+CACHE_TTL = 300  # seconds
+STREAM_CHUNK_CHARS = 8
+RETRY_AFTER = 1  # seconds advertised on injected 429 responses
+SMALL_MODEL_SPEEDUP = 3.0  # models named *haiku* start and generate this much faster
+BATCHES_PATH = '/v1/messages/batches'
+PERSONA_FIELDS = (['A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'A7', 'A8', 'A9', 'A10', 'A11', 'B1', 'B2', 'B3',
+                   'C1', 'C2', 'C3', 'C4', 'C5', 'C6', 'C7', 'D1', 'D2', 'D3', 'D4', 'D5'])
+FRAME_FIELDS = ['environment', 'action', 'goods', 'expression', 'transcript']
+
+
+class LatencyModel:
+    """
+    Random delay before a response starts, parsed from a spec string.
+
+    Specs: "fixed:SECONDS", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA".
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(':')
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(value) for value in params.split(',') if value]
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return random.uniform(*self.params)
+        median, sigma = self.params
+        return random.lognormvariate(0, sigma) * median
+
+
+class MockState:
+    """Server configuration, simulated prompt cache and request statistics, shared by all handler threads."""
+
+    def __init__(self, latency: str = 'fixed:0.05', stream_rate: float = 2000, rate_limit: float = 0.0,
+                 overloaded: float = 0.0, drop_rate: float = 0.0, small_model_errors: float = 0.0,
+                 batch_seconds: float = 1.0, seed: Optional[int] = None):
+        """
+        Args:
+            latency (str): LatencyModel spec for the time before the first byte.
+            stream_rate (float): Output tokens generated per second.
+            rate_limit (float): Probability of answering 429 rate_limit_error.
+            overloaded (float): Probability of answering 529 overloaded_error.
+            drop_rate (float): Probability of cutting a streamed response halfway.
+            small_model_errors (float): Probability that a haiku model answers a frame
+                request with unusable JSON, to exercise model escalation.
+            batch_seconds (float): Time from creating a message batch until it has ended.
+            seed (Optional[int]): Random seed for reproducible runs.
+        """
+        self.latency = LatencyModel(latency)
+        self.stream_rate = stream_rate
+        self.rate_limit = rate_limit
+        self.overloaded = overloaded
+        self.drop_rate = drop_rate
+        self.small_model_errors = small_model_errors
+        self.batch_seconds = batch_seconds
+        if seed is not None:
+            random.seed(seed)
+        self.lock = threading.Lock()
+        self.cache: Dict[str, float] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = {'requests': 0, 'succeeded': 0, 'streamed': 0, 'rate_limited': 0, 'overloaded': 0,
+                          'dropped': 0, 'invalid': 0, 'small_model_errors': 0, 'input_tokens': 0, 'output_tokens': 0,
+                          'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0, 'in_flight': 0,
+                          'max_in_flight': 0, 'batches': 0, 'batch_requests': 0, 'batch_errored': 0}
+
+    def count(self, **increments: int) -> None:
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def cache_lookup(self, key: str) -> bool:
+        """Return whether a prefix is cached, and (re)write it either way."""
+        now = time.time()
+        with self.lock:
+            hit = self.cache.get(key, 0) > now
+            self.cache[key] = now + CACHE_TTL
+        return hit
+
+
+def count_tokens(value: Any) -> int:
+    """Rough token count of a text, content block or list of them; images use the image_prep estimate."""
+    if isinstance(value, str):
+        return max(1, len(value) // CHARS_PER_TOKEN)
+    if isinstance(value, list):
+        return sum(count_tokens(item) for item in value)
+    if isinstance(value, dict):
+        if value.get('type') == 'image':
+            try:
+                with Image.open(io.BytesIO(base64.b64decode(value['source']['data']))) as img:
+                    return estimate_image_tokens(img.width, img.height)
+            except Exception:
+                return 1600
+        if 'text' in value:
+            return count_tokens(value['text'])
+        return count_tokens(value.get('content', ''))
+    return 0
+
+
+def compute_usage(state: MockState, body: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Input token usage of a request, simulating prompt caching.
+
+    The prefix up to the last block with cache_control (system blocks first,
+    then message blocks) is cached for CACHE_TTL seconds if it has at least
+    MIN_CACHEABLE_TOKENS tokens.
+    """
+    system = body.get('system', [])
+    blocks = [{'type': 'text', 'text': system}] if isinstance(system, str) else list(system)
+    for message in body.get('messages', []):
+        content = message.get('content', '')
+        blocks.extend([{'type': 'text', 'text': content}] if isinstance(content, str) else content)
+
+    total = count_tokens(blocks)
+    breakpoints = [i for i, block in enumerate(blocks) if isinstance(block, dict) and block.get('cache_control')]
+    usage = {'input_tokens': total, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+    if breakpoints:
+        prefix = blocks[:breakpoints[-1] + 1]
+        prefix_tokens = count_tokens(prefix)
+        if prefix_tokens >= MIN_CACHEABLE_TOKENS:
+            key = hashlib.sha1(json.dumps([body.get('model'), prefix], sort_keys=True, ensure_ascii=False)
+                               .encode('utf-8')).hexdigest()
+            field = 'cache_read_input_tokens' if state.cache_lookup(key) else 'cache_creation_input_tokens'
+            usage[field] = prefix_tokens
+            usage['input_tokens'] = total - prefix_tokens
+    return usage
+
+
+def request_text(body: Dict[str, Any]) -> str:
+    """All text of the system prompt and user messages."""
+    parts = []
+    system = body.get('system', '')
+    parts.extend([system] if isinstance(system, str) else [block.get('text', '') for block in system])
+    for message in body.get('messages', []):
+        if message.get('role') != 'user':
+            continue
+        content = message.get('content', '')
+        parts.extend([content] if isinstance(content, str)
+                     else [block.get('text', '') for block in content if block.get('type') == 'text'])
+    return '\n'.join(parts)
+
+
+def response_text(body: Dict[str, Any]) -> str:
+    """
+    Canned answer in the shape the calling utility expects.
+
+    Batched frame requests get a JSON array with their frame timestamps, single
+    frame requests a JSON object, pair comparisons their <scores> line, and
+    everything else a persona-style A-E analysis.
+    """
+    text = request_text(body)
+    if '<scores>' in text:
+        # Scores derived from the request so reruns with the same analyses agree
+        names = re.findall(r'Influencer \d+ \((.+?)\):', text)
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        scores = {'similarity': 40 + digest[0] % 60,
+                  'imitation': {name: 40 + digest[i + 1] % 60 for i, name in enumerate(names)}}
+        return (f"<analysis>\n1. 人设相似度评分: {scores['similarity']}%\n2. 值得模仿评分: 模拟评分\n"
+                f"3. 总结: 模拟服务器生成的对比。\n</analysis>\n<scores>{json.dumps(scores, ensure_ascii=False)}</scores>")
+    timestamps = re.findall(r'Frame timestamp: (\S+)', text)
+    if timestamps:
+        return json.dumps([dict({field: f"mock {field}" for field in FRAME_FIELDS}, timestamp=timestamp, confidence=0.9)
+                           for timestamp in timestamps], ensure_ascii=False)
+    if 'JSON object' in text:
+        return json.dumps(dict({field: f"mock {field}" for field in FRAME_FIELDS}, confidence=0.9), ensure_ascii=False)
+    lines = [f"{field}. 模拟字段: {'2分，模拟评分' if field in ('A4', 'A9') else '模拟回答，用于本地测试'}"
+             for field in PERSONA_FIELDS]
+    lines.append("E. 总结\n这是模拟服务器生成的总结，用于在不消耗 API 额度的情况下测试并发、重试和缓存。")
+    return '\n'.join(lines)
+
+
+def apply_prefill(body: Dict[str, Any], text: str) -> str:
+    """Continue after an assistant prefill, as the API does."""
+    messages = body.get('messages', [])
+    if messages and messages[-1].get('role') == 'assistant':
+        prefill = messages[-1].get('content', '')
+        prefill = prefill if isinstance(prefill, str) else ''.join(block.get('text', '') for block in prefill)
+        return text[len(prefill):] if text.startswith(prefill) else text
+    return text
+
+
+def truncate(text: str, max_tokens: int) -> Tuple[str, str]:
+    """Cut the answer to max_tokens and return it with its stop reason."""
+    if len(text) > max_tokens * CHARS_PER_TOKEN:
+        return text[:max_tokens * CHARS_PER_TOKEN], 'max_tokens'
+    return text, 'end_turn'
+
+
+def validate_message(body: Dict[str, Any]) -> Optional[str]:
+    """Return why a Messages API request body is invalid, or None."""
+    if not body.get('model') or not body.get('messages') or not body.get('max_tokens'):
+        return "model, messages and max_tokens are required"
+    return None
+
+
+def answer_message(state: MockState, body: Dict[str, Any]) -> Tuple[str, str, Dict[str, int], float]:
+    """
+    Answer a valid request.
+
+    Returns:
+        Tuple[str, str, Dict[str, int], float]: Response text, stop reason, usage,
+            and the model's speed factor relative to the configured rates.
+    """
+    usage = compute_usage(state, body)
+    answer = response_text(body)
+    speed = SMALL_MODEL_SPEEDUP if 'haiku' in body['model'] else 1.0
+    if speed > 1.0 and answer.startswith(('[', '{')) and random.random() < state.small_model_errors:
+        state.count(small_model_errors=1)
+        answer = "I'm not able to describe these frames reliably."
+    text, stop_reason = truncate(apply_prefill(body, answer), int(body['max_tokens']))
+    usage['output_tokens'] = max(1, len(text) // CHARS_PER_TOKEN)
+    return text, stop_reason, usage, speed
+
+
+def message_object(body: Dict[str, Any], text: str, stop_reason: str, usage: Dict[str, int]) -> Dict[str, Any]:
+    """A complete Messages API response."""
+    return {
+        'id': f"msg_mock_{random.getrandbits(48):012x}",
+        'type': 'message',
+        'role': 'assistant',
+        'model': body['model'],
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': stop_reason,
+        'stop_sequence': None,
+        'usage': usage,
+    }
+
+
+def batch_object(batch: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """The Message Batches API view of a stored batch; it has ended once its end time has passed."""
+    ended = time.time() >= batch['ends_at']
+    results = batch['results']
+    errored = sum(1 for entry in results if entry['result']['type'] == 'errored')
+    return {
+        'id': batch['id'],
+        'type': 'message_batch',
+        'processing_status': 'ended' if ended else 'in_progress',
+        'request_counts': {'processing': 0 if ended else len(results),
+                           'succeeded': len(results) - errored if ended else 0,
+                           'errored': errored if ended else 0, 'canceled': 0, 'expired': 0},
+        'created_at': batch['created_at'],
+        'ended_at': batch['ended_at'] if ended else None,
+        'expires_at': batch['expires_at'],
+        'cancel_initiated_at': None,
+        'archived_at': None,
+        'results_url': f"{base_url}{BATCHES_PATH}/{batch['id']}/results" if ended else None,
+    }
+
+
+def iso_time(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockAnthropic/1.0'
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, error_type: str, message: str,
+                    headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {'type': 'error', 'error': {'type': error_type, 'message': message}}, headers)
+
+    def _write_event(self, event: str, payload: Dict[str, Any]) -> None:
+        data = f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _authorized(self) -> bool:
+        if self.headers.get('x-api-key') or self.headers.get('authorization'):
+            return True
+        self.state.count(invalid=1)
+        self._send_error(401, 'authentication_error', "Missing x-api-key header")
+        return False
+
+    def do_GET(self) -> None:
+        path = self.path.split('?')[0]
+        if path == '/stats':
+            with self.state.lock:
+                self._send_json(200, dict(self.state.stats))
+        elif path.startswith(BATCHES_PATH + '/'):
+            if self._authorized():
+                self._get_batch(path[len(BATCHES_PATH) + 1:])
+        else:
+            self._send_error(404, 'not_found_error', f"Unknown path {self.path}")
+
+    def do_POST(self) -> None:
+        raw = self._read_body()
+        if self.path == '/stats/reset':
+            self.state.reset_stats()
+            self._send_json(200, {'reset': True})
+            return
+        if self.path.split('?')[0] == BATCHES_PATH:
+            if self._authorized():
+                self._create_batch(raw)
+            return
+        if self.path.split('?')[0] != '/v1/messages':
+            self._send_error(404, 'not_found_error', f"Unknown path {self.path}")
+            return
+
+        self.state.count(requests=1, in_flight=1)
+        try:
+            self._handle_message(raw)
+        finally:
+            self.state.count(in_flight=-1)
+
+    def _handle_message(self, raw: bytes) -> None:
+        if not self._authorized():
+            return
+        try:
+            body = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.state.count(invalid=1)
+            self._send_error(400, 'invalid_request_error', f"Invalid JSON body: {str(e)}")
+            return
+        error = validate_message(body)
+        if error:
+            self.state.count(invalid=1)
+            self._send_error(400, 'invalid_request_error', error)
+            return
+
+        roll = random.random()
+        if roll < self.state.rate_limit:
+            self.state.count(rate_limited=1)
+            self._send_error(429, 'rate_limit_error', "Mock rate limit", {'retry-after': str(RETRY_AFTER)})
+            return
+        if roll < self.state.rate_limit + self.state.overloaded:
+            self.state.count(overloaded=1)
+            self._send_error(529, 'overloaded_error', "Mock overload")
+            return
+
+        text, stop_reason, usage, speed = answer_message(self.state, body)
+        time.sleep(self.state.latency.sample() / speed)
+
+        if body.get('stream'):
+            self._stream_response(body, text, stop_reason, usage)
+            return
+
+        time.sleep(usage['output_tokens'] / (self.state.stream_rate * speed))
+        self.state.count(succeeded=1, **usage)
+        self._send_json(200, message_object(body, text, stop_reason, usage))
+
+    def _create_batch(self, raw: bytes) -> None:
+        """
+        Create a message batch.
+
+        Every request is answered right away, but the batch only reports
+        ended, with a results URL, after batch_seconds. The --overloaded
+        probability applies per request and turns it into an errored result;
+        --rate-limit applies to the create call itself.
+        """
+        try:
+            body = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.state.count(invalid=1)
+            self._send_error(400, 'invalid_request_error', f"Invalid JSON body: {str(e)}")
+            return
+        entries = body.get('requests')
+        custom_ids = [entry.get('custom_id') for entry in entries or [] if isinstance(entry, dict)]
+        if not entries or not all(custom_ids) or len(set(custom_ids)) != len(entries):
+            self.state.count(invalid=1)
+            self._send_error(400, 'invalid_request_error', "requests must be a non-empty list with unique custom_ids")
+            return
+        for entry in entries:
+            error = validate_message(entry.get('params') or {})
+            if error:
+                self.state.count(invalid=1)
+                self._send_error(400, 'invalid_request_error', f"requests[{entry['custom_id']}].params: {error}")
+                return
+        if random.random() < self.state.rate_limit:
+            self.state.count(rate_limited=1)
+            self._send_error(429, 'rate_limit_error', "Mock rate limit", {'retry-after': str(RETRY_AFTER)})
+            return
+
+        results = []
+        for entry in entries:
+            params = entry['params']
+            if random.random() < self.state.overloaded:
+                self.state.count(batch_errored=1)
+                result = {'type': 'errored', 'error': {'type': 'error', 'error': {
+                    'type': 'overloaded_error', 'message': "Mock overload"}}}
+            else:
+                text, stop_reason, usage, _ = answer_message(self.state, params)
+                self.state.count(succeeded=1, **usage)
+                result = {'type': 'succeeded', 'message': message_object(params, text, stop_reason, usage)}
+            results.append({'custom_id': entry['custom_id'], 'result': result})
+        # Like the real API, results come back in no particular order
+        random.shuffle(results)
+
+        now = time.time()
+        batch = {'id': f"msgbatch_mock_{random.getrandbits(48):012x}", 'results': results,
+                 'ends_at': now + self.state.batch_seconds, 'created_at': iso_time(now),
+                 'ended_at': iso_time(now + self.state.batch_seconds), 'expires_at': iso_time(now + 86400)}
+        with self.state.lock:
+            self.state.batches[batch['id']] = batch
+        self.state.count(batches=1, batch_requests=len(entries))
+        self._send_json(200, batch_object(batch, self._base_url()))
+
+    def _get_batch(self, batch_path: str) -> None:
+        """Serve a batch's status, or its results as JSON lines once it has ended."""
+        batch_id, _, rest = batch_path.partition('/')
+        with self.state.lock:
+            batch = self.state.batches.get(batch_id)
+        if batch is None or rest not in ('', 'results'):
+            self._send_error(404, 'not_found_error', f"Unknown batch {batch_path}")
+            return
+        status = batch_object(batch, self._base_url())
+        if not rest:
+            self._send_json(200, status)
+        elif status['processing_status'] != 'ended':
+            self._send_error(400, 'invalid_request_error', f"Batch {batch_id} has not ended yet")
+        else:
+            data = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in batch['results']).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-jsonl')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]}"
+
+    def _stream_response(self, body: Dict[str, Any], text: str, stop_reason: str, usage: Dict[str, int]) -> None:
+        self.state.count(streamed=1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        input_usage = {key: value for key, value in usage.items() if key != 'output_tokens'}
+        self._write_event('message_start', {'type': 'message_start', 'message': {
+            'id': f"msg_mock_{random.getrandbits(48):012x}", 'type': 'message', 'role': 'assistant',
+            'model': body['model'], 'content': [], 'stop_reason': None, 'usage': dict(input_usage, output_tokens=1)}})
+        self._write_event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                                  'content_block': {'type': 'text', 'text': ''}})
+        self._write_event('ping', {'type': 'ping'})
+
+        drop_at = len(text) // 2 if random.random() < self.state.drop_rate else None
+        delay = STREAM_CHUNK_CHARS / CHARS_PER_TOKEN / self.state.stream_rate
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            if drop_at is not None and start >= drop_at:
+                # Cut the connection without the terminating chunk, like a network drop
+                self.state.count(dropped=1)
+                self.close_connection = True
+                return
+            self._write_event('content_block_delta', {'type': 'content_block_delta', 'index': 0, 'delta': {
+                'type': 'text_delta', 'text': text[start:start + STREAM_CHUNK_CHARS]}})
+            time.sleep(delay)
+
+        self._write_event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        self._write_event('message_delta', {'type': 'message_delta',
+                                            'delta': {'stop_reason': stop_reason, 'stop_sequence': None},
+                                            'usage': {'output_tokens': usage['output_tokens']}})
+        self._write_event('message_stop', {'type': 'message_stop'})
+        self.wfile.write(b"0\r\n\r\n")
+        self.state.count(succeeded=1, **usage)
+
+
+def start_server(state: MockState, host: str = DEFAULT_HOST, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the mock server on a background thread.
+
+    Args:
+        state (MockState): Configuration and statistics.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free one.
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: The server (call shutdown() to stop it)
+            and its base URL, e.g. http://127.0.0.1:8765.
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the MockState options to a command-line parser."""
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="Time to first byte: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--stream-rate", type=float, default=2000, help="Output tokens per second")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--overloaded", type=float, default=0.0, help="Probability of a 529 response")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability of cutting a stream halfway")
+    parser.add_argument("--small-model-errors", type=float, default=0.0,
+                        help="Probability that a haiku model returns unusable frame JSON")
+    parser.add_argument("--batch-seconds", type=float, default=1.0,
+                        help="Seconds until a message batch has ended")
+    parser.add_argument("--seed", type=int, help="Random seed")
+
+
+def state_from_arguments(args: argparse.Namespace) -> MockState:
+    return MockState(latency=args.latency, stream_rate=args.stream_rate, rate_limit=args.rate_limit,
+                     overloaded=args.overloaded, drop_rate=args.drop_rate,
+                     small_model_errors=args.small_model_errors, batch_seconds=args.batch_seconds, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic Messages API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server, url = start_server(state_from_arguments(args), args.host, args.port)
+    logger.info(f"Mock Anthropic API listening on {url}")
+    logger.info(f"Use CLAUDE_API_URL={url}/v1/messages and ANTHROPIC_BASE_URL={url}; statistics at {url}/stats")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Per-task model policies and latency/token metrics for the Claude utilities.
+
+Every task has an escalation chain of models. The first model answers every
+request; a later one is only asked when the caller rejects the earlier answer,
+e.g. because its JSON did not parse or it reported low confidence. Chains can
+be overridden per task with CLAUDE_MODEL_<TASK>, a comma-separated list such as
+CLAUDE_MODEL_FRAMES=claude-3-5-sonnet-20240620.
+
+    python utility/model_router.py [--log Data/claude_usage.jsonl] [--task frames]
+
+prints per-task and per-model latency, token and escalation figures from the
+usage log.
+"""
+import os
+import json
+import argparse
+import logging
+import threading
+import statistics
+from typing import List, Dict, Any, Optional, Iterable
+
+from claude_api import record_usage, USAGE_LOG
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SMALL_MODEL = 'claude-3-haiku-20240307'
+LARGE_MODEL = 'claude-3-5-sonnet-20240620'
+# task: models in escalation order
+TASK_POLICIES = {
+    'frames': [SMALL_MODEL, LARGE_MODEL],  # simple tagging; fast model first
+    'persona': [LARGE_MODEL],
+    'compare': [LARGE_MODEL],
+}
+DEFAULT_POLICY = [LARGE_MODEL]
+MIN_CONFIDENCE = float(os.environ.get('CLAUDE_MIN_CONFIDENCE', '0.6'))  # lower self-reported confidence escalates
+
+# Usage entries recorded through record_call in this process
+_session_entries: List[Dict[str, Any]] = []
+_session_lock = threading.Lock()
+
+
+def models_for(task: str) -> List[str]:
+    """
+    Return a task's escalation chain, honouring a CLAUDE_MODEL_<TASK> override.
+
+    Args:
+        task (str): Task name, e.g. "frames".
+
+    Returns:
+        List[str]: Model names in the order they are tried.
+    """
+    override = os.environ.get(f"CLAUDE_MODEL_{task.upper()}")
+    if override:
+        models = [model.strip() for model in override.split(',') if model.strip()]
+        if models:
+            return models
+    return list(TASK_POLICIES.get(task, DEFAULT_POLICY))
+
+
+def model_for(task: str) -> str:
+    """Return the model that answers a task's requests first."""
+    return models_for(task)[0]
+
+
+def is_confident(result: Dict[str, Any], min_confidence: float = MIN_CONFIDENCE) -> bool:
+    """
+    Check a parsed answer's self-reported confidence.
+
+    Answers without a usable confidence value count as confident, so prompts
+    that do not ask for one never escalate on this check.
+
+    Args:
+        result (Dict[str, Any]): Parsed answer, optionally with a 'confidence' between 0 and 1.
+        min_confidence (float): Lowest confidence that is accepted.
+
+    Returns:
+        bool: False only if the answer reports a confidence below min_confidence.
+    """
+    try:
+        return float(result.get('confidence', 1.0)) >= min_confidence
+    except (TypeError, ValueError):
+        return True
+
+
+def record_call(task: str, model: str, usage: Optional[Dict[str, Any]], elapsed: Optional[float] = None,
+                escalated: int = 0, **extra: Any) -> Dict[str, Any]:
+    """
+    Log a routed request's usage and keep it for this process's summary.
+
+    Args:
+        task (str): Task name.
+        model (str): Model that answered.
+        usage (Optional[Dict[str, Any]]): The response's usage object.
+        elapsed (Optional[float]): Request duration in seconds.
+        escalated (int): Items of this request that were handed to the next model.
+        **extra (Any): Additional fields for the usage log.
+
+    Returns:
+        Dict[str, Any]: The recorded entry.
+    """
+    entry = record_usage(task, usage, elapsed, model=model, escalated=escalated, **extra)
+    with _session_lock:
+        _session_entries.append(entry)
+    return entry
+
+
+def session_entries() -> List[Dict[str, Any]]:
+    """Usage entries recorded through record_call so far in this process."""
+    with _session_lock:
+        return list(_session_entries)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def summarize(entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregate usage entries per task and model.
+
+    Args:
+        entries (Iterable[Dict[str, Any]]): Entries as written by claude_api.record_usage.
+
+    Returns:
+        List[Dict[str, Any]]: One row per task and model with request and item
+            counts, escalations, latency percentiles and mean tokens per request.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        groups.setdefault((entry.get('task', '-'), entry.get('model') or '-'), []).append(entry)
+
+    rows = []
+    for (task, model), group in sorted(groups.items()):
+        latencies = [entry['elapsed'] for entry in group if entry.get('elapsed') is not None]
+        items = sum(entry.get('frames') or 1 for entry in group)
+        rows.append({
+            'task': task,
+            'model': model,
+            'requests': len(group),
+            'items': items,
+            'escalated': sum(entry.get('escalated') or 0 for entry in group),
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'seconds_per_item': round(sum(latencies) / items, 3) if latencies else 0.0,
+            'input_tokens': round(statistics.mean(entry['input_tokens'] + entry['cache_creation_input_tokens']
+                                                  + entry['cache_read_input_tokens'] for entry in group)),
+            'output_tokens': round(statistics.mean(entry['output_tokens'] for entry in group)),
+        })
+    return rows
+
+
+def format_summary(rows: List[Dict[str, Any]]) -> str:
+    """Format summarize() rows as a text table."""
+    lines = [f"{'task':<16} {'model':<28} {'reqs':>5} {'items':>6} {'escal':>5} {'p50 s':>6} {'p95 s':>6} "
+             f"{'s/item':>7} {'in/req':>7} {'out/req':>7}"]
+    for row in rows:
+        lines.append(f"{row['task']:<16} {row['model']:<28} {row['requests']:>5} {row['items']:>6} "
+                     f"{row['escalated']:>5} {row['p50']:>6} {row['p95']:>6} {row['seconds_per_item']:>7} "
+                     f"{row['input_tokens']:>7} {row['output_tokens']:>7}")
+    return '\n'.join(lines)
+
+
+def load_usage_log(log_path: str = USAGE_LOG) -> List[Dict[str, Any]]:
+    """Read the entries of a usage log, skipping unreadable lines."""
+    entries = []
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-task latency, token and escalation report from the usage log.")
+    parser.add_argument("--log", default=USAGE_LOG, help="Usage log written by the Claude utilities")
+    parser.add_argument("--task", action="append", help="Only report these tasks (repeatable)")
+    parser.add_argument("--since", help="Only report entries at or after this ISO time, e.g. 2024-07-01")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"No usage log at {args.log}")
+        return 1
+    entries = [entry for entry in load_usage_log(args.log)
+               if (not args.task or entry.get('task') in args.task)
+               and (not args.since or entry.get('time', '') >= args.since)]
+    print(format_summary(summarize(entries)))
+    print("\nrouting policies:")
+    for task in sorted({entry.get('task', '-') for entry in entries}):
+        print(f"  {task}: {' -> '.join(models_for(task))}")
+
+
+if __name__ == "__main__":
+    main()
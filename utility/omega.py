@@ -0,0 +1,93 @@
+"""
+Single entry point for the Omega utilities.
+
+    python utility/omega.py <command> [args...]
+
+Each command's module is only imported once that command runs, so listing the
+commands does not load selenium, whisper, numpy or the API clients, and
+API keys are only checked by the commands that send requests. Keep the
+imports at the top of this file to the standard library.
+"""
+import os
+import sys
+import argparse
+import importlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# command: (module, help); commands listed here pass their arguments to the module's main()
+PASSTHROUGH_COMMANDS = {
+    'snapshot': ('web_snapshot', "Capture scrolling screenshots of the URLs in a file"),
+    'extract-frames': ('extract_frames', "Extract frames from a video with ffmpeg (fps, scene or sparse)"),
+    'audio': ('extract_audio', "Extract the audio track of a video or a folder of videos"),
+    'srt': ('generate_srt', "Transcribe video or audio files and folders to SRT subtitles with Whisper"),
+    'persona': ('persona', "Analyze influencer personas from screenshot folders"),
+    'compare': ('compare', "Compare analyzed influencers with the reference persona"),
+    'frames': ('frame_explain', "Describe extracted video frames with Claude"),
+    'index': ('persona_index', "Nearest-neighbour search over persona analyses"),
+    'store': ('persona_store', "Import and export the structured persona database"),
+    'mock': ('mock_anthropic', "Run the local mock Anthropic API"),
+    'loadtest': ('load_test', "Load-test the Claude utilities against the mock API"),
+    'usage': ('model_router', "Per-task latency, token and escalation report"),
+}
+
+
+def run_douyin(argv):
+    parser = argparse.ArgumentParser(prog="omega douyin", description="Download a Douyin video.")
+    parser.add_argument("video_url")
+    parser.add_argument("output_folder")
+    args = parser.parse_args(argv)
+    importlib.import_module('dy_download').download_douyin_video(args.video_url, args.output_folder)
+
+
+# command: (runner, help); commands listed here parse their own arguments
+DIRECT_COMMANDS = {
+    'douyin': (run_douyin, "Download a Douyin video"),
+}
+
+
+def run_passthrough(command, argv):
+    """Import a command's module and run its main() as if it had been started directly."""
+    module_name = PASSTHROUGH_COMMANDS[command][0]
+    module = importlib.import_module(module_name)
+    saved_argv = sys.argv
+    sys.argv = [f"omega {command}"] + argv
+    try:
+        return module.main()
+    finally:
+        sys.argv = saved_argv
+
+
+def build_parser():
+    commands = {**{name: help_text for name, (_, help_text) in PASSTHROUGH_COMMANDS.items()},
+                **{name: help_text for name, (_, help_text) in DIRECT_COMMANDS.items()}}
+    width = max(len(name) for name in commands)
+    epilog = "commands:\n" + "\n".join(f"  {name:<{width}}  {help_text}" for name, help_text in commands.items())
+    epilog += "\n\nRun 'omega <command> --help' for a command's options."
+    parser = argparse.ArgumentParser(prog="omega", description="Omega influencer and video analysis utilities.",
+                                     epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(commands), metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    # The utilities import each other as sibling modules
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    try:
+        if args.command in DIRECT_COMMANDS:
+            return DIRECT_COMMANDS[args.command][0](args.args)
+        return run_passthrough(args.command, args.args)
+    except Exception as e:
+        # Report a missing API key without a traceback; everything else propagates
+        from claude_api import MissingAPIKey
+        if not isinstance(e, MissingAPIKey):
+            raise
+        print(f"omega {args.command}: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
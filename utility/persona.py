@@ -1,38 +1,45 @@
 import os
 import requests
-import base64
 import json
+import hashlib
 import logging
-from PIL import Image
-import io
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import time
+from persona_store import save_persona
+from model_router import model_for
+from claude_api import cached_system, record_usage, stream_message, require_api_key, post_message
+from batch_jobs import BatchJob, result_text, default_job_name
+from image_prep import LazyImage, per_image_tokens, QUALITY_TIERS
+from frame_pack import list_frames, read_bytes, is_pack
+import argparse
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Constants
-CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY')
-if not CLAUDE_API_KEY:
-    raise ValueError("CLAUDE_API_KEY environment variable is not set")
-
-CLAUDE_API_URL = 'https://api.anthropic.com/v1/messages'
+CLAUDE_API_URL = os.environ.get('CLAUDE_API_URL', 'https://api.anthropic.com/v1/messages')
+MODEL = model_for('persona')  # see model_router.TASK_POLICIES
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
-MAX_IMAGE_SIZE = 1.15  # megapixels
+STREAM = os.environ.get('CLAUDE_STREAM', '1') != '0'  # stream responses into the output file
+IMAGE_TOKEN_BUDGET = int(os.environ.get('IMAGE_TOKEN_BUDGET', 60000))  # image tokens per request
+IMAGE_QUALITY = os.environ.get('IMAGE_QUALITY', 'high')  # per-image cap, see image_prep.QUALITY_TIERS
+MAX_IMAGES_PER_REQUEST = 100  # API limit on images in one message
+SHARD_WORKERS = int(os.environ.get('PERSONA_SHARD_WORKERS', 4))  # concurrent shard requests
+SHARD_CACHE_DIRECTORY = os.environ.get('PERSONA_SHARD_CACHE', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'persona_shards'))
 DEFAULT_IMAGE_FOLDER = os.environ.get('DEFAULT_IMAGE_FOLDER', os.path.join('Data', 'test_picture'))
 OUTPUT_DIRECTORY = os.environ.get('OUTPUT_DIRECTORY', 'Data')
+PERSONA_DATABASE = os.environ.get('PERSONA_DATABASE', 'personas.sqlite')  # relative to OUTPUT_DIRECTORY
 
-# Define your complex prompt here
+# Define your complex prompt here. It is sent as a cached system prompt, so keep
+# it free of per-request data; the images go into the user message.
 ANALYSIS_PROMPT = """
 You will be analyzing a social media influencer's short video content based on the provided information. Your task is to evaluate the influencer using a specific analysis framework. Your evaluation should be vivid, descriptive, and easy to understand. Pay close attention to the word count requirements in parentheses. Strictly follow the framework structure and maintain consistent formatting.
 
-Here is the influencer data you will be analyzing:
-
-<influencer_data>
-{{INFLUENCER_DATA}}
-</influencer_data>
+The influencer data you will be analyzing is provided in the user's message as screenshots of the influencer's account and videos.
 
 Please provide your analysis using the following structure:
 
@@ -83,52 +90,32 @@ When providing scores or evaluations, always explain your reasoning before givin
 
 For the summary section, focus on synthesizing the key points from your analysis, highlighting the most distinctive aspects of the influencer's persona and content. Include specific examples from their videos to illustrate your points, but avoid making recommendations or suggestions for improvement.
 """
+ANALYSIS_REQUEST = "Here is the influencer data. Please provide your analysis following the framework."
+SHARD_REQUEST = ("Here is part of the influencer data; the remaining screenshots are analyzed separately. "
+                 "Please provide your analysis of these screenshots following the framework.")
+REDUCE_REQUEST = """The influencer's screenshots were too many for one request, so they were analyzed in {count} parts. Each partial analysis below follows the framework but only covers its own screenshots.
 
-def resize_image(img: Image.Image, max_size: float = MAX_IMAGE_SIZE) -> Image.Image:
-    """
-    Resize an image if it exceeds the maximum size.
-
-    Args:
-        img (Image.Image): The image to resize.
-        max_size (float): Maximum size in megapixels.
-
-    Returns:
-        Image.Image: Resized image if necessary, otherwise the original image.
-    """
-    width, height = img.size
-    megapixels = (width * height) / 1_000_000
-
-    if megapixels <= max_size:
-        return img
+{analyses}
 
-    scale = (max_size / megapixels) ** 0.5
-    new_width = int(width * scale)
-    new_height = int(height * scale)
+Please merge them into one analysis of the whole account following the framework. Combine lists and examples across the parts, base the scores on the account as a whole, and write the summary for the whole account."""
 
-    return img.resize((new_width, new_height), Image.LANCZOS)
-
-def encode_image(file_path: str) -> str:
+def encode_image(file_path: str, max_tokens: int = QUALITY_TIERS[IMAGE_QUALITY]) -> LazyImage:
     """
-    Encode an image file to base64, resizing if necessary.
+    Prepare an image file to be resized to a token budget and encoded on upload.
 
     Args:
         file_path (str): Path to the image file.
+        max_tokens (int): Token budget for this image.
 
     Returns:
-        str: Base64 encoded image data.
+        LazyImage: Image that is encoded when the request body is written.
 
     Raises:
         IOError: If there's an error reading the image file.
         ValueError: If the image format is not supported.
     """
     try:
-        with Image.open(file_path) as img:
-            img = resize_image(img)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG")
-            return base64.b64encode(buffer.getvalue()).decode('utf-8')
+        return LazyImage(file_path, max_tokens)
     except IOError as e:
         logger.error(f"Error reading image file {file_path}: {str(e)}")
         raise
@@ -136,85 +123,285 @@ def encode_image(file_path: str) -> str:
         logger.error(f"Unsupported image format for file {file_path}: {str(e)}")
         raise
 
-def encode_images(image_folder: str) -> List[Dict[str, Any]]:
+def list_images(image_folder: str) -> List[str]:
+    """Return the paths of all images in a folder, sorted by filename, or of all frames in a frame pack."""
+    return list_frames(image_folder, ('.png', '.jpg', '.jpeg'))
+
+def encode_image_files(file_paths: List[str]) -> Tuple[List[LazyImage], int]:
     """
-    Encode all images in a folder.
+    Prepare images for one request, sharing IMAGE_TOKEN_BUDGET between them.
+
+    The images are only resized and base64-encoded one at a time while the
+    request body is streamed by claude_api.iter_json_body, so memory use stays
+    near one image however many the request holds.
 
     Args:
-        image_folder (str): Path to the folder containing images.
+        file_paths (List[str]): Paths to the image files.
 
     Returns:
-        List[Dict[str, Any]]: List of encoded image objects.
+        Tuple[List[LazyImage], int]: Images for the request content and their
+            estimated total input tokens.
     """
+    max_tokens = per_image_tokens(len(file_paths), IMAGE_TOKEN_BUDGET, IMAGE_QUALITY)
+
     encoded_images = []
-    for filename in os.listdir(image_folder):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            file_path = os.path.join(image_folder, filename)
-            try:
-                encoded_image = encode_image(file_path)
-                encoded_images.append({
-                    'type': 'image',
-                    'source': {
-                        'type': 'base64',
-                        'media_type': 'image/jpeg',
-                        'data': encoded_image
-                    }
-                })
-                logger.info(f"Successfully encoded image: {filename}")
-            except Exception as e:
-                logger.error(f"Error encoding image {filename}: {str(e)}")
-    return encoded_images
-
-def analyze_images(image_folder: str, output_file: str) -> None:
+    estimated_tokens = 0
+    for file_path in file_paths:
+        filename = os.path.basename(file_path)
+        try:
+            image = encode_image(file_path, max_tokens)
+            encoded_images.append(image)
+            estimated_tokens += image.estimated_tokens
+            logger.info(f"Prepared image: {filename} ({image.width}x{image.height}, ~{image.estimated_tokens} tokens)")
+        except Exception as e:
+            logger.error(f"Error encoding image {filename}: {str(e)}")
+    return encoded_images, estimated_tokens
+
+def encode_images(image_folder: str) -> Tuple[List[LazyImage], int]:
     """
-    Analyze images using the Claude API and save the results.
+    Prepare all images in a folder as one request.
 
     Args:
         image_folder (str): Path to the folder containing images.
-        output_file (str): Path to save the analysis results.
 
-    Raises:
-        ValueError: If no valid images are found in the folder.
-        requests.RequestException: If there's an error communicating with the Claude API.
+    Returns:
+        Tuple[List[LazyImage], int]: Images for the request content and their
+            estimated total input tokens.
     """
-    encoded_images = encode_images(image_folder)
-    
-    if not encoded_images:
-        logger.error("No valid images found in the folder.")
-        raise ValueError("No valid images found in the folder.")
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'X-API-Key': CLAUDE_API_KEY,
-        'anthropic-version': '2023-06-01'
-    }
-    
-    data = {
-        'model': 'claude-3-5-sonnet-20240620',
+    return encode_image_files(list_images(image_folder))
+
+def max_shard_size() -> int:
+    """Most images one request can hold at full IMAGE_QUALITY within IMAGE_TOKEN_BUDGET."""
+    return max(1, min(MAX_IMAGES_PER_REQUEST, IMAGE_TOKEN_BUDGET // QUALITY_TIERS[IMAGE_QUALITY]))
+
+def shard_images(file_paths: List[str], max_size: Optional[int] = None) -> List[List[str]]:
+    """
+    Split a folder's images into shards that each fit one request.
+
+    Shard boundaries depend on the filenames rather than on positions: once a
+    shard holds max_size / 2 images it ends after the next image whose name
+    hashes to a boundary, or at max_size. Adding or removing images therefore
+    only changes the shards around them, and every other shard keeps its cached
+    analysis.
+
+    Args:
+        file_paths (List[str]): Image paths sorted by filename.
+        max_size (Optional[int]): Images per shard; defaults to max_shard_size().
+
+    Returns:
+        List[List[str]]: Shards in filename order; a single shard if everything fits.
+    """
+    max_size = max_size or max_shard_size()
+    if len(file_paths) <= max_size:
+        return [file_paths]
+
+    min_size = max(1, max_size // 2)
+    spacing = max(1, max_size // 4)  # expected images between boundaries after min_size
+    shards, current = [], []
+    for file_path in file_paths:
+        current.append(file_path)
+        name_hash = int.from_bytes(hashlib.sha1(os.path.basename(file_path).encode('utf-8')).digest()[:4], 'big')
+        boundary = len(current) >= min_size and name_hash % spacing == 0
+        if boundary or len(current) >= max_size:
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+def shard_key(file_paths: List[str]) -> str:
+    """Cache key of a shard: its image names and contents plus everything that shapes the request."""
+    digest = hashlib.sha1(json.dumps([MODEL, IMAGE_QUALITY, IMAGE_TOKEN_BUDGET, ANALYSIS_PROMPT, SHARD_REQUEST],
+                                     ensure_ascii=False).encode('utf-8'))
+    for file_path in file_paths:
+        digest.update(os.path.basename(file_path).encode('utf-8') + b'\0')
+        digest.update(hashlib.sha1(read_bytes(file_path)).digest())
+    return digest.hexdigest()
+
+def build_analysis_request(encoded_images: List[LazyImage], request_text: str = ANALYSIS_REQUEST) -> Dict[str, Any]:
+    """
+    Build the Messages API request body for one influencer's images.
+
+    Args:
+        encoded_images (List[LazyImage]): Images from encode_images.
+        request_text (str): Instruction following the images.
+
+    Returns:
+        Dict[str, Any]: Request body; serialize it with claude_api.iter_json_body.
+    """
+    return {
+        'model': MODEL,
         'max_tokens': 2000,
         'temperature': 1.0,
         #'top_k': 40,  # Added top_k parameter
         #'top_p': 0.95,  # Added top_p parameter
+        'system': cached_system(ANALYSIS_PROMPT),
         'messages': [
             {
                 'role': 'user',
-                'content': encoded_images + [{'type': 'text', 'text': ANALYSIS_PROMPT}]
+                'content': encoded_images + [{'type': 'text', 'text': request_text}]
             }
         ]
     }
+
+def build_reduce_request(partial_analyses: List[str]) -> Dict[str, Any]:
+    """Build the request that merges per-shard analyses into one analysis."""
+    analyses = '\n\n'.join(f'<partial_analysis index="{i}">\n{analysis}\n</partial_analysis>'
+                           for i, analysis in enumerate(partial_analyses, 1))
+    request_text = REDUCE_REQUEST.format(count=len(partial_analyses), analyses=analyses)
+    return build_analysis_request([], request_text)
+
+def api_headers() -> Dict[str, str]:
+    """Return the Messages API request headers, checking that CLAUDE_API_KEY is set."""
+    return {
+        'Content-Type': 'application/json',
+        'X-API-Key': require_api_key(),
+        'anthropic-version': '2023-06-01'
+    }
+
+def post_analysis(data: Dict[str, Any], task: str, **extra: Any) -> str:
+    """
+    Send one non-streaming analysis request, retrying failures.
+
+    Args:
+        data (Dict[str, Any]): Request body.
+        task (str): Task name for the usage log.
+        **extra (Any): Additional fields for the usage log.
+
+    Returns:
+        str: Response text.
+
+    Raises:
+        requests.RequestException: If every attempt fails.
+    """
+    result = post_message(CLAUDE_API_URL, api_headers(), data, task, MAX_RETRIES, RETRY_DELAY, **extra)
+    return result['content'][0]['text']
+
+def shard_cache_file(shard: List[str]) -> str:
+    """Path of a shard's cached partial analysis in SHARD_CACHE_DIRECTORY."""
+    return os.path.join(SHARD_CACHE_DIRECTORY, f"{shard_key(shard)}.txt")
+
+def read_shard_cache(cache_file: str) -> Optional[str]:
+    """Return a cached partial analysis, or None if the shard has not been analyzed yet."""
+    if not os.path.exists(cache_file):
+        return None
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def write_shard_cache(cache_file: str, analysis: str) -> None:
+    """Store a shard's partial analysis so later runs reuse it."""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(analysis)
+    os.replace(temp_file, cache_file)
+
+def analyze_shard(shard: List[str]) -> str:
+    """
+    Analyze one shard of a folder's images, reusing the cached result if it exists.
+
+    Args:
+        shard (List[str]): Image paths from shard_images.
+
+    Returns:
+        str: The shard's partial analysis, or '' if none of its images could be encoded.
+    """
+    cache_file = shard_cache_file(shard)
+    cached = read_shard_cache(cache_file)
+    if cached is not None:
+        logger.info(f"Using cached analysis for shard starting at {os.path.basename(shard[0])}")
+        return cached
+
+    encoded_images, estimated_tokens = encode_image_files(shard)
+    if not encoded_images:
+        return ''
+    analysis = post_analysis(build_analysis_request(encoded_images, SHARD_REQUEST), 'persona_shard',
+                             estimated_image_tokens=estimated_tokens, images=len(shard))
+    write_shard_cache(cache_file, analysis)
+    return analysis
+
+def analyze_shards(shards: List[List[str]]) -> List[str]:
+    """Analyze shards concurrently and return their non-empty analyses in shard order."""
+    with ThreadPoolExecutor(max_workers=SHARD_WORKERS) as executor:
+        analyses = list(executor.map(analyze_shard, shards))
+    return [analysis for analysis in analyses if analysis]
+
+def save_analysis(image_folder: str, output_file: str, analysis: str, database: Optional[str] = None) -> None:
+    """
+    Write an analysis to its output file and optionally to the persona database.
+
+    Args:
+        image_folder (str): Path to the analyzed image folder.
+        output_file (str): Path to save the analysis results.
+        analysis (str): Analysis text from Claude.
+        database (Optional[str]): SQLite database to also store the parsed analysis in.
+    """
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"Analysis for images in {image_folder}:\n\n")
+        f.write(analysis)
+    logger.info(f"Analysis completed. Results saved to {output_file}")
+    save_record(image_folder, analysis, database)
+
+def save_record(image_folder: str, analysis: str, database: Optional[str]) -> None:
+    """Store the parsed analysis in the persona database, if one is given."""
+    if database:
+        record = save_persona(os.path.basename(os.path.normpath(image_folder)), analysis,
+                              source=image_folder, database=database)
+        logger.info(f"Structured record for '{record['name']}' saved to {database}")
+
+def analyze_images(image_folder: str, output_file: str, database: Optional[str] = None,
+                   stream: bool = STREAM) -> None:
+    """
+    Analyze images using the Claude API and save the results.
+
+    Folders with more images than fit one request at full quality are split
+    with shard_images; each shard is analyzed concurrently and cached, and one
+    final request merges the partial analyses into the framework.
+
+    Args:
+        image_folder (str): Path to the folder containing images.
+        output_file (str): Path to save the analysis results.
+        database (Optional[str]): SQLite database to also store the parsed analysis in.
+        stream (bool): Stream the response into output_file as it is generated.
+
+    Raises:
+        ValueError: If no valid images are found in the folder.
+        requests.RequestException: If there's an error communicating with the Claude API.
+    """
+    image_paths = list_images(image_folder)
+    shards = shard_images(image_paths)
+    if len(shards) > 1:
+        logger.info(f"Splitting {len(image_paths)} images into {len(shards)} shards")
+        partial_analyses = analyze_shards(shards)
+        found_images = bool(partial_analyses)
+        data = build_reduce_request(partial_analyses)
+        usage_extra = {'shards': len(partial_analyses)}
+    else:
+        encoded_images, estimated_tokens = encode_image_files(image_paths)
+        found_images = bool(encoded_images)
+        data = build_analysis_request(encoded_images)
+        usage_extra = {'estimated_image_tokens': estimated_tokens}
+
+    if not found_images:
+        logger.error("No valid images found in the folder.")
+        raise ValueError("No valid images found in the folder.")
+    
+    if not stream:
+        analysis = post_analysis(data, 'persona', folder=image_folder, **usage_extra)
+        save_analysis(image_folder, output_file, analysis, database)
+        return
+
+    headers = api_headers()
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(CLAUDE_API_URL, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            analysis = result['content'][0]['text']
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"Analysis for images in {image_folder}:\n\n")
-                f.write(analysis)
-            
+            start_time = time.time()
+            analysis, usage, first_token = stream_message(CLAUDE_API_URL, headers, data, output_file,
+                                                          preamble=f"Analysis for images in {image_folder}:\n\n")
+            record_usage('persona', usage, time.time() - start_time, first_token=first_token,
+                         model=MODEL, folder=image_folder, **usage_extra)
             logger.info(f"Analysis completed. Results saved to {output_file}")
+            save_record(image_folder, analysis, database)
             return
         except requests.RequestException as e:
             logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
@@ -225,36 +412,158 @@ def analyze_images(image_folder: str, output_file: str) -> None:
                 logger.error("Max retries reached. Unable to complete analysis.")
                 raise
 
+def analyze_folders_batch(image_folders: List[str], output_dir: str, database: Optional[str] = None,
+                          job_name: Optional[str] = None) -> int:
+    """
+    Analyze many influencer folders through the Message Batches API.
+
+    Results are written to the same analysis_results_<folder>.txt files as
+    analyze_images. The job is checkpointed under Data/batch_jobs/<job_name>;
+    running again with the same job name re-attaches to the submitted batch.
+
+    Folders too large for one request are sharded as in analyze_images: every
+    shard without a cached partial analysis is one request of the job, and the
+    partial analyses are then merged by a second job, <job_name>_reduce.
+
+    Args:
+        image_folders (List[str]): Folders with one influencer's images each.
+        output_dir (str): Directory for the analysis result files.
+        database (Optional[str]): SQLite database to also store the parsed analyses in.
+        job_name (Optional[str]): Checkpoint name; defaults to one derived from the folders.
+
+    Returns:
+        int: Number of results handled in this run, over both jobs.
+    """
+    headers = api_headers()
+    job = BatchJob(job_name or default_job_name('persona', image_folders), CLAUDE_API_URL + '/batches', headers)
+
+    def output_file(image_folder: str) -> str:
+        folder_name = os.path.basename(os.path.normpath(image_folder))
+        return os.path.join(output_dir, f"analysis_results_{folder_name}.txt")
+
+    # Shards are planned up front rather than while spooling, so a run that
+    # re-attaches to a prepared job still knows which partial analyses to merge
+    folder_images = {image_folder: list_images(image_folder) for image_folder in image_folders}
+    sharded = {}
+    for image_folder, image_paths in folder_images.items():
+        shards = shard_images(image_paths)
+        if len(shards) > 1:
+            sharded[image_folder] = [(shard, shard_cache_file(shard)) for shard in shards]
+    empty_shards = set()
+
+    def requests_to_send():
+        for i, image_folder in enumerate(image_folders):
+            if image_folder in sharded:
+                logger.info(f"Splitting {len(folder_images[image_folder])} images in {image_folder} "
+                            f"into {len(sharded[image_folder])} shards")
+                for j, (shard, cache_file) in enumerate(sharded[image_folder]):
+                    if os.path.exists(cache_file):
+                        continue
+                    encoded_images, estimated_tokens = encode_image_files(shard)
+                    if not encoded_images:
+                        empty_shards.add(cache_file)
+                        continue
+                    target = {'folder': image_folder, 'cache_file': cache_file, 'estimated_tokens': estimated_tokens}
+                    yield f"persona_{i:06d}_{j:03d}", build_analysis_request(encoded_images, SHARD_REQUEST), target
+                continue
+            encoded_images, estimated_tokens = encode_image_files(folder_images[image_folder])
+            if not encoded_images:
+                logger.error(f"No valid images found in {image_folder}, skipping.")
+                continue
+            target = {'folder': image_folder, 'output_file': output_file(image_folder),
+                      'estimated_tokens': estimated_tokens}
+            yield f"persona_{i:06d}", build_analysis_request(encoded_images), target
+
+    def reduce_requests():
+        for i, image_folder in enumerate(image_folders):
+            if image_folder not in sharded:
+                continue
+            partial_analyses, missing = [], 0
+            for _, cache_file in sharded[image_folder]:
+                analysis = read_shard_cache(cache_file)
+                if analysis is None and cache_file not in empty_shards:
+                    missing += 1
+                elif analysis:
+                    partial_analyses.append(analysis)
+            if missing:
+                logger.error(f"{missing} shard(s) of {image_folder} have no analysis, skipping the merge.")
+                continue
+            if not partial_analyses:
+                logger.error(f"No valid images found in {image_folder}, skipping.")
+                continue
+            target = {'folder': image_folder, 'output_file': output_file(image_folder),
+                      'shards': len(partial_analyses)}
+            yield f"persona_{i:06d}", build_reduce_request(partial_analyses), target
+
+    def handle_result(custom_id: str, result: Dict[str, Any], target: Dict[str, Any]) -> None:
+        analysis = result_text(result)
+        if analysis is None:
+            logger.error(f"Batch request for {target.get('folder')} did not succeed: {result.get('type')}")
+            return
+        if 'cache_file' in target:
+            record_usage('persona_shard', result['message'].get('usage'),
+                         estimated_image_tokens=target.get('estimated_tokens'), folder=target['folder'], batch=True)
+            write_shard_cache(target['cache_file'], analysis)
+            return
+        record_usage('persona', result['message'].get('usage'), estimated_image_tokens=target.get('estimated_tokens'),
+                     shards=target.get('shards'), folder=target['folder'], batch=True)
+        save_analysis(target['folder'], target['output_file'], analysis, database)
+
+    handled = job.run(requests_to_send(), handle_result)
+    if sharded:
+        reduce_job = BatchJob(f"{job.name}_reduce", CLAUDE_API_URL + '/batches', headers,
+                              os.path.dirname(job.job_directory))
+        handled += reduce_job.run(reduce_requests(), handle_result)
+    return handled
+
 def main():
     """
     Main function to run the image analysis process.
     """
+    parser = argparse.ArgumentParser(description="Analyze social media influencer personas from images.")
+    parser.add_argument("image_folders", nargs="*", help="Image folders to analyze (prompted for if omitted)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all folders as one Message Batches job and wait for the results")
+    parser.add_argument("--job", help="Batch job name; reuse it to re-attach after a restart")
+    args = parser.parse_args()
+
     # Get the script's directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
     # Construct default paths relative to the script's location
     default_image_folder = os.path.normpath(os.path.join(script_dir, '..', DEFAULT_IMAGE_FOLDER))
     default_output_dir = os.path.normpath(os.path.join(script_dir, '..', OUTPUT_DIRECTORY))
+    database = os.path.join(default_output_dir, PERSONA_DATABASE)
 
     # Prompt user for image folder, use default if no input is provided
-    image_folder = input(f"Enter the path to the image folder (press Enter to use default: {default_image_folder}): ").strip()
-    if not image_folder:
-        image_folder = default_image_folder
-
-    folder_name = os.path.basename(image_folder)
-    output_file = os.path.join(default_output_dir, f"analysis_results_{folder_name}.txt")
-    
-    if not os.path.isdir(image_folder):
-        logger.error(f"Error: The directory '{image_folder}' does not exist.")
+    image_folders = args.image_folders
+    if not image_folders:
+        image_folder = input(f"Enter the path to the image folder (press Enter to use default: {default_image_folder}): ").strip()
+        image_folders = [image_folder or default_image_folder]
+
+    missing = [folder for folder in image_folders if not (os.path.isdir(folder) or is_pack(folder))]
+    for folder in missing:
+        logger.error(f"Error: The directory '{folder}' does not exist.")
+    if missing:
         return
 
     # Ensure the output directory exists
     os.makedirs(default_output_dir, exist_ok=True)
 
-    try:
-        analyze_images(image_folder, output_file)
-    except Exception as e:
-        logger.exception(f"An error occurred during image analysis: {str(e)}")
+    if args.batch:
+        try:
+            analyze_folders_batch(image_folders, default_output_dir, database=database, job_name=args.job)
+        except Exception as e:
+            logger.exception(f"An error occurred during batch image analysis: {str(e)}")
+        return
+
+    for image_folder in image_folders:
+        folder_name = os.path.basename(os.path.normpath(image_folder))
+        output_file = os.path.join(default_output_dir, f"analysis_results_{folder_name}.txt")
+        try:
+            analyze_images(image_folder, output_file, database=database)
+        except Exception as e:
+            logger.exception(f"An error occurred during image analysis: {str(e)}")
 
 if __name__ == "__main__":
     main()
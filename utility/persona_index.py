@@ -0,0 +1,274 @@
+import os
+import json
+import zlib
+import argparse
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from persona_similarity import A_WEIGHTS, SCORED_FIELDS, OUTPUT_PREFIXES, parse_persona, parse_score, char_ngrams
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_DIRECTORY = os.path.join(os.path.dirname(SCRIPT_DIR), 'Data', 'persona_index')
+FIELD_DIM = 256  # hashed n-gram buckets per A field
+SCORE_DIM = 2  # A4/A9 scores are encoded as a unit vector on a quarter circle
+DEFAULT_NPROBE = 4  # IVF lists searched per query
+KMEANS_ITERATIONS = 20
+
+
+def _field_vector(value: str, field_id: str) -> np.ndarray:
+    """Unit vector for one field: hashed character n-grams, or the angle of a 1-4 分 score."""
+    if field_id in SCORED_FIELDS:
+        score = parse_score(value)
+        if score is not None:
+            # Scores 1..4 map to angles 0..90°, so score differences of 1, 2, 3
+            # give similarities cos(30°), cos(60°), cos(90°) = 0.87, 0.5, 0
+            angle = (score - 1) * np.pi / 6
+            return np.concatenate([[np.cos(angle), np.sin(angle)], np.zeros(FIELD_DIM - SCORE_DIM)])
+
+    vector = np.zeros(FIELD_DIM)
+    for gram in char_ngrams(value):
+        # crc32 is stable across processes, unlike hash(); one bit picks the sign
+        # so colliding n-grams cancel out instead of inflating similarity
+        digest = zlib.crc32(gram.encode('utf-8'))
+        vector[digest % FIELD_DIM] += 1 if digest & 0x80000000 else -1
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_persona(text: str) -> np.ndarray:
+    """
+    Embed a persona analysis as one fixed-size vector.
+
+    Each A field becomes a unit vector scaled by the square root of its weight, so
+    the inner product of two embeddings is the weighted sum of per-field cosine
+    similarities, the same quantity persona_similarity.score_personas ranks by.
+
+    Args:
+        text (str): Persona analysis text.
+
+    Returns:
+        np.ndarray: float32 vector of length len(A_WEIGHTS) * FIELD_DIM.
+    """
+    fields = parse_persona(text)
+    parts = [np.sqrt(weight) * _field_vector(fields.get(field_id, ''), field_id)
+             for field_id, weight in A_WEIGHTS.items()]
+    return np.concatenate(parts).astype(np.float32)
+
+
+class PersonaIndex:
+    """
+    Append-only on-disk vector index of persona analyses.
+
+    Vectors live in a raw float32 file that is memory-mapped for queries, and
+    metadata in a small JSON file. Adding or updating a persona appends one row
+    (an updated persona's old row is tombstoned), so the index never has to be
+    rebuilt. After train_ivf, rows are also assigned to their nearest centroid
+    and queries only scan the closest lists.
+    """
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIRECTORY):
+        self.directory = directory
+        self.dim = len(A_WEIGHTS) * FIELD_DIM
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.centroids_path = os.path.join(directory, 'centroids.npy')
+        os.makedirs(directory, exist_ok=True)
+
+        self.meta: Dict[str, Any] = {'dim': self.dim, 'rows': [], 'names': {}, 'lists': []}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            if self.meta['dim'] != self.dim:
+                raise ValueError(f"Index at {directory} has dimension {self.meta['dim']}, expected {self.dim}")
+        self.centroids = np.load(self.centroids_path) if os.path.exists(self.centroids_path) else None
+
+    def __len__(self) -> int:
+        return len(self.meta['names'])
+
+    def _save_meta(self) -> None:
+        temp_path = self.meta_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(temp_path, self.meta_path)
+
+    def _vectors(self) -> np.ndarray:
+        rows = len(self.meta['rows'])
+        if rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def add(self, name: str, text: str) -> bool:
+        """
+        Add or update one persona.
+
+        Args:
+            name (str): Unique persona name, e.g. the analysis filename.
+            text (str): Persona analysis text.
+
+        Returns:
+            bool: False if the persona is already indexed with identical text.
+        """
+        checksum = zlib.crc32(text.encode('utf-8'))
+        current = self.meta['names'].get(name)
+        if current is not None and self.meta['rows'][current]['checksum'] == checksum:
+            return False
+
+        vector = embed_persona(text)
+        with open(self.vectors_path, 'ab') as f:
+            # Drop a row left by a crash between writing a vector and saving the metadata,
+            # which would otherwise shift every later vector by one row
+            f.truncate(len(self.meta['rows']) * self.dim * vector.itemsize)
+            f.write(vector.tobytes())
+
+        row = len(self.meta['rows'])
+        if current is not None:
+            self.meta['rows'][current]['deleted'] = True
+        self.meta['rows'].append({'name': name, 'checksum': checksum, 'deleted': False})
+        self.meta['names'][name] = row
+        if self.centroids is not None:
+            self.meta['lists'].append(int(np.argmax(self.centroids @ vector)))
+        self._save_meta()
+        return True
+
+    def get(self, name: str) -> np.ndarray:
+        """Return the stored vector of an indexed persona."""
+        return np.array(self._vectors()[self.meta['names'][name]])
+
+    def train_ivf(self, n_lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> None:
+        """
+        Partition the index into n_lists inverted lists with spherical k-means.
+
+        Training is only needed once; later additions are assigned to the
+        existing centroids. Retrain when the collection has changed a lot.
+
+        Args:
+            n_lists (int): Number of centroids.
+            iterations (int): k-means iterations.
+            seed (int): Random seed for centroid initialisation.
+        """
+        vectors = self._vectors()
+        live = np.array([row for row in self.meta['names'].values()], dtype=np.intp)
+        if len(live) < n_lists:
+            raise ValueError(f"Need at least {n_lists} personas to train {n_lists} lists, have {len(live)}")
+
+        data = np.asarray(vectors[np.sort(live)])
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(data), n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for j in range(n_lists):
+                members = data[labels == j]
+                if len(members):
+                    centroids[j] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        self.centroids = centroids.astype(np.float32)
+        np.save(self.centroids_path, self.centroids)
+        # Tombstoned rows are assigned too so list positions line up with row numbers
+        lists = np.empty(len(self.meta['rows']), dtype=np.int64)
+        for start in range(0, len(lists), 4096):
+            lists[start:start + 4096] = np.argmax(vectors[start:start + 4096] @ self.centroids.T, axis=1)
+        self.meta['lists'] = lists.tolist()
+        self._save_meta()
+        logger.info(f"Trained {n_lists} IVF lists over {len(live)} personas")
+
+    def search(self, vector: np.ndarray, k: int = 10, nprobe: int = DEFAULT_NPROBE,
+               exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the k personas with the highest inner product with a query vector.
+
+        Args:
+            vector (np.ndarray): Query embedding from embed_persona.
+            k (int): Number of results.
+            nprobe (int): IVF lists to scan; ignored until train_ivf has run.
+            exclude (Optional[str]): Persona name to leave out, e.g. the query itself.
+
+        Returns:
+            List[Dict[str, Any]]: Results with keys name and score (0-100), best first.
+        """
+        vectors = self._vectors()
+        candidates = np.array(sorted(self.meta['names'].values()), dtype=np.intp)
+        if self.centroids is not None and len(self.meta['lists']) == len(self.meta['rows']):
+            probe = np.argsort(-(self.centroids @ vector))[:nprobe]
+            lists = np.asarray(self.meta['lists'])[candidates]
+            candidates = candidates[np.isin(lists, probe)]
+        if exclude in self.meta['names']:
+            candidates = candidates[candidates != self.meta['names'][exclude]]
+        if len(candidates) == 0:
+            return []
+
+        scores = np.asarray(vectors[candidates]) @ vector
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{'name': self.meta['rows'][candidates[i]]['name'], 'score': round(float(scores[i]) * 100, 1)}
+                for i in top]
+
+    def query(self, name: str, k: int = 10, nprobe: int = DEFAULT_NPROBE) -> List[Dict[str, Any]]:
+        """Find the k personas most similar to an indexed reference persona."""
+        return self.search(self.get(name), k=k, nprobe=nprobe, exclude=name)
+
+
+def add_paths(index: PersonaIndex, paths: List[str]) -> int:
+    """
+    Add persona analysis files, or every persona .txt file in given directories.
+
+    Args:
+        index (PersonaIndex): Index to update.
+        paths (List[str]): Files or directories.
+
+    Returns:
+        int: Number of personas added or updated.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith('.txt') and not name.startswith(OUTPUT_PREFIXES))
+        else:
+            files.append(path)
+
+    changed = 0
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            if index.add(os.path.basename(file_path), f.read()):
+                changed += 1
+    logger.info(f"Indexed {changed} new or changed personas ({len(index)} total)")
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-neighbour search over persona analyses.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIRECTORY, help="Index directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Add persona files or directories to the index")
+    add_parser.add_argument("paths", nargs="+")
+
+    train_parser = subparsers.add_parser("train", help="Partition the index into IVF lists")
+    train_parser.add_argument("--lists", type=int, default=64)
+
+    query_parser = subparsers.add_parser("query", help="Find personas most similar to an indexed persona")
+    query_parser.add_argument("name", help="Indexed persona name, e.g. 北大老孙.txt")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    args = parser.parse_args()
+
+    index = PersonaIndex(args.index)
+    if args.command == "add":
+        add_paths(index, args.paths)
+    elif args.command == "train":
+        index.train_ivf(args.lists)
+    elif args.command == "query":
+        for result in index.query(args.name, k=args.k, nprobe=args.nprobe):
+            print(f"{result['score']:5.1f}%  {result['name']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
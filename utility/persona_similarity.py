@@ -0,0 +1,199 @@
+import os
+import re
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Weights of the A items in the 人设相似度评分, as used by compare.COMPARISON_PROMPT
+A_WEIGHTS = {
+    'A1': 0.25,  # 视角+年龄性别+定位
+    'A2': 0.05,  # 粗分领域
+    'A3': 0.12,  # 细分领域
+    'A4': 0.05,  # 专业程度
+    'A5': 0.12,  # 自我标签
+    'A6': 0.08,  # 语言特点
+    'A7': 0.05,  # 个人形象
+    'A8': 0.08,  # 情感倾向/价值观
+    'A9': 0.10,  # 叙事结构和故事性
+    'A10': 0.05,  # 审美风格
+    'A11': 0.05,  # 主要布景／场地
+}
+SCORED_FIELDS = {'A4', 'A9'}  # fields holding a 1-4 分 score
+SIMILARITY_THRESHOLD = 70  # percent of the LLM's 人设相似度评分; below this 值得模仿评分 is skipped
+# Lexical similarity runs lower than the LLM's judgement, so the local pre-screen
+# uses its own cut-off. On Data/test_txt it passes exactly the influencers that
+# the LLM scored above SIMILARITY_THRESHOLD.
+LOCAL_THRESHOLD = 40  # percent of the local weighted score
+NGRAM_RANGE = (1, 2)  # character n-grams; Chinese text has no word boundaries
+OUTPUT_PREFIXES = ('comparison_', 'similarity_')  # files compare.py writes next to the analyses
+
+FIELD_PATTERN = re.compile(r'^\s*([A-E]\d{0,2})[.．、]\s*(.*)$')
+SCORE_PATTERN = re.compile(r'([1-4])\s*分')
+
+
+def parse_persona(text: str) -> Dict[str, str]:
+    """
+    Split a persona analysis written with the persona.ANALYSIS_PROMPT framework into fields.
+
+    Args:
+        text (str): Analysis text containing lines such as "A1. 视角＋年龄性别＋定位: ...".
+
+    Returns:
+        Dict[str, str]: Field id (e.g. "A1", "B2", "E") to the field's value.
+            Values continuing over several lines are joined with newlines.
+    """
+    fields: Dict[str, str] = {}
+    current = None
+    for line in text.splitlines():
+        match = FIELD_PATTERN.match(line)
+        if match:
+            field_id, rest = match.groups()
+            if len(field_id) == 1 and field_id != 'E':
+                # Section headers such as "A. 人设定位" carry no value of their own
+                current = None
+                continue
+            current = field_id
+            # Drop the field label; the value follows the first colon
+            _, sep, value = rest.partition(':') if ':' in rest else rest.partition('：')
+            fields[current] = value.strip() if sep else ''
+        elif current and line.strip() and not line.strip().startswith('<'):
+            fields[current] = (fields[current] + '\n' + line.strip()).strip()
+    return fields
+
+
+def char_ngrams(text: str) -> List[str]:
+    text = re.sub(r'\s+', ' ', text.lower())
+    grams = []
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return [gram for gram in grams if gram.strip() and not re.fullmatch(r'[\W_]+', gram)]
+
+
+def tfidf_similarity(texts: List[str], reference_index: int, use_idf: bool = False) -> np.ndarray:
+    """
+    Cosine similarity of character n-gram TF(-IDF) vectors against one reference text.
+
+    Term frequencies are log-scaled. IDF is off by default: across a handful of
+    same-genre personas it mostly suppresses the shared vocabulary that makes
+    them similar, and it makes a pair's score depend on the rest of the corpus.
+
+    Args:
+        texts (List[str]): Texts to compare.
+        reference_index (int): Index of the reference text in texts.
+        use_idf (bool): Weight n-grams by inverse document frequency.
+
+    Returns:
+        np.ndarray: Similarity of every text to the reference, in [0, 1].
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for gram in char_ngrams(text):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(gram, len(vocabulary)))
+    if not vocabulary:
+        return np.zeros(len(texts))
+
+    counts = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    np.add.at(counts, (np.array(rows), np.array(cols)), 1)
+    weights = np.log1p(counts)
+    if use_idf:
+        document_frequency = np.count_nonzero(counts, axis=0)
+        weights *= np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    weights /= np.where(norms == 0, 1, norms)
+    return np.clip(weights @ weights[reference_index], 0, 1)
+
+
+def parse_score(value: str) -> Optional[int]:
+    """Return the 1-4 分 score in a field value, or None if there is none."""
+    match = SCORE_PATTERN.search(value)
+    return int(match.group(1)) if match else None
+
+
+def field_similarity(values: List[str], reference_index: int, field_id: str) -> np.ndarray:
+    """
+    Similarity of one field across personas against the reference persona.
+
+    Scored fields compare their 1-4 分 scores (1 - |difference| / 3) and fall
+    back to text similarity when a score is missing.
+
+    Args:
+        values (List[str]): The field's value for every persona.
+        reference_index (int): Index of the reference persona.
+        field_id (str): Field id such as "A4".
+
+    Returns:
+        np.ndarray: Similarity of every persona to the reference, in [0, 1].
+    """
+    similarity = tfidf_similarity(values, reference_index)
+    if field_id in SCORED_FIELDS:
+        scores = np.array([parse_score(value) or np.nan for value in values], dtype=float)
+        numeric = 1 - np.abs(scores - scores[reference_index]) / 3
+        similarity = np.where(np.isnan(numeric), similarity, numeric)
+    return similarity
+
+
+def score_personas(analyses: Dict[str, str], reference: str) -> List[Dict[str, Any]]:
+    """
+    Rank personas by weighted A-field similarity to a reference persona.
+
+    Args:
+        analyses (Dict[str, str]): Filename to persona analysis text.
+        reference (str): Filename of the reference persona in analyses.
+
+    Returns:
+        List[Dict[str, Any]]: One entry per other persona, best match first, with
+            keys name, score (0-100) and fields (field id to similarity 0-100).
+
+    Raises:
+        KeyError: If the reference is not among the analyses.
+    """
+    if reference not in analyses:
+        raise KeyError(f"Reference persona '{reference}' not found")
+
+    names = list(analyses)
+    reference_index = names.index(reference)
+    parsed = [parse_persona(analyses[name]) for name in names]
+
+    field_scores = np.empty((len(A_WEIGHTS), len(names)))
+    for row, field_id in enumerate(A_WEIGHTS):
+        values = [fields.get(field_id, '') for fields in parsed]
+        field_scores[row] = field_similarity(values, reference_index, field_id)
+    weights = np.array(list(A_WEIGHTS.values()))
+    totals = weights @ field_scores
+
+    ranking = []
+    for column in np.argsort(-totals):
+        if column == reference_index:
+            continue
+        ranking.append({
+            'name': names[column],
+            'score': round(float(totals[column]) * 100, 1),
+            'fields': {field_id: round(float(field_scores[row, column]) * 100, 1)
+                       for row, field_id in enumerate(A_WEIGHTS)},
+        })
+    return ranking
+
+
+def format_similarity_table(ranking: List[Dict[str, Any]], reference: str) -> str:
+    """
+    Format a ranking from score_personas as a plain-text table.
+
+    Args:
+        ranking (List[Dict[str, Any]]): Output of score_personas.
+        reference (str): Filename of the reference persona.
+
+    Returns:
+        str: Table with one row per persona and one column per A field.
+    """
+    header = ['博主', '总分'] + list(A_WEIGHTS)
+    lines = [f"Local 人设相似度 (reference: {reference})", '\t'.join(header)]
+    for entry in ranking:
+        name = os.path.splitext(entry['name'])[0]
+        cells = [name, f"{entry['score']:.1f}%"] + [f"{entry['fields'][field_id]:.0f}" for field_id in A_WEIGHTS]
+        lines.append('\t'.join(cells))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from persona_similarity import OUTPUT_PREFIXES, parse_persona, parse_score
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATABASE = os.path.join(os.path.dirname(SCRIPT_DIR), 'Data', 'personas.sqlite')
+TEXT_FIELDS = ['A1', 'A3', 'A6', 'A7', 'A8', 'A10',
+               'B1', 'B2', 'B3', 'C1', 'C4', 'C6', 'C7',
+               'D1', 'D2', 'D3', 'D4', 'D5', 'E']
+SCORE_FIELDS = ['A4', 'A9']  # 1-4 分 scores, stored as integers next to their explanation
+TAG_FIELDS = ['A2', 'A5', 'A11', 'C2', 'C3', 'C5']  # "列出N个" fields, stored as lists
+
+TAG_SEPARATOR = re.compile(r'[,，、;；/]')
+TAG_QUOTES = '"\'“”‘’「」 '
+
+COLUMNS = (['name TEXT PRIMARY KEY', 'source TEXT', 'analyzed_at TEXT']
+           + [f'{field.lower()} TEXT' for field in TEXT_FIELDS]
+           + [f'{field.lower()}_score INTEGER' for field in SCORE_FIELDS]
+           + [f'{field.lower()} TEXT' for field in SCORE_FIELDS]
+           + [f'{field.lower()}_tags TEXT' for field in TAG_FIELDS]
+           + ['raw TEXT'])
+COLUMN_NAMES = [column.split()[0] for column in COLUMNS]
+TAG_COLUMNS = {f'{field.lower()}_tags' for field in TAG_FIELDS}
+
+
+def parse_tags(value: str) -> List[str]:
+    """
+    Split a list field such as '"宠妻达人", "甜蜜日常"' into its items.
+
+    Args:
+        value (str): Field value.
+
+    Returns:
+        List[str]: Non-empty items with surrounding quotes removed.
+    """
+    # Some answers add an explanation after a full stop; only the list counts
+    value = re.split(r'[。\n]', value, maxsplit=1)[0]
+    tags = [tag.strip(TAG_QUOTES) for tag in TAG_SEPARATOR.split(value)]
+    return [tag for tag in tags if tag]
+
+
+def build_record(name: str, text: str, source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Turn a persona analysis into a structured record.
+
+    Args:
+        name (str): Persona name, e.g. the analysed image folder's name.
+        text (str): Analysis text following persona.ANALYSIS_PROMPT.
+        source (Optional[str]): Where the analysis came from, e.g. the image folder.
+
+    Returns:
+        Dict[str, Any]: Record keyed by COLUMN_NAMES. Scores are int or None and
+            tag fields are lists of strings.
+    """
+    fields = parse_persona(text)
+    record: Dict[str, Any] = {
+        'name': name,
+        'source': source,
+        'analyzed_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'raw': text,
+    }
+    for field in TEXT_FIELDS:
+        record[field.lower()] = fields.get(field)
+    for field in SCORE_FIELDS:
+        record[field.lower()] = fields.get(field)
+        record[f'{field.lower()}_score'] = parse_score(fields.get(field, ''))
+    for field in TAG_FIELDS:
+        record[f'{field.lower()}_tags'] = parse_tags(fields.get(field, ''))
+    return record
+
+
+def connect(database: str = DEFAULT_DATABASE) -> sqlite3.Connection:
+    """
+    Open the persona database, creating the table if needed.
+
+    Args:
+        database (str): Path to the SQLite file.
+
+    Returns:
+        sqlite3.Connection: Connection whose rows can be accessed by column name.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    connection = sqlite3.connect(database)
+    connection.row_factory = sqlite3.Row
+    connection.execute(f"CREATE TABLE IF NOT EXISTS personas ({', '.join(COLUMNS)})")
+    for field in SCORE_FIELDS:
+        column = f'{field.lower()}_score'
+        connection.execute(f"CREATE INDEX IF NOT EXISTS idx_personas_{column} ON personas ({column})")
+    return connection
+
+
+def save_record(connection: sqlite3.Connection, record: Dict[str, Any]) -> None:
+    """Insert or replace one record built by build_record."""
+    values = [json.dumps(record[column], ensure_ascii=False) if column in TAG_COLUMNS else record[column]
+              for column in COLUMN_NAMES]
+    placeholders = ', '.join('?' for _ in COLUMN_NAMES)
+    with connection:
+        connection.execute(f"INSERT OR REPLACE INTO personas ({', '.join(COLUMN_NAMES)}) VALUES ({placeholders})",
+                           values)
+
+
+def save_persona(name: str, text: str, source: Optional[str] = None, database: str = DEFAULT_DATABASE) -> Dict[str, Any]:
+    """
+    Parse a persona analysis and store it in the database.
+
+    Args:
+        name (str): Persona name.
+        text (str): Analysis text.
+        source (Optional[str]): Where the analysis came from.
+        database (str): Path to the SQLite file.
+
+    Returns:
+        Dict[str, Any]: The stored record.
+    """
+    record = build_record(name, text, source)
+    connection = connect(database)
+    try:
+        save_record(connection, record)
+    finally:
+        connection.close()
+    return record
+
+
+def load_records(connection: sqlite3.Connection, where: str = '', params: tuple = ()) -> List[Dict[str, Any]]:
+    """
+    Load records, decoding tag lists.
+
+    Args:
+        connection (sqlite3.Connection): Connection from connect.
+        where (str): Optional SQL condition, e.g. "a4_score >= ?".
+        params (tuple): Parameters for the condition.
+
+    Returns:
+        List[Dict[str, Any]]: Matching records.
+    """
+    sql = "SELECT * FROM personas" + (f" WHERE {where}" if where else "") + " ORDER BY name"
+    records = []
+    for row in connection.execute(sql, params):
+        record = dict(row)
+        for column in TAG_COLUMNS:
+            record[column] = json.loads(record[column]) if record[column] else []
+        records.append(record)
+    return records
+
+
+def export_table(connection: sqlite3.Connection, output_path: str, include_raw: bool = False) -> int:
+    """
+    Export all records to a Parquet (.parquet) or Arrow IPC (.arrow / .feather) file.
+
+    Args:
+        connection (sqlite3.Connection): Connection from connect.
+        output_path (str): Destination file; the extension picks the format.
+        include_raw (bool): Also export the full analysis text.
+
+    Returns:
+        int: Number of exported records.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+        ValueError: If the file extension is not supported.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Exporting personas requires pyarrow: pip install pyarrow") from e
+
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in ('.parquet', '.arrow', '.feather'):
+        raise ValueError(f"Unsupported export format: {extension}")
+
+    records = load_records(connection)
+    columns = [column for column in COLUMN_NAMES if include_raw or column != 'raw']
+    schema = pa.schema([
+        (column, pa.list_(pa.string()) if column in TAG_COLUMNS
+         else pa.int8() if column.endswith('_score') else pa.string())
+        for column in columns
+    ])
+    table = pa.Table.from_pylist([{column: record[column] for column in columns} for record in records],
+                                 schema=schema)
+
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, output_path)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, output_path)
+    logger.info(f"Exported {len(records)} personas to {output_path}")
+    return len(records)
+
+
+def import_directory(connection: sqlite3.Connection, directory: str) -> int:
+    """
+    Store every persona analysis .txt file in a directory, named after the file.
+
+    Args:
+        connection (sqlite3.Connection): Connection from connect.
+        directory (str): Directory with analysis files such as Data/test_txt.
+
+    Returns:
+        int: Number of imported files.
+    """
+    count = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.txt') or filename.startswith(OUTPUT_PREFIXES):
+            continue
+        file_path = os.path.join(directory, filename)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        name = os.path.splitext(filename)[0]
+        if name.startswith('analysis_results_'):
+            name = name[len('analysis_results_'):]
+        save_record(connection, build_record(name, text, source=file_path))
+        count += 1
+    logger.info(f"Imported {count} personas from {directory}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured store of persona analyses.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLite database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Store existing analysis .txt files")
+    import_parser.add_argument("directory")
+
+    export_parser = subparsers.add_parser("export", help="Export to .parquet or .arrow")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--include-raw", action="store_true", help="Include the full analysis text")
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    try:
+        if args.command == "import":
+            import_directory(connection, args.directory)
+        elif args.command == "export":
+            export_table(connection, args.output, include_raw=args.include_raw)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()